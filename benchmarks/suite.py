@@ -0,0 +1,290 @@
+# suite.py
+#
+# Throughput benchmarks of the simulation hot paths.
+#   python benchmarks/suite.py                   run everything and compare with baseline.json
+#   python benchmarks/suite.py --output run.json also write this run as JSON
+#   python benchmarks/suite.py --save-baseline   make the median of three runs the new baseline
+# The exit status is 1 when a benchmark is slower than the baseline by more than its threshold, and
+# still is when timed again.
+# Re-record the baseline in any commit that intentionally changes a hot path.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.casino_rules import CasinoRules
+from src.counting import COUNTING_SYSTEMS
+from src.simulation import BlackjackSimulation
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.20  # Largest tolerated drop in throughput before a benchmark counts as a regression
+
+# Rule sets every end-to-end benchmark is run with
+RULE_SETS = {
+    '8d_s17': dict(decks=8),
+    '6d_h17_ls': dict(decks=6, dealer_hits_soft_17=True, surrender_option='late'),
+    '1d_s17_nodas': dict(decks=1, double_after_split=False, double_on_any_two=False),
+}
+DECK_COUNTS = (1, 6, 8)
+
+# Typical hands for the per-hand lookups (pairs, soft and hard hands, three-card hands)
+SAMPLE_HANDS = ([10, 6], [11, 7], [8, 8], [5, 4, 2], [11, 11], [10, 2], [3, 3, 11], [9, 9], [7, 5, 4])
+
+def bench_simulate_hand(rule_params):
+    simulation = BlackjackSimulation(CasinoRules(seed=1, **rule_params))
+    simulate_hand = simulation.simulate_hand
+
+    def run(n):
+        for _ in range(n):
+            simulate_hand()
+    return run
+
+def bench_deal_card(decks):
+    deal_card = CasinoRules(decks=decks, seed=1).deal_card
+
+    def run(n):
+        for _ in range(n):
+            deal_card()
+    return run
+
+def bench_initialize_shoe(decks):
+    initialize_shoe = CasinoRules(decks=decks, seed=1).initialize_shoe
+
+    def run(n):
+        for _ in range(n):
+            initialize_shoe()
+    return run
+
+def bench_update_count(systems):
+    update_count = CasinoRules(decks=6, seed=1, counting_systems=systems).update_count
+    cards = list(range(2, 12)) * 10
+
+    def run(n):
+        for _ in range(n):
+            for card in cards:
+                update_count(card)
+    return run, len(cards)
+
+def bench_calculate_true_count(decks):
+    rules = CasinoRules(decks=decks, seed=1)
+    for _ in range(rules.cut_card // 2):
+        rules.deal_card()
+    calculate_true_count = rules.calculate_true_count
+
+    def run(n):
+        for _ in range(n):
+            calculate_true_count()
+    return run
+
+def bench_calculate_hand_value():
+    calculate_hand_value = BlackjackSimulation(CasinoRules(seed=1)).calculate_hand_value
+
+    def run(n):
+        for _ in range(n):
+            for hand in SAMPLE_HANDS:
+                calculate_hand_value(hand)
+    return run, len(SAMPLE_HANDS)
+
+def bench_get_action():
+    get_action = BlackjackSimulation(CasinoRules(seed=1)).get_action
+    situations = [(hand, upcard) for hand in SAMPLE_HANDS for upcard in (2, 6, 10, 11)]
+
+    def run(n):
+        for _ in range(n):
+            for hand, upcard in situations:
+                get_action(hand, upcard)
+    return run, len(situations)
+
+def benchmarks():
+    """
+    Returns every benchmark as (name, factory, unit).
+
+    A factory builds the workload and returns `run(n)`, which performs n
+    operations, or a (run, batch) pair when `run(n)` performs n batches of
+    `batch` operations (so that the benchmark loop is not what gets measured).
+    """
+    suite = []
+    for rule_name, rule_params in RULE_SETS.items():
+        suite.append((f"simulate_hand[{rule_name}]", lambda p=rule_params: bench_simulate_hand(p), 'hands/s'))
+    for decks in DECK_COUNTS:
+        suite.append((f"deal_card[{decks}d]", lambda d=decks: bench_deal_card(d), 'cards/s'))
+        suite.append((f"initialize_shoe[{decks}d]", lambda d=decks: bench_initialize_shoe(d), 'shoes/s'))
+        suite.append((f"calculate_true_count[{decks}d]", lambda d=decks: bench_calculate_true_count(d), 'calls/s'))
+    suite.append(("update_count[hi_lo]", lambda: bench_update_count(('hi_lo',)), 'cards/s'))
+    suite.append(("update_count[all_systems]", lambda: bench_update_count(tuple(COUNTING_SYSTEMS)), 'cards/s'))
+    suite.append(("calculate_hand_value", bench_calculate_hand_value, 'calls/s'))
+    suite.append(("get_action", bench_get_action, 'calls/s'))
+    return suite
+
+def _calibrate(run, min_time):
+    """Returns the operation count of `run` that takes at least `min_time` seconds, doubling it from 1."""
+    n = 1
+    while True:
+        start = time.perf_counter()
+        run(n)
+        if time.perf_counter() - start >= min_time:
+            return n
+        n *= 2
+
+def run_suite(pattern=None, min_time=0.2, repeats=15, verbose=False, names=None):
+    """
+    Runs every benchmark whose name contains `pattern` (all of them by default), or only those in `names`.
+
+    Each benchmark's operation count is set so that one timing takes at
+    least `min_time` seconds. The benchmarks are then timed in turn,
+    `repeats` rounds over the whole suite, and each keeps its fastest
+    timing. Other processes and CPU frequency changes only ever slow a
+    timing down, and as the timings of one benchmark are spread over the
+    whole run, its fastest one comes from the machine's quietest moments
+    rather than from whatever phase it happened to run in.
+
+    Returns:
+    - A dict with 'meta' (interpreter, machine, commit, time) and 'results',
+      {name: {'ops_per_sec': float, 'unit': str}}.
+    """
+    selected = []
+    for name, factory, unit in benchmarks():
+        if (pattern and pattern not in name) or (names is not None and name not in names):
+            continue
+        built = factory()
+        run, batch = built if isinstance(built, tuple) else (built, 1)
+        selected.append((name, unit, run, batch, _calibrate(run, min_time)))
+    best = {}
+    for _ in range(repeats):
+        for name, _, run, _, n in selected:
+            start = time.perf_counter()
+            run(n)
+            elapsed = time.perf_counter() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    results = {}
+    for name, unit, _, batch, n in selected:
+        rate = n * batch / best[name]
+        results[name] = {'ops_per_sec': rate, 'unit': unit}
+        if verbose:
+            print(f"{name:<36} {rate:>14,.0f} {unit}", flush=True)
+    return {'meta': _metadata(), 'results': results}
+
+def _metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares a run with a baseline run.
+
+    A benchmark regresses when its throughput falls more than `threshold`
+    (a fraction) below the baseline; a baseline entry may carry its own
+    'threshold'. Benchmarks missing from either run are ignored.
+
+    Returns:
+    - (rows, regressions): one (name, baseline ops/s, current ops/s, ratio) row
+      per shared benchmark, and the names of the regressed benchmarks.
+    """
+    rows = []
+    regressions = []
+    for name, entry in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        ratio = entry['ops_per_sec'] / reference['ops_per_sec']
+        rows.append((name, reference['ops_per_sec'], entry['ops_per_sec'], ratio))
+        if ratio < 1 - reference.get('threshold', threshold):
+            regressions.append(name)
+    return rows, regressions
+
+def combine_runs(runs):
+    """
+    Combines several runs of the suite into one, for a baseline or a steadier comparison.
+
+    Each benchmark gets the median of its throughputs, each already the
+    best of its run, so a baseline is what a typical single run measures. No
+    per-benchmark threshold is derived from the spread between runs: a
+    noisy benchmark needs more repeats or a longer `min_time`, not a looser
+    threshold.
+    """
+    results = {}
+    for name, entry in runs[0]['results'].items():
+        rates = [run['results'][name]['ops_per_sec'] for run in runs if name in run['results']]
+        results[name] = {'ops_per_sec': statistics.median(rates), 'unit': entry['unit']}
+    return {'meta': dict(runs[-1]['meta'], runs=len(runs)), 'results': results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the simulation hot paths")
+    parser.add_argument('--filter', default=None, help="Only run benchmarks whose name contains this text")
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help="Baseline results to compare with (default: benchmarks/baseline.json)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Tolerated fractional slowdown of benchmarks without their own threshold "
+                             "(default: 0.20)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store the runs as the new baseline instead of comparing with it")
+    parser.add_argument('--runs', type=int, default=None,
+                        help="Runs of the suite combined by their median (default: 3 with --save-baseline, else 1)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timing (default: 0.2)")
+    parser.add_argument('--repeats', type=int, default=15, help="Timings per benchmark (default: 15)")
+    parser.add_argument('--retries', type=int, default=2,
+                        help="Times the benchmarks that look slower are timed again before they count as "
+                             "regressions (default: 2)")
+    args = parser.parse_args(argv)
+
+    n_runs = args.runs or (3 if args.save_baseline else 1)
+    runs = []
+    for i in range(n_runs):
+        if n_runs > 1:
+            print(f"Run {i + 1} of {n_runs}", flush=True)
+        runs.append(run_suite(args.filter, min_time=args.min_time, repeats=args.repeats, verbose=True))
+    current = combine_runs(runs) if n_runs > 1 else runs[0]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(current, baseline, args.threshold)
+    for _ in range(args.retries):
+        if not regressions:
+            break
+        # A slower hot path stays slower; a timing taken while the machine was busy does not
+        print(f"Timing {len(regressions)} slower benchmark(s) again", flush=True)
+        retry = run_suite(min_time=args.min_time, repeats=args.repeats, verbose=True, names=set(regressions))
+        retry_rows, regressions = compare(retry, baseline, args.threshold)
+        retried = {row[0]: row for row in retry_rows}
+        rows = [retried.get(row[0], row) for row in rows]
+    print(f"\n{'benchmark':<36} {'baseline':>14} {'current':>14} {'ratio':>7}")
+    for name, reference, rate, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f"{name:<36} {reference:>14,.0f} {rate:>14,.0f} {ratio:>7.2f}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than the threshold")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
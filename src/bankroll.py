@@ -0,0 +1,183 @@
+# bankroll.py
+
+import math
+
+import numpy as np
+
+from src.basic_strategy import basic_strategy
+from src.betting_strategy import calculate_bet
+from src.counting import HI_LO
+from src.shoe import CARDS_PER_DECK, SINGLE_DECK
+from src.streaming import QuantileSketch, RunningStats
+from src.vectorized import VectorizedSimulation
+
+DEFAULT_ROUNDS_PER_HOUR = 100
+
+def bet_table(bet_function, decks, cut_card, system=HI_LO):
+    """
+    Tabulates a bet function of the true count over every count a round can start with.
+
+    A round starts with the cursor before the cut card, and the true count is
+    the running count divided by the exact decks remaining, so the bet only
+    depends on (running count, cursor). Calling the function once per pair
+    lets any Python bet function, such as `calculate_bet`, drive thousands of
+    shoes with one array index per round.
+
+    Parameters:
+    - bet_function: Function of the true count returning the bet.
+    - decks, cut_card: Decks in the shoe and cards dealt before the reshuffle.
+    - system: CountingSystem of the running count; its tags must be whole numbers.
+
+    Returns:
+    - (table, offset): the bet is table[running_count + offset, cursor].
+    """
+    if not all(float(tag).is_integer() for tag in system.tags):
+        raise ValueError(f"Bet tables need whole-number tags, and {system.name!r} has fractional ones")
+    # Largest possible |running count|: every positive (or every negative) card dealt, from the initial count
+    positive = sum(system.tags[card] for card in SINGLE_DECK if system.tags[card] > 0)
+    negative = -sum(system.tags[card] for card in SINGLE_DECK if system.tags[card] < 0)
+    offset = int(decks * max(positive, negative) + abs(system.initial_count(decks)))
+    size = decks * CARDS_PER_DECK
+    table = np.empty((2 * offset + 1, cut_card))
+    for cursor in range(cut_card):
+        decks_remaining = (size - cursor) / CARDS_PER_DECK
+        for running_count in range(-offset, offset + 1):
+            table[running_count + offset, cursor] = bet_function(running_count / decks_remaining)
+    return table, offset
+
+class BankrollResult:
+    """
+    Streaming summary of a set of bankroll trajectories.
+
+    Per-round wins and bets go through RunningStats, and the final bankroll
+    and maximum drawdown of each trajectory through QuantileSketches, so the
+    summary has the same size however many rounds were played.
+    """
+
+    def __init__(self, trajectories, bankroll, rounds_per_hour=DEFAULT_ROUNDS_PER_HOUR):
+        self.trajectories = trajectories
+        self.bankroll = bankroll
+        self.rounds_per_hour = rounds_per_hour
+        self.rounds = 0           # Rounds played by each trajectory
+        self.ruined = 0           # Trajectories whose bankroll reached zero
+        self.win = RunningStats()  # Money won per round played (ruined trajectories stop playing)
+        self.bet = RunningStats()  # Initial bet per round played
+        self.final_bankroll = QuantileSketch()
+        self.max_drawdown = QuantileSketch()
+
+    @property
+    def risk_of_ruin(self):
+        """Fraction of trajectories ruined within `rounds` rounds."""
+        return self.ruined / self.trajectories if self.trajectories else 0.0
+
+    @property
+    def risk_of_ruin_std_error(self):
+        p = self.risk_of_ruin
+        return math.sqrt(p * (1 - p) / self.trajectories) if self.trajectories else 0.0
+
+    @property
+    def hourly_win_rate(self):
+        """Expected money won per hour of play."""
+        return self.win.mean * self.rounds_per_hour
+
+    @property
+    def hourly_std(self):
+        """Standard deviation of the money won in an hour of play."""
+        return self.win.std * math.sqrt(self.rounds_per_hour)
+
+    @property
+    def n0(self):
+        """Rounds needed for the expected win to equal one standard deviation (inf without an edge)."""
+        if self.win.mean <= 0:
+            return math.inf
+        return self.win.variance / self.win.mean ** 2
+
+    @property
+    def score(self):
+        """SCORE: the win rate per 100 rounds of an optimally bet $10,000 bankroll, 1e6 / N0."""
+        return 1e6 / self.n0
+
+    def drawdown_quantiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """Returns {quantile: maximum drawdown} over the trajectories."""
+        return {q: self.max_drawdown.quantile(q) for q in quantiles}
+
+    def summary(self):
+        """Returns the headline figures as a dict."""
+        return {
+            'trajectories': self.trajectories,
+            'rounds': self.rounds,
+            'risk_of_ruin': self.risk_of_ruin,
+            'ev_per_round': self.win.mean,
+            'std_per_round': self.win.std,
+            'avg_bet': self.bet.mean,
+            'hourly_win_rate': self.hourly_win_rate,
+            'hourly_std': self.hourly_std,
+            'n0': self.n0,
+            'score': self.score,
+            'median_final_bankroll': self.final_bankroll.quantile(0.5),
+            'max_drawdown': self.drawdown_quantiles(),
+        }
+
+class BankrollSimulation:
+    """
+    Plays many bankroll trajectories in parallel, betting from the true count.
+
+    Each trajectory is one lane of a VectorizedSimulation with its own shoe.
+    Before every round the bet of each lane is read from the bet function
+    at that shoe's true count in the table's primary counting system; the round's net units (doubles, splits,
+    surrender and the blackjack payout included) multiply the bet. A
+    trajectory is ruined once its bankroll is no longer positive, and stops
+    betting from then on. Bets are not capped by the remaining bankroll.
+    """
+
+    def __init__(self, casino_rules, bankroll, bet_function=calculate_bet, trajectories=4096, seed=0,
+                 strategy=basic_strategy, rounds_per_hour=DEFAULT_ROUNDS_PER_HOUR):
+        """
+        Parameters:
+        - casino_rules: CasinoRules describing the table.
+        - bankroll: Starting bankroll of every trajectory, in the bet function's money.
+        - bet_function: Function of the true count returning the bet (default is `calculate_bet`).
+        - trajectories: Number of trajectories played in parallel.
+        - seed: Seed of the shoes.
+        - strategy: Strategy dict in the format of `basic_strategy`.
+        - rounds_per_hour: Rounds per hour used for the hourly figures.
+        """
+        self.engine = VectorizedSimulation(casino_rules, n_shoes=trajectories, seed=seed, strategy=strategy)
+        self.bets, self.count_offset = bet_table(bet_function, casino_rules.decks, self.engine.cut_card,
+                                                 casino_rules.counter.primary)
+        self.result = BankrollResult(trajectories, bankroll, rounds_per_hour)
+        self.balance = np.full(trajectories, float(bankroll))
+        self.peak = self.balance.copy()
+        self.drawdown = np.zeros(trajectories)
+        self.alive = np.ones(trajectories, dtype=bool)
+
+    def run(self, n_rounds):
+        """
+        Plays `n_rounds` more rounds on every trajectory still alive.
+
+        Returns:
+        - The BankrollResult covering every round played so far.
+        """
+        engine = self.engine
+        result = self.result
+        balance = self.balance
+        for _ in range(n_rounds):
+            engine.start_round()
+            bet = self.bets[engine.running_counts() + self.count_offset, engine.cursor]
+            bet[~self.alive] = 0.0
+            net, _ = engine.play_round(bets=bet)
+            won = bet * net
+            balance += won
+            result.win.add(won[self.alive])
+            result.bet.add(bet[self.alive])
+            np.maximum(self.peak, balance, out=self.peak)
+            np.maximum(self.drawdown, self.peak - balance, out=self.drawdown)
+            self.alive &= balance > 0
+        result.rounds += n_rounds
+        result.ruined = int(np.count_nonzero(~self.alive))
+        # The trajectory-level sketches describe the latest state of every trajectory
+        result.final_bankroll = QuantileSketch()
+        result.final_bankroll.add(balance)
+        result.max_drawdown = QuantileSketch()
+        result.max_drawdown.add(self.drawdown)
+        return result
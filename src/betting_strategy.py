@@ -19,3 +19,16 @@ def calculate_bet(true_count, base_bet=10):
         return base_bet * 2   # Small increase for low positive count
     else:
         return base_bet       # Minimum bet when count is neutral or negative
+
+def flat_bet(true_count, base_bet=10):
+    """
+    Bets the same amount whatever the count (the reference ramp for comparisons).
+
+    Parameters:
+    - true_count: Current true count in the game (ignored).
+    - base_bet: Bet amount (default is 10).
+
+    Returns:
+    - The bet amount.
+    """
+    return base_bet
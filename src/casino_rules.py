@@ -1,4 +1,12 @@
-import random
+from time import perf_counter
+
+from src.counting import HI_LO, CountTracker
+from src.events import NullEventSink
+from src.rng import random_seed, shoe_key
+from src.shoe import Shoe
+
+# Hi-Lo tag for each card value (indexed by the card itself: 2-6 count +1, tens and Aces -1)
+HI_LO_TAGS = HI_LO.tags
 
 class CasinoRules:
     def __init__(self, 
@@ -11,7 +19,10 @@ class CasinoRules:
                  hit_split_aces=False,           # Player can hit split aces (False = only one card dealt)
                  surrender_option='None',        # Surrender rule ('late' or None if not allowed)
                  blackjack_payout=1.5,           # Payout for blackjack (3:2 = 1.5, 6:5 = 1.2)
-                 penetration=0.75                # Deck penetration level (e.g., 0.75 for 75%)
+                 penetration=0.75,               # Deck penetration level (e.g., 0.75 for 75%)
+                 seed=None,                      # Seed of this table's shoes (None = drawn at random)
+                 stream=0,                       # Stream of shoes within the seed (e.g. a parallel block)
+                 counting_systems=('hi_lo',)     # Counting systems tracked on the shoe (the first is primary)
                  ):
         """
         Initializes the rules for a blackjack game based on casino specifications.
@@ -27,6 +38,12 @@ class CasinoRules:
         - surrender_option: 'late' if late surrender allowed, None if surrender not allowed
         - blackjack_payout: Payout for blackjack (1.5 for 3:2, 1.2 for 6:5)
         - penetration: Fraction of the shoe to be dealt before reshuffling
+        - seed: Seed of this table's shoes; shoe i of stream s is a pure function of
+          (seed, s, i) (see src.rng). Unseeded tables draw a seed, kept in `seed` for replays
+        - stream: Stream of shoes within the seed, so independent tables never share shoes
+        - counting_systems: Names (see src.counting.COUNTING_SYSTEMS), CountingSystems or their
+          `as_spec()` dicts, whose running counts are kept; `running_count` and `true_count`
+          follow the first one
         """
         self.decks = decks
         self.dealer_hits_soft_17 = dealer_hits_soft_17
@@ -38,47 +55,114 @@ class CasinoRules:
         self.surrender_option = surrender_option
         self.blackjack_payout = blackjack_payout
         self.penetration = penetration  # Set penetration level
-        self.shoe = self.initialize_shoe()
-        self.running_count = 0
+        self.seed = random_seed() if seed is None else seed
+        self.stream = stream
+        self.shoe_index = 0  # Number of the shoe in play within the stream
+        self.counter = CountTracker(counting_systems, decks)
         self.true_count = 0
-        self.cards_dealt = 0  # Track the number of cards dealt
+        self.event_sink = NullEventSink()  # Receives trace events; replaced by BlackjackSimulation
+        self.instrumentation = None  # Optional Instrumentation; set by BlackjackSimulation
+        self.shoe = Shoe(decks)
+        self.cut_card = int(self.shoe.size * penetration)  # Cards dealt before the shoe is reshuffled
+        self.load_shoe(0)
+
+    @property
+    def late_surrender(self):
+        """True if the rules allow late surrender."""
+        return str(self.surrender_option).lower() == 'late'
+
+    @property
+    def running_count(self):
+        """Running count of the primary counting system."""
+        return self.counter.count
+
+    @property
+    def cards_dealt(self):
+        """Number of cards dealt since the last shuffle."""
+        return self.shoe.cursor
+
+    def load_shoe(self, index):
+        """
+        Arranges the shoe as shoe number `index` of this table's stream and resets the count.
+
+        Shoes are generated from their own key, so this takes the same time for any index.
+        """
+        self.shoe.arrange_key(shoe_key(self.seed, self.stream, index))
+        self.shoe_index = index
+        self.counter.reset()  # Reset running counts after reshuffle
+        self.true_count = 0
+        return self.shoe
 
     def initialize_shoe(self):
-        """Initializes and shuffles a shoe based on the number of decks."""
-        single_deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
-        shoe = single_deck * self.decks
-        random.shuffle(shoe)
-        self.cards_dealt = 0  # Reset cards dealt counter when shoe is reshuffled
-        return shoe
+        """Shuffles every card back into the shoe (in place), moving on to the next shoe of the stream."""
+        return self.load_shoe(self.shoe_index + 1)
+
+    def _reshuffle(self, reason):
+        """Moves on to the next shoe, timing and counting the reshuffle when instrumented."""
+        instr = self.instrumentation
+        if instr is None:
+            self.initialize_shoe()
+            return
+        start = perf_counter()
+        self.initialize_shoe()
+        instr.lap('reshuffle', start)
+        instr.count(reason)
+
+    def start_round(self):
+        """Reshuffles before a new round once the cut card (penetration level) has been reached."""
+        if self.shoe.cursor >= self.cut_card:
+            if self.event_sink.enabled:
+                self.event_sink.emit('reshuffle', cards_dealt=self.shoe.cursor)
+            self._reshuffle('reshuffle_cut')
 
     def deal_card(self):
-        """Deals a card from the shoe and reshuffles if penetration level is reached."""
-        # Reshuffle if we've reached the penetration threshold
-        if self.cards_dealt >= len(self.shoe) * self.penetration:
-            print("Reshuffling shoe based on penetration level.")
-            self.shoe = self.initialize_shoe()
-            self.running_count = 0  # Reset running count after reshuffle
+        """Deals a card from the shoe, reshuffling only if the shoe runs out mid-round."""
+        shoe = self.shoe
+        if shoe.cursor >= shoe.size:
+            if self.event_sink.enabled:
+                self.event_sink.emit('reshuffle', cards_dealt=shoe.cursor)
+            self._reshuffle('reshuffle_exhausted')
 
         # Deal a card and update counts
-        card = self.shoe.pop()
-        self.update_count(card)
-        self.cards_dealt += 1  # Increment cards dealt counter
+        card = shoe.deal()
+        self.counter.update(card)
         return card
 
     def update_count(self, card):
-        """Updates the Hi-Lo running count based on the card dealt."""
-        if card in [2, 3, 4, 5, 6]:  # Low cards (2-6) increase the count
-            self.running_count += 1
-        elif card in [10, 11]:       # High cards (10, J, Q, K, A) decrease the count
-            self.running_count -= 1
+        """Updates the running count of every tracked counting system based on the card dealt."""
+        self.counter.update(card)
 
     def calculate_true_count(self):
-        """Calculates the true count based on remaining decks in the shoe."""
-        decks_remaining = len(self.shoe) / 52
+        """Calculates the primary system's true count based on the exact number of decks remaining in the shoe."""
+        decks_remaining = self.shoe.decks_remaining
         if decks_remaining > 0:
             self.true_count = self.running_count / decks_remaining
         return self.true_count
 
+    def running_counts(self):
+        """Returns {system name: running count} for every tracked counting system."""
+        return self.counter.running_counts()
+
+    def true_counts(self):
+        """Returns {system name: true count} for every tracked counting system."""
+        return self.counter.true_counts(self.shoe.cards_remaining)
+
+    def as_dict(self):
+        """Returns the rule parameters as keyword arguments for the constructor (without the seed)."""
+        return {
+            'decks': self.decks,
+            'dealer_hits_soft_17': self.dealer_hits_soft_17,
+            'double_after_split': self.double_after_split,
+            'double_on_any_two': self.double_on_any_two,
+            'max_splits': self.max_splits,
+            'resplit_aces': self.resplit_aces,
+            'hit_split_aces': self.hit_split_aces,
+            'surrender_option': self.surrender_option,
+            'blackjack_payout': self.blackjack_payout,
+            'penetration': self.penetration,
+            'counting_systems': [system.as_spec() for system in self.counter.systems],
+        }
+
     def __repr__(self):
         return (f"Casino Rules: {self.decks} decks, "
                 f"Dealer {'hits' if self.dealer_hits_soft_17 else 'stands'} on soft 17, "
@@ -0,0 +1,248 @@
+# control_variates.py
+
+from operator import mul
+
+from src.basic_strategy import basic_strategy
+from src.exact import full_composition, stand_ev
+from src.hand_state import (BUSTED, CARD_SLOTS, CARDS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, N_STATES, NEXT_STATE,
+                            PAIR, SPLIT, STAND, SURRENDER, TOTAL, compile_strategy, resolve_action)
+from src.shoe import RANKS
+
+# Levels of CardControl, from the cheapest to the most thorough
+CONTROL_LEVELS = ('upcard', 'deal', 'full')
+
+class CardControl:
+    """
+    Martingale control variate for the net units of a round, built card by card.
+
+    Before each card is dealt, an approximate value of the round is known as
+    a function f of that card: the expected net given the cards so far and
+    the next one. When the card comes, the control adds f(card) minus the
+    mean of f over the cards actually left in the shoe. Every such term has
+    an exact conditional mean of zero, whatever f is and whenever the shoe is
+    reshuffled, so `net - value` has the same expectation as `net` and an
+    estimate built on it stays unbiased. The better f predicts the round, the
+    more of the round's variance the control removes.
+
+    The values f come from tables computed once for the full shoe, with
+    infinite-deck draws and split hands valued without resplits (as in
+    src.exact). These approximations only cost variance reduction, never bias.
+
+    Levels:
+    - 'upcard': only the dealer's upcard, valued by the round's EV given the upcard.
+    - 'deal': the four cards of the initial deal.
+    - 'full': every card of the round, including the player's draws and the dealer's.
+    """
+
+    def __init__(self, casino_rules, strategy=basic_strategy, level='full'):
+        """
+        Parameters:
+        - casino_rules: CasinoRules of the table; its shoe supplies the cards left.
+        - strategy: Strategy dict in the format of `basic_strategy` played at the table.
+        - level: One of CONTROL_LEVELS.
+        """
+        if level not in CONTROL_LEVELS:
+            raise ValueError(f"Unknown control level '{level}' (expected one of {', '.join(CONTROL_LEVELS)})")
+        self.casino_rules = casino_rules
+        self.level = level
+        self.full = level == 'full'
+        self.deal_level = level != 'upcard'
+        self.value = 0.0  # Control value of the current round
+        comp = full_composition(casino_rules.decks)
+        self.probabilities = [count / sum(comp) for count in comp]  # Per rank index (card - 2)
+        self.actions, self.fallbacks = compile_strategy(strategy)
+        self.dealer_done = DEALER_DONE_H17 if casino_rules.dealer_hits_soft_17 else DEALER_DONE_S17
+        self._build_stand_values()
+        self._build_deal_rows()
+        if self.full:
+            self._build_play_rows()
+
+    # Table construction
+
+    def _mean(self, values):
+        """Mean of `values` (one per rank) over a draw from the full shoe."""
+        return sum(map(mul, self.probabilities, values))
+
+    def _build_stand_values(self):
+        """stand[dealer_state][state]: EV of standing on `state` while the dealer plays on from `dealer_state`."""
+        done = self.dealer_done
+        distributions = [None] * N_STATES
+
+        def distribution(state):
+            if distributions[state] is None:
+                if done[state]:
+                    result = [0.0] * 6
+                    result[5 if BUSTED[state] else TOTAL[state] - 17] = 1.0
+                else:
+                    result = [0.0] * 6
+                    for p, card in zip(self.probabilities, RANKS):
+                        for i, q in enumerate(distribution(NEXT_STATE[state * CARD_SLOTS + card])):
+                            result[i] += p * q
+                distributions[state] = result
+            return distributions[state]
+
+        self.stand = [[-1.0 if BUSTED[state] else stand_ev(TOTAL[state], distribution(dealer_state))
+                       for state in range(N_STATES)]
+                      for dealer_state in range(N_STATES)]
+
+    def _play_value(self, state, upcard, stand, split_hand, memo):
+        """EV of playing `state` by the strategy tables against a dealer whose standing values are `stand`."""
+        if BUSTED[state]:
+            return -1.0
+        key = state * 2 + split_hand
+        cached = memo.get(key)
+        if cached is not None:
+            return cached
+        index = state * CARD_SLOTS + upcard
+        # Split hands are valued without resplits; split Aces that get one card never reach here
+        action = resolve_action(self.actions[index], self.fallbacks[index], state, self.casino_rules,
+                                2 if split_hand else 1, resplits=False)
+
+        row = state * CARD_SLOTS
+        if action == STAND:
+            value = stand[state]
+        elif action == SURRENDER:
+            value = -0.5
+        elif action == SPLIT:
+            value = 2 * self._mean(self._split_row(PAIR[state], upcard, stand, memo))
+        elif action == DOUBLE:
+            value = 2 * self._mean([stand[NEXT_STATE[row + card]] for card in RANKS])
+        else:
+            value = self._mean([self._play_value(NEXT_STATE[row + card], upcard, stand, split_hand, memo)
+                                for card in RANKS])
+        memo[key] = value
+        return value
+
+    def _split_row(self, pair_card, upcard, stand, memo):
+        """Value of one split hand of `pair_card` for each card it may receive."""
+        single = NEXT_STATE[pair_card] * CARD_SLOTS
+        if pair_card == 11 and not self.casino_rules.hit_split_aces:
+            return tuple(stand[NEXT_STATE[single + card]] for card in RANKS)
+        return tuple(self._play_value(NEXT_STATE[single + card], upcard, stand, True, memo) for card in RANKS)
+
+    def _round_value(self, first_card, second_card, upcard, hole_card, memos):
+        """Value of a round once the four initial cards are known."""
+        player_state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+        dealer_state = NEXT_STATE[NEXT_STATE[upcard] * CARD_SLOTS + hole_card]
+        player_natural = TOTAL[player_state] == 21
+        dealer_natural = TOTAL[dealer_state] == 21
+        if player_natural or dealer_natural:
+            if player_natural and dealer_natural:
+                return 0.0
+            return self.casino_rules.blackjack_payout if player_natural else -1.0
+        memo = memos.setdefault(upcard * CARD_SLOTS + hole_card, {})
+        return self._play_value(player_state, upcard, self.stand[dealer_state], False, memo)
+
+    def _build_deal_rows(self):
+        """Rows of values, one per rank, for each of the four cards of the initial deal."""
+        memos = self._memos = {}  # Player values per (upcard, hole card), reused by the play rows
+        mean = self._mean
+        # hole_rows[(first * 12 + second) * 12 + upcard]: value for each hole card, and so on back to the first card
+        self.hole_rows = [None] * CARD_SLOTS ** 3
+        self.second_rows = [None] * CARD_SLOTS ** 2
+        self.upcard_rows = [None] * CARD_SLOTS
+        for first_card in RANKS:
+            for upcard in RANKS:
+                second_values = []
+                for second_card in RANKS:
+                    row = tuple(self._round_value(first_card, second_card, upcard, hole_card, memos)
+                                for hole_card in RANKS)
+                    self.hole_rows[(first_card * CARD_SLOTS + second_card) * CARD_SLOTS + upcard] = row
+                    second_values.append(mean(row))
+                self.second_rows[first_card * CARD_SLOTS + upcard] = tuple(second_values)
+            self.upcard_rows[first_card] = tuple(mean(self.second_rows[first_card * CARD_SLOTS + upcard])
+                                                 for upcard in RANKS)
+        self.first_row = tuple(mean(self.upcard_rows[first_card]) for first_card in RANKS)
+        # The upcard level values the upcard on its own, before the player's first card is known
+        self.upcard_only_row = tuple(mean([self.upcard_rows[first_card][i] for first_card in RANKS])
+                                     for i in range(len(RANKS)))
+
+    def _build_play_rows(self):
+        """Rows for the player's draws, split cards and the dealer's draws."""
+        n = N_STATES
+        self.hit_rows = [None] * (CARD_SLOTS * CARD_SLOTS * n * 2)
+        self.double_rows = [None] * (CARD_SLOTS * CARD_SLOTS * n)
+        self.split_rows = [None] * (CARD_SLOTS * CARD_SLOTS * CARD_SLOTS)
+        for upcard in RANKS:
+            for hole_card in RANKS:
+                dealer = upcard * CARD_SLOTS + hole_card
+                stand = self.stand[NEXT_STATE[NEXT_STATE[upcard] * CARD_SLOTS + hole_card]]
+                memo = self._memos.setdefault(dealer, {})
+                for state in range(n):
+                    if BUSTED[state] or CARDS[state] == 0:
+                        continue
+                    row = state * CARD_SLOTS
+                    for split_hand in (0, 1):
+                        self.hit_rows[(dealer * n + state) * 2 + split_hand] = tuple(
+                            self._play_value(NEXT_STATE[row + card], upcard, stand, split_hand, memo)
+                            for card in RANKS)
+                    self.double_rows[dealer * n + state] = tuple(2 * stand[NEXT_STATE[row + card]] for card in RANKS)
+                for pair_card in RANKS:
+                    self.split_rows[dealer * CARD_SLOTS + pair_card] = self._split_row(pair_card, upcard, stand, memo)
+        # dealer_rows[dealer_state * N_STATES + state]: value of standing on `state` for each dealer draw
+        self.dealer_rows = [None] * (n * n)
+        for dealer_state in range(n):
+            if self.dealer_done[dealer_state]:
+                continue
+            row = dealer_state * CARD_SLOTS
+            for state in range(n):
+                if not BUSTED[state]:
+                    self.dealer_rows[dealer_state * n + state] = tuple(
+                        self.stand[NEXT_STATE[row + card]][state] for card in RANKS)
+
+    # Observation, called by BlackjackSimulation right after each card is dealt
+
+    def observe(self, row, card):
+        """Adds f(card) - E[f] for a card just dealt, with E over the cards that were left before it."""
+        shoe = self.casino_rules.shoe
+        # The shoe's rank counts already exclude `card`, and a reshuffle happens before a card is dealt
+        expected = (sum(map(mul, row, shoe.rank_counts)) + row[card - 2]) / (shoe.size - shoe.cursor + 1)
+        self.value += row[card - 2] - expected
+
+    def start_round(self):
+        self.value = 0.0
+
+    def first(self, card):
+        if self.deal_level:
+            self.observe(self.first_row, card)
+
+    def upcard(self, first_card, card):
+        self.observe(self.upcard_rows[first_card] if self.deal_level else self.upcard_only_row, card)
+
+    def second(self, first_card, upcard, card):
+        if self.deal_level:
+            self.observe(self.second_rows[first_card * CARD_SLOTS + upcard], card)
+
+    def hole(self, first_card, second_card, upcard, card):
+        if self.deal_level:
+            self.observe(self.hole_rows[(first_card * CARD_SLOTS + second_card) * CARD_SLOTS + upcard], card)
+
+    def split_card(self, upcard, hole_card, pair_card, card):
+        if self.full:
+            self.observe(self.split_rows[(upcard * CARD_SLOTS + hole_card) * CARD_SLOTS + pair_card], card)
+
+    def hit(self, upcard, hole_card, state, split_hand, card):
+        if self.full:
+            self.observe(self.hit_rows[((upcard * CARD_SLOTS + hole_card) * N_STATES + state) * 2 + split_hand], card)
+
+    def double(self, upcard, hole_card, state, card):
+        if self.full:
+            self.observe(self.double_rows[(upcard * CARD_SLOTS + hole_card) * N_STATES + state], card)
+
+    def dealer_draw(self, dealer_state, states, stakes, card):
+        if not self.full:
+            return
+        rows = self.dealer_rows
+        base = dealer_state * N_STATES
+        if len(states) == 1 and stakes[0] == 1:
+            row = rows[base + states[0]]
+            if row is not None:  # A busted hand loses whatever the dealer draws
+                self.observe(row, card)
+            return
+        combined = [0.0] * len(RANKS)
+        for state, stake in zip(states, stakes):
+            row = rows[base + state]
+            if row is not None:
+                for i, value in enumerate(row):
+                    combined[i] += stake * value
+        self.observe(combined, card)
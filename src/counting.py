@@ -0,0 +1,214 @@
+# counting.py
+
+from operator import add
+
+from src.shoe import CARDS_PER_DECK, RANKS, SINGLE_DECK
+
+class CountingSystem:
+    """
+    A card-counting system given by the tag of each card value.
+
+    Tags are stored as a precomputed table indexed directly by the card value
+    (2-11, Ace = 11), so counting a card is one index. Unbalanced systems,
+    whose tags do not sum to zero over a deck, start from an initial running
+    count of -(deck imbalance) * (decks - 1), which for KO is the usual
+    4 - 4 * decks.
+    """
+
+    def __init__(self, name, tags):
+        """
+        Parameters:
+        - name: Name the system is registered under.
+        - tags: Tag of each card value, as a dict {card: tag} or a sequence ordered like RANKS (2-9, 10, Ace).
+        """
+        if not isinstance(tags, dict):
+            tags = dict(zip(RANKS, tags))
+        if sorted(tags) != list(RANKS):
+            raise ValueError(f"Counting system {name!r} needs a tag for every card value in {RANKS}")
+        self.name = name
+        self.tags = tuple(tags.get(card, 0) for card in range(12))
+        self.imbalance = sum(self.tags[card] for card in SINGLE_DECK)  # Sum of the tags of one deck
+
+    @property
+    def balanced(self):
+        return self.imbalance == 0
+
+    def initial_count(self, decks):
+        """Running count at the start of a shoe of `decks` decks."""
+        return -self.imbalance * (decks - 1)
+
+    def as_spec(self):
+        """
+        Returns the system as plain data for CasinoRules parameters: its name if that is
+        how it is registered, else {'name': name, 'tags': tags ordered like RANKS}.
+        """
+        registered = COUNTING_SYSTEMS.get(self.name)
+        if registered is not None and registered.tags == self.tags:
+            return self.name
+        return {'name': self.name, 'tags': [self.tags[card] for card in RANKS]}
+
+    def __repr__(self):
+        return f"CountingSystem({self.name!r}, tags={self.tags[2:]})"
+
+# Tags ordered like RANKS: 2, 3, 4, 5, 6, 7, 8, 9, 10, Ace
+HI_LO = CountingSystem('hi_lo', (1, 1, 1, 1, 1, 0, 0, 0, -1, -1))
+COUNTING_SYSTEMS = {system.name: system for system in (
+    HI_LO,
+    CountingSystem('ko', (1, 1, 1, 1, 1, 1, 0, 0, -1, -1)),
+    CountingSystem('hi_opt_ii', (1, 1, 2, 2, 1, 1, 0, 0, -2, 0)),
+    CountingSystem('omega_ii', (1, 1, 2, 2, 2, 1, 0, -1, -2, 0)),
+    CountingSystem('zen', (1, 1, 2, 2, 2, 1, 0, 0, -2, -1)),
+    CountingSystem('wong_halves', (0.5, 1, 1, 1.5, 1, 0.5, 0, -0.5, -1, -1)),
+)}
+
+def register_counting_system(name, tags):
+    """
+    Registers a user-defined counting system so it can be referred to by name.
+
+    Parameters:
+    - name: Name of the system.
+    - tags: Tag of each card value (see CountingSystem).
+
+    Returns:
+    - The registered CountingSystem.
+    """
+    system = CountingSystem(name, tags)
+    COUNTING_SYSTEMS[name] = system
+    return system
+
+def get_counting_system(system):
+    """Returns the CountingSystem for a registered name or a spec from `as_spec` (or the system itself)."""
+    if isinstance(system, CountingSystem):
+        return system
+    if isinstance(system, dict):
+        return CountingSystem(system['name'], system['tags'])
+    try:
+        return COUNTING_SYSTEMS[system]
+    except KeyError:
+        raise ValueError(f"Unknown counting system {system!r}; registered: {sorted(COUNTING_SYSTEMS)}") from None
+
+class CountTracker:
+    """
+    Running counts of several counting systems over one shoe.
+
+    The tags of every system are gathered into one row per card value, so
+    each dealt card updates every running count in a single step, whatever
+    the number of systems. The first system is the primary count, kept in
+    `count`; with a single system, `update` only adds that system's tag.
+    """
+
+    def __init__(self, systems, decks):
+        """
+        Parameters:
+        - systems: Counting systems or registered names; the first one is the primary count.
+        - decks: Number of decks in the shoe.
+        """
+        self.systems = tuple(get_counting_system(system) for system in systems)
+        self.names = tuple(system.name for system in self.systems)
+        if not self.systems or len(set(self.names)) != len(self.names):
+            raise ValueError(f"CountTracker needs one or more differently named counting systems, got {self.names}")
+        self.decks = decks
+        self.rows = tuple(tuple(system.tags[card] for system in self.systems) for card in range(12))
+        self.initial_counts = tuple(system.initial_count(decks) for system in self.systems)
+        self.primary_tags = self.systems[0].tags
+        self.count = self.initial_counts[0]  # Running count of the primary system
+        self._counts = list(self.initial_counts)  # Every running count (only kept up to date with several systems)
+        if len(self.systems) == 1:
+            self.update = self._update_primary
+
+    def reset(self):
+        """Resets every running count for a freshly shuffled shoe."""
+        self._counts[:] = self.initial_counts
+        self.count = self.initial_counts[0]
+
+    def update(self, card):
+        """Counts one dealt card in every system."""
+        counts = self._counts
+        counts[:] = map(add, counts, self.rows[card])
+        self.count = counts[0]
+
+    def _update_primary(self, card):
+        """`update` for a single system."""
+        self.count += self.primary_tags[card]
+
+    @property
+    def counts(self):
+        """Running count of every system, in the order of `systems`."""
+        return [self.count] if len(self.systems) == 1 else list(self._counts)
+
+    @property
+    def running_count(self):
+        """Running count of the primary system."""
+        return self.count
+
+    @property
+    def primary(self):
+        """The primary CountingSystem."""
+        return self.systems[0]
+
+    def running_counts(self):
+        """Returns {system name: running count}."""
+        return dict(zip(self.names, self.counts))
+
+    def true_counts(self, cards_remaining):
+        """Returns {system name: running count per deck remaining} (an empty shoe gives 0)."""
+        if cards_remaining <= 0:
+            return dict.fromkeys(self.names, 0)
+        decks_remaining = cards_remaining / CARDS_PER_DECK
+        return {name: count / decks_remaining for name, count in zip(self.names, self.counts)}
+
+def compare_counting_systems(casino_rules, n_hands, strategy=None):
+    """
+    Plays `n_hands` hands once and measures how well each tracked system's true count predicts the result.
+
+    For every system of `casino_rules.counter`, the true count before each
+    round is paired with the round's net units; the correlation and the
+    regression slope (net units gained per point of true count) are the
+    usual measures of a system's betting efficiency.
+
+    Parameters:
+    - casino_rules: CasinoRules built with the counting systems to compare.
+    - n_hands: Number of hands to play.
+    - strategy: Strategy dict in the format of `basic_strategy` (default is basic_strategy).
+
+    Returns:
+    - A list with one row dict per system: 'system', 'mean_true_count',
+      'true_count_std', 'correlation' and 'ev_per_true_count'.
+    """
+    from src.basic_strategy import basic_strategy
+    from src.simulation import BlackjackSimulation
+
+    simulation = BlackjackSimulation(casino_rules, strategy=strategy or basic_strategy)
+    counter = casino_rules.counter
+    shoe = casino_rules.shoe
+    n = len(counter.names)
+    sum_x = [0.0] * n
+    sum_xx = [0.0] * n
+    sum_xy = [0.0] * n
+    sum_y = sum_yy = 0.0
+    for _ in range(n_hands):
+        casino_rules.start_round()
+        true_counts = list(counter.true_counts(shoe.cards_remaining).values())
+        simulation.simulate_hand()
+        net = simulation.last_net
+        sum_y += net
+        sum_yy += net * net
+        for i, x in enumerate(true_counts):
+            sum_x[i] += x
+            sum_xx[i] += x * x
+            sum_xy[i] += x * net
+
+    rows = []
+    var_y = sum_yy / n_hands - (sum_y / n_hands) ** 2
+    for i, name in enumerate(counter.names):
+        mean_x = sum_x[i] / n_hands
+        var_x = sum_xx[i] / n_hands - mean_x * mean_x
+        cov = sum_xy[i] / n_hands - mean_x * sum_y / n_hands
+        rows.append({
+            'system': name,
+            'mean_true_count': mean_x,
+            'true_count_std': var_x ** 0.5,
+            'correlation': cov / (var_x * var_y) ** 0.5 if var_x > 0 and var_y > 0 else 0.0,
+            'ev_per_true_count': cov / var_x if var_x > 0 else 0.0,
+        })
+    return rows
@@ -0,0 +1,577 @@
+# deviations.py
+
+import math
+
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.hand_state import (ACTION_NAMES, BUSTED, CARD_SLOTS, CARDS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, HIT,
+                            N_STATES, NEXT_STATE, PAIR, SOFT, SPLIT, STAND, SURRENDER, TOTAL, compile_strategy,
+                            resolve_action)
+from src.shoe import CARDS_PER_DECK
+from src.simulation import BlackjackSimulation
+
+# True counts are binned by their floor; counts beyond the range share the outer bins
+DEFAULT_TC_RANGE = (-10, 10)
+N_ACTIONS = len(ACTION_NAMES)
+
+def true_count_bin(true_count, low, high):
+    """Returns the bin of a true count: floor(true_count) clipped to [low, high], less `low`."""
+    tc = math.floor(true_count)
+    return (low if tc < low else high if tc > high else tc) - low
+
+def describe_hand(state):
+    """Describes a two-card hand state as in the strategy tables: 'hard 16', 'soft 18' or 'pair 8s'."""
+    if PAIR[state]:
+        return f"pair {'A' if PAIR[state] == 11 else PAIR[state]}s"
+    return f"{'soft' if SOFT[state] else 'hard'} {TOTAL[state]}"
+
+class TrueCountBins:
+    """
+    Net units per round binned by the true count the round was bet at.
+
+    Each bin keeps the count, sum and sum of squares of the nets, in flat
+    lists allocated once, so memory does not depend on the rounds added and
+    two accumulators over the same range merge by adding their lists.
+    """
+
+    def __init__(self, low=DEFAULT_TC_RANGE[0], high=DEFAULT_TC_RANGE[1]):
+        """
+        Parameters:
+        - low, high: True counts of the first and last bins; bin t holds counts in [t, t + 1).
+        """
+        self.low = low
+        self.high = high
+        n = high - low + 1
+        self.counts = [0] * n
+        self.sums = [0.0] * n
+        self.sums_sq = [0.0] * n
+
+    def add(self, true_count, net):
+        i = true_count_bin(true_count, self.low, self.high)
+        self.counts[i] += 1
+        self.sums[i] += net
+        self.sums_sq[i] += net * net
+
+    def merge(self, other):
+        """Adds the bins of another TrueCountBins over the same range and returns self."""
+        for mine, theirs in ((self.counts, other.counts), (self.sums, other.sums), (self.sums_sq, other.sums_sq)):
+            mine[:] = [a + b for a, b in zip(mine, theirs)]
+        return self
+
+    @property
+    def rounds(self):
+        return sum(self.counts)
+
+    def rows(self):
+        """
+        Returns one dict per non-empty bin, in count order, with keys 'true_count' (the bin's
+        lower edge), 'rounds', 'frequency', 'ev', 'variance' and 'std_error' (of `ev`).
+        """
+        total = self.rounds
+        rows = []
+        for i, n in enumerate(self.counts):
+            if not n:
+                continue
+            ev = self.sums[i] / n
+            variance = (self.sums_sq[i] - n * ev * ev) / (n - 1) if n > 1 else 0.0
+            variance = max(variance, 0.0)
+            rows.append({'true_count': self.low + i, 'rounds': n, 'frequency': n / total, 'ev': ev,
+                         'variance': variance, 'std_error': math.sqrt(variance / n)})
+        return rows
+
+class DecisionBins:
+    """
+    Net units of each first decision, binned by (hand state, upcard, true count, action).
+
+    Every sampled decision is played out once per allowed action on the same
+    cards (see DecisionRollout), so besides the count, sum and sum of squares
+    of each action's net, a cell keeps the sum and sum of squares of its
+    difference from the strategy's own action: paired differences on common
+    cards are far less noisy than the two nets. The mean true count of each
+    (state, upcard, bin) is kept for the index fits. All cells are flat lists
+    allocated once, so memory is fixed.
+    """
+
+    def __init__(self, low=DEFAULT_TC_RANGE[0], high=DEFAULT_TC_RANGE[1]):
+        """
+        Parameters:
+        - low, high: True counts of the first and last bins; bin t holds counts in [t, t + 1).
+        """
+        self.low = low
+        self.high = high
+        self.n_bins = high - low + 1
+        cells = N_STATES * CARD_SLOTS * self.n_bins
+        self.decisions = [0] * cells      # Per (state, upcard, bin)
+        self.true_counts = [0.0] * cells  # Sum of the exact true counts of those decisions
+        self.basic = [-1] * (N_STATES * CARD_SLOTS)  # Strategy's action per (state, upcard), -1 if never seen
+        self.counts = [0] * (cells * N_ACTIONS)  # Per (state, upcard, bin, action)
+        self.sums = [0.0] * (cells * N_ACTIONS)
+        self.sums_sq = [0.0] * (cells * N_ACTIONS)
+        self.diffs = [0.0] * (cells * N_ACTIONS)
+        self.diffs_sq = [0.0] * (cells * N_ACTIONS)
+
+    def _cell(self, state, upcard, b):
+        return (state * CARD_SLOTS + upcard) * self.n_bins + b
+
+    def add(self, state, upcard, true_count, basic_action, nets):
+        """
+        Adds one decision.
+
+        Parameters:
+        - state, upcard: The player's two-card state and the dealer's upcard.
+        - true_count: True count the player saw when deciding.
+        - basic_action: The strategy's action code.
+        - nets: Sequence of (action code, net units) on common cards, including `basic_action`.
+        """
+        cell = self._cell(state, upcard, true_count_bin(true_count, self.low, self.high))
+        self.decisions[cell] += 1
+        self.true_counts[cell] += true_count
+        self.basic[state * CARD_SLOTS + upcard] = basic_action
+        base = dict(nets)[basic_action]
+        cell *= N_ACTIONS
+        for action, net in nets:
+            i = cell + action
+            diff = net - base
+            self.counts[i] += 1
+            self.sums[i] += net
+            self.sums_sq[i] += net * net
+            self.diffs[i] += diff
+            self.diffs_sq[i] += diff * diff
+
+    def merge(self, other):
+        """Adds the cells of another DecisionBins over the same range and returns self."""
+        for name in ('decisions', 'true_counts', 'counts', 'sums', 'sums_sq', 'diffs', 'diffs_sq'):
+            mine = getattr(self, name)
+            mine[:] = [a + b for a, b in zip(mine, getattr(other, name))]
+        self.basic[:] = [theirs if mine < 0 else mine for mine, theirs in zip(self.basic, other.basic)]
+        return self
+
+    def table(self, state, upcard):
+        """
+        Returns {action name: [(true count bin, decisions, ev, variance)]} for one situation,
+        with only the bins where the action was played.
+        """
+        table = {}
+        for b in range(self.n_bins):
+            cell = self._cell(state, upcard, b) * N_ACTIONS
+            for action in range(N_ACTIONS):
+                n = self.counts[cell + action]
+                if not n:
+                    continue
+                ev = self.sums[cell + action] / n
+                variance = max((self.sums_sq[cell + action] - n * ev * ev) / (n - 1), 0.0) if n > 1 else 0.0
+                table.setdefault(ACTION_NAMES[action], []).append((self.low + b, n, ev, variance))
+        return table
+
+    def fit(self, state, upcard, action):
+        """
+        Fits the gain of `action` over the strategy's action as a straight line in the true count.
+
+        The fit is least squares over every decision, with each decision's
+        true count replaced by the mean of its bin.
+
+        Returns:
+        - A dict with keys 'samples', 'intercept', 'slope', 'slope_std_error', 'mean_true_count',
+          'residual_std' and 'sxx' (sum of squared true count deviations), or None with fewer than three samples or a single bin.
+        """
+        n_total = 0
+        sum_x = sum_y = sum_xx = sum_xy = sum_yy = 0.0
+        for b in range(self.n_bins):
+            cell = self._cell(state, upcard, b)
+            n = self.counts[cell * N_ACTIONS + action]
+            if not n:
+                continue
+            x = self.true_counts[cell] / self.decisions[cell]
+            y = self.diffs[cell * N_ACTIONS + action]
+            n_total += n
+            sum_x += n * x
+            sum_xx += n * x * x
+            sum_y += y
+            sum_xy += x * y
+            sum_yy += self.diffs_sq[cell * N_ACTIONS + action]
+        if n_total < 3:
+            return None
+        sxx = sum_xx - sum_x * sum_x / n_total
+        if sxx <= 1e-12:
+            return None
+        slope = (sum_xy - sum_x * sum_y / n_total) / sxx
+        intercept = (sum_y - slope * sum_x) / n_total
+        residual_variance = max(sum_yy - sum_y * sum_y / n_total - slope * slope * sxx, 0.0) / (n_total - 2)
+        return {'samples': n_total, 'intercept': intercept, 'slope': slope,
+                'slope_std_error': math.sqrt(residual_variance / sxx), 'mean_true_count': sum_x / n_total,
+                'residual_std': math.sqrt(residual_variance), 'sxx': sxx}
+
+class DecisionRollout:
+    """
+    Plays out a first decision for each allowed action on the same cards.
+
+    The cards come from a shoe's card array from a given position, read with
+    a local cursor, so the shoe itself is untouched and the real round can be
+    dealt from it afterwards. After the first action every hand follows the
+    strategy, with the rules and fallbacks of BlackjackSimulation, except
+    that split hands are not split again.
+    """
+
+    def __init__(self, casino_rules, strategy=basic_strategy):
+        self.casino_rules = casino_rules
+        self.action_table, self.fallback_table = compile_strategy(strategy)
+        self.dealer_done = DEALER_DONE_H17 if casino_rules.dealer_hits_soft_17 else DEALER_DONE_S17
+
+    def first_action(self, state, upcard):
+        """The strategy's action on a two-card hand before any split, as BlackjackSimulation plays it."""
+        index = state * CARD_SLOTS + upcard
+        return resolve_action(self.action_table[index], self.fallback_table[index], state, self.casino_rules)
+
+    def allowed_actions(self, state):
+        """Action codes allowed on a two-card hand before any split."""
+        # An action is allowed when resolve_action does not replace it by its fallback
+        return [action for action in (HIT, STAND, DOUBLE, SPLIT, SURRENDER)
+                if resolve_action(action, None, state, self.casino_rules) == action]
+
+    def _play_on(self, state, upcard, split_hand, split_aces, cards, position, end):
+        """
+        Plays a hand by the strategy from `state`.
+
+        Returns:
+        - (final state, units staked, next card position), or None if the cards ran out.
+        """
+        rules = self.casino_rules
+        n_hands = 2 if split_hand else 1
+        stake = 1
+        while not BUSTED[state]:
+            index = state * CARD_SLOTS + upcard
+            action = resolve_action(self.action_table[index], self.fallback_table[index], state, rules, n_hands,
+                                    split_aces, resplits=False)
+            if action == STAND:
+                break
+            if position >= end:
+                return None
+            state = NEXT_STATE[state * CARD_SLOTS + cards[position]]
+            position += 1
+            if action == DOUBLE:
+                stake = 2
+                break
+        return state, stake, position
+
+    def play(self, cards, position, end, state, upcard, dealer_state, action):
+        """
+        Plays a round from its first decision.
+
+        Parameters:
+        - cards: Card values of the shoe (such as Shoe.cards).
+        - position: Index of the first card after the initial deal.
+        - end: Index past the last card that may be used.
+        - state, upcard, dealer_state: The player's two-card state, the upcard and the dealer's two-card state.
+        - action: Action code of the first decision.
+
+        Returns:
+        - The round's net units, or None if the shoe would run out.
+        """
+        if action == SURRENDER:
+            return -0.5
+        hands = []
+        if action == SPLIT:
+            if position + 2 > end:
+                return None
+            pair_card = PAIR[state]
+            single = NEXT_STATE[pair_card] * CARD_SLOTS
+            # BlackjackSimulation deals the new hand's card first, then the replacement card
+            second_hand = NEXT_STATE[single + cards[position]]
+            first_hand = NEXT_STATE[single + cards[position + 1]]
+            position += 2
+            split_aces = pair_card == 11
+            for hand in (first_hand, second_hand):
+                played = self._play_on(hand, upcard, True, split_aces, cards, position, end)
+                if played is None:
+                    return None
+                hand, stake, position = played
+                hands.append((hand, stake))
+        elif action == STAND:
+            hands.append((state, 1))
+        else:
+            if position >= end:
+                return None
+            state = NEXT_STATE[state * CARD_SLOTS + cards[position]]
+            position += 1
+            if action == DOUBLE:
+                hands.append((state, 2))
+            else:
+                played = self._play_on(state, upcard, False, False, cards, position, end)
+                if played is None:
+                    return None
+                state, stake, position = played
+                hands.append((state, stake))
+
+        if all(BUSTED[hand] for hand, _ in hands):
+            return float(-sum(stake for _, stake in hands))
+        done = self.dealer_done
+        while not done[dealer_state]:
+            if position >= end:
+                return None
+            dealer_state = NEXT_STATE[dealer_state * CARD_SLOTS + cards[position]]
+            position += 1
+        dealer_total = 0 if BUSTED[dealer_state] else TOTAL[dealer_state]
+        net = 0.0
+        for hand, stake in hands:
+            if BUSTED[hand] or TOTAL[hand] < dealer_total:
+                net -= stake
+            elif TOTAL[hand] > dealer_total:
+                net += stake
+        return net
+
+    def evaluate(self, cards, position, end, state, upcard, dealer_state):
+        """
+        Plays a first decision out for every allowed action on the same cards.
+
+        Returns:
+        - [(action code, net units)], or None if any of them would run out of cards.
+        """
+        nets = []
+        for action in self.allowed_actions(state):
+            net = self.play(cards, position, end, state, upcard, dealer_state, action)
+            if net is None:
+                return None
+            nets.append((action, net))
+        return nets
+
+def collect_count_stats(casino_rules, n_shoes, seed=0, strategy=basic_strategy, tc_range=DEFAULT_TC_RANGE,
+                        decisions=True, progress=None):
+    """
+    Plays whole shoes, binning every round by its betting true count and every first decision by its own.
+
+    The betting true count is `calculate_true_count()` before the round.
+    The decision count is what the player sees at the first decision: the
+    primary running count with the player's two cards and the upcard, over
+    the decks not yet seen (the hole card included). Before each round that
+    is not a natural, the first decision is played out for every allowed
+    action on the cards the shoe will deal next (see DecisionRollout); the
+    round itself is then played as usual, so the rounds and their counts are
+    those of a plain run of the same seed.
+
+    Parameters:
+    - casino_rules: CasinoRules of the table; the shoes are played on a copy in which shoe i of its
+      stream is shoe i of `seed`, so the caller's rules are left unchanged.
+    - n_shoes: Number of shoes to play to the cut card.
+    - seed: Seed of the shoes.
+    - strategy: Strategy dict in the format of `basic_strategy`.
+    - tc_range: (low, high) true counts of the outer bins.
+    - decisions: Whether to collect the DecisionBins (the rollouts cost about as much as the rounds).
+    - progress: Optional function called with the number of shoes played after every shoe.
+
+    Returns:
+    - (TrueCountBins, DecisionBins or None).
+    """
+    low, high = tc_range
+    rounds = TrueCountBins(low, high)
+    decision_bins = DecisionBins(low, high) if decisions else None
+    casino_rules = CasinoRules(**casino_rules.as_dict(), seed=seed, stream=casino_rules.stream)
+    rollout = DecisionRollout(casino_rules, strategy) if decisions else None
+    simulation = BlackjackSimulation(casino_rules, strategy=strategy)
+    tags = casino_rules.counter.primary_tags
+    for shoe_number in range(n_shoes):
+        casino_rules.load_shoe(shoe_number)
+        index = casino_rules.shoe_index
+        shoe = casino_rules.shoe
+        while casino_rules.cards_dealt < casino_rules.cut_card:
+            casino_rules.start_round()
+            true_count = casino_rules.calculate_true_count()
+            start = shoe.cursor
+            if decisions and start + 4 <= shoe.size:
+                cards = shoe.cards
+                first_card, upcard, second_card, hole_card = cards[start:start + 4]
+                state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+                dealer_state = NEXT_STATE[NEXT_STATE[upcard] * CARD_SLOTS + hole_card]
+                if TOTAL[state] != 21 and TOTAL[dealer_state] != 21:
+                    nets = rollout.evaluate(cards, start + 4, shoe.size, state, upcard, dealer_state)
+                    if nets is not None:
+                        seen = casino_rules.running_count + tags[first_card] + tags[upcard] + tags[second_card]
+                        decision_count = seen * CARDS_PER_DECK / (shoe.size - start - 3)
+                        decision_bins.add(state, upcard, decision_count, rollout.first_action(state, upcard), nets)
+            rounds.add(true_count, simulation.play_round().net)
+            if casino_rules.shoe_index != index:
+                break  # The shoe ran out mid-round and the next one was started
+        if progress is not None:
+            progress(shoe_number + 1)
+    return rounds, decision_bins
+
+def find_index_plays(decision_bins, min_samples=1000, z=2.0, max_std_error=1.0):
+    """
+    Finds the true count at which each deviation from the strategy becomes profitable.
+
+    For every (two-card state, upcard) and every allowed action other than
+    the strategy's, the gain of the action over the strategy's is fitted as a
+    straight line in the true count (DecisionBins.fit). Where the slope is
+    significant and the line crosses zero inside the binned range, the
+    crossing is the index: the deviation gains above it if the slope is
+    positive and below it otherwise. Crossings far from the counts where the
+    situation was mostly seen are extrapolations; their standard error (by
+    the delta method) is large and `max_std_error` drops them.
+
+    Parameters:
+    - decision_bins: DecisionBins from `collect_count_stats`.
+    - min_samples: Fewest decisions of a situation to consider it.
+    - z: Slopes within z standard errors of zero are ignored.
+    - max_std_error: Largest standard error of a reported index.
+
+    Returns:
+    - A list of dicts sorted by hand and upcard, with keys 'state', 'hand', 'upcard', 'basic'
+      and 'deviation' (action names), 'index' (crossing rounded to an integer), 'crossing',
+      'std_error' (of the crossing), 'direction' ('at or above' or 'below'), 'slope' (gain per
+      point of true count) and 'samples'.
+    """
+    low, high = decision_bins.low, decision_bins.high + 1
+    plays = []
+    for state in range(N_STATES):
+        if CARDS[state] != 2:
+            continue
+        for upcard in range(2, 12):
+            basic = decision_bins.basic[state * CARD_SLOTS + upcard]
+            if basic < 0:
+                continue
+            for action in range(N_ACTIONS):
+                if action == basic:
+                    continue
+                fit = decision_bins.fit(state, upcard, action)
+                if fit is None or fit['samples'] < min_samples:
+                    continue
+                slope = fit['slope']
+                if abs(slope) <= z * fit['slope_std_error']:
+                    continue
+                crossing = -fit['intercept'] / slope
+                if not low <= crossing <= high:
+                    continue
+                distance = crossing - fit['mean_true_count']
+                std_error = (fit['residual_std'] * math.sqrt(1 / fit['samples'] + distance * distance / fit['sxx'])
+                             / abs(slope))
+                if std_error > max_std_error:
+                    continue
+                plays.append({
+                    'state': state,
+                    'hand': describe_hand(state),
+                    'upcard': upcard,
+                    'basic': ACTION_NAMES[basic],
+                    'deviation': ACTION_NAMES[action],
+                    'index': round(crossing),
+                    'crossing': crossing,
+                    'std_error': std_error,
+                    'direction': 'at or above' if slope > 0 else 'below',
+                    'slope': slope,
+                    'samples': fit['samples'],
+                })
+    plays.sort(key=lambda play: (PAIR[play['state']] > 0, SOFT[play['state']], -TOTAL[play['state']], play['upcard']))
+    return plays
+
+def _isotonic(values, weights):
+    """Weighted least-squares non-decreasing fit of `values` (pool adjacent violators)."""
+    blocks = []  # [mean, weight, length]
+    for value, weight in zip(values, weights):
+        blocks.append([value, weight, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, weight, length = blocks.pop()
+            previous = blocks[-1]
+            total = previous[1] + weight
+            previous[0] = (previous[0] * previous[1] + mean * weight) / total
+            previous[1] = total
+            previous[2] += length
+    fitted = []
+    for mean, _, length in blocks:
+        fitted.extend([mean] * length)
+    return fitted
+
+class BetRamp:
+    """
+    Bet for each true count bin, usable as a `bet_function` (it is called with the true count).
+
+    The win and standard deviation per round are those of the binned EVs
+    and variances weighted by how often each bin occurred.
+    """
+
+    def __init__(self, low, bets, rows):
+        """
+        Parameters:
+        - low: True count of the first bin.
+        - bets: Bet of each bin from `low` on; counts beyond either end use the end bets.
+        - rows: TrueCountBins.rows() the ramp is measured with.
+        """
+        self.low = low
+        self.high = low + len(bets) - 1
+        self.bets = list(bets)
+        win = second_moment = average_bet = 0.0
+        for row in rows:
+            bet = self.bets[row['true_count'] - low]
+            win += row['frequency'] * bet * row['ev']
+            second_moment += row['frequency'] * bet * bet * (row['variance'] + row['ev'] ** 2)
+            average_bet += row['frequency'] * bet
+        self.win = win                                          # Money won per round
+        self.std = math.sqrt(max(second_moment - win * win, 0.0))  # Standard deviation per round
+        self.average_bet = average_bet
+
+    def __call__(self, true_count):
+        return self.bets[true_count_bin(true_count, self.low, self.high)]
+
+    @property
+    def n0(self):
+        """Rounds needed for the expected win to equal one standard deviation (inf without an edge)."""
+        return self.std ** 2 / self.win ** 2 if self.win > 0 else math.inf
+
+    @property
+    def score(self):
+        """SCORE, 1e6 / N0 (as in src.bankroll)."""
+        return 1e6 / self.n0
+
+    def table(self):
+        """Returns {true count bin: bet}."""
+        return {self.low + i: bet for i, bet in enumerate(self.bets)}
+
+def optimal_bet_ramp(true_count_bins, spread, min_bet=1.0, min_rounds=100):
+    """
+    Finds the bet ramp with the highest SCORE (lowest N0) for a bet spread.
+
+    With bets free, the SCORE is highest for bets proportional to EV /
+    variance of each bin (the Kelly bets). The binned EVs are first made
+    non-decreasing in the true count (weighted isotonic regression), so the
+    ramp never bets more on a lower count because of noise in a thin bin. With a spread, the best ramp is
+    that proportional bet clipped to [min_bet, min_bet * spread], with the
+    minimum bet wherever the EV is not positive; only the scale k of the
+    proportional part is left, and it is chosen by trying every k at which a
+    bin reaches either limit plus a geometric grid between them.
+
+    Parameters:
+    - true_count_bins: TrueCountBins of rounds played at a flat bet.
+    - spread: Largest bet over the smallest.
+    - min_bet: Smallest bet.
+    - min_rounds: Bins with fewer rounds get the minimum bet (their EV is too noisy to bet on).
+
+    Returns:
+    - A BetRamp.
+    """
+    if spread < 1:
+        raise ValueError("spread must be at least 1")
+    rows = true_count_bins.rows()
+    low = true_count_bins.low
+    n_bins = true_count_bins.high - low + 1
+    kelly = [0.0] * n_bins  # EV / variance of each bin worth betting on
+    used = [row for row in rows if row['rounds'] >= min_rounds and row['variance'] > 0]
+    for row, ev in zip(used, _isotonic([row['ev'] for row in used], [row['rounds'] for row in used])):
+        if ev > 0:
+            kelly[row['true_count'] - low] = ev / row['variance']
+    max_bet = min_bet * spread
+
+    def ramp(k):
+        return BetRamp(low, [min(max(k * f, min_bet), max_bet) for f in kelly], rows)
+
+    positive = [f for f in kelly if f > 0]
+    if not positive:
+        return ramp(0.0)
+    # Beyond these scales every positive bin is at a limit, so nothing changes
+    k_low = min_bet / max(positive)
+    k_high = max_bet / min(positive)
+    candidates = {min_bet / f for f in positive} | {max_bet / f for f in positive}
+    steps = 200
+    candidates.update(k_low * (k_high / k_low) ** (i / steps) for i in range(steps + 1))
+    best = None
+    for k in sorted(candidates):
+        candidate = ramp(k)
+        if best is None or candidate.score > best.score:
+            best = candidate
+    return best
@@ -0,0 +1,82 @@
+# events.py
+
+import logging
+
+# Human-readable templates for every event the simulation can emit. The
+# wording follows the console output the simulator used to print directly.
+EVENT_MESSAGES = {
+    'reshuffle': "Reshuffling shoe based on penetration level.",
+    'hand_start': "--- Simulating Hand ---\nStarting running count for this hand: {running_count}",
+    'deal': "Dealt card: {card}, Updated Running Count: {running_count}",
+    'initial': "Player starting hand: {player_hand} (Total: {player_total})\nDealer showing: {upcard}",
+    'natural': "{message}",
+    'decision': "Player hand: {hand} (Value: {value}, {softness}), Dealer card: {dealer_card}, Action: {action}",
+    'split': "Player splits: New hands: {hands}",
+    'split_limit': "Maximum splits reached.",
+    'bust': "Player busts!",
+    'stand': "Player stands.",
+    'double': "Player doubles down.",
+    'surrender': "Player surrenders half the bet.",
+    'all_busted': "All player hands have busted. Dealer wins.",
+    'dealer_reveal': "Dealer's full hand: {dealer_hand}",
+    'dealer_hit': "Dealer hits: {dealer_hand}",
+    'dealer_bust': "Dealer busts! Player wins!",
+    'hand_result': "Final Player hand: {hand} (Value: {value})\n{message}",
+}
+
+
+def format_event(event, fields):
+    """Renders an event as the line(s) of text a console trace would show."""
+    template = EVENT_MESSAGES.get(event)
+    if template is None:
+        return f"{event}: {fields}"
+    return template.format(**fields)
+
+
+class NullEventSink:
+    """
+    Discards every event.
+
+    This is the default sink: the simulation checks `enabled` before building
+    any event payload, so tracing costs nothing when it is switched off.
+    """
+    enabled = False
+
+    def emit(self, event, **fields):
+        pass
+
+
+class LoggingEventSink:
+    """Writes every event to a standard library logger."""
+    enabled = True
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """
+        Parameters:
+        - logger: Logger to write to (default is the 'blackjack' logger).
+        - level: Logging level used for every event (default is INFO).
+        """
+        self.logger = logger or logging.getLogger('blackjack')
+        self.level = level
+
+    def emit(self, event, **fields):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, format_event(event, fields))
+
+
+class CollectingEventSink:
+    """Keeps every event in memory as an (event, fields) tuple, mostly for tests and debugging."""
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, **fields):
+        self.events.append((event, fields))
+
+    def of_type(self, event):
+        """Returns the fields of every collected event with the given name."""
+        return [fields for name, fields in self.events if name == event]
+
+    def clear(self):
+        self.events = []
@@ -0,0 +1,226 @@
+# exact.py
+
+from functools import lru_cache
+
+from src.basic_strategy import basic_strategy
+from src.hand_state import (BUSTED, CARD_SLOTS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, NEXT_STATE, PAIR, SPLIT, STAND,
+                            SURRENDER, TOTAL, compile_strategy, resolve_action)
+from src.shoe import RANKS, SINGLE_DECK
+
+# Index of each dealer result in a distribution: final totals 17-21, then bust
+DEALER_RESULTS = (17, 18, 19, 20, 21, 'bust')
+_BUST = 5
+
+# Dealer distributions kept by `dealer_distribution`; one exact calculation or generated strategy needs 540
+DEALER_CACHE_SIZE = 4096
+
+def full_composition(decks):
+    """Returns the card counts of a full shoe, ordered like RANKS."""
+    return tuple(SINGLE_DECK.count(rank) * decks for rank in RANKS)
+
+def remove_card(composition, card):
+    """Returns the composition with one card of the given value removed."""
+    i = card - 2
+    return composition[:i] + (composition[i] - 1,) + composition[i + 1:]
+
+@lru_cache(maxsize=DEALER_CACHE_SIZE)
+def dealer_distribution(composition, upcard, dealer_hits_soft_17):
+    """
+    Computes the dealer's final-total distribution by recursive enumeration of the shoe.
+
+    The dealer's hand is given that the dealer does not have a natural, since the
+    simulator settles naturals before anyone plays. Results are memoized on
+    (composition, upcard, dealer_hits_soft_17), keeping the DEALER_CACHE_SIZE
+    most recently used.
+
+    Parameters:
+    - composition: Remaining card counts ordered like RANKS (the upcard already removed).
+    - upcard: Dealer's face-up card (2-11).
+    - dealer_hits_soft_17: True if the dealer hits soft 17.
+
+    Returns:
+    - A tuple of probabilities for final totals 17, 18, 19, 20, 21 and bust.
+    """
+    done = DEALER_DONE_H17 if dealer_hits_soft_17 else DEALER_DONE_S17
+    memo = {}
+
+    def finish(comp, state):
+        if done[state]:
+            result = [0.0] * 6
+            result[_BUST if BUSTED[state] else TOTAL[state] - 17] = 1.0
+            return result
+        key = (comp, state)
+        cached = memo.get(key)
+        if cached is not None:
+            return cached
+        result = [0.0] * 6
+        remaining = sum(comp)
+        row = state * CARD_SLOTS
+        for i, count in enumerate(comp):
+            if count:
+                p = count / remaining
+                for j, q in enumerate(finish(comp[:i] + (count - 1,) + comp[i + 1:], NEXT_STATE[row + i + 2])):
+                    result[j] += p * q
+        memo[key] = result
+        return result
+
+    # The hole card, excluding the card that would give the dealer a natural
+    natural_card = 10 if upcard == 11 else 11 if upcard == 10 else None
+    up_state = NEXT_STATE[upcard]
+    remaining = sum(composition)
+    if natural_card is not None:
+        remaining -= composition[natural_card - 2]
+    distribution = [0.0] * 6
+    for i, count in enumerate(composition):
+        card = i + 2
+        if count and card != natural_card:
+            p = count / remaining
+            comp = composition[:i] + (count - 1,) + composition[i + 1:]
+            for j, q in enumerate(finish(comp, NEXT_STATE[up_state * CARD_SLOTS + card])):
+                distribution[j] += p * q
+    return tuple(distribution)
+
+def dealer_natural_probability(composition, upcard):
+    """Probability that the hole card gives the dealer a natural."""
+    natural_card = 10 if upcard == 11 else 11 if upcard == 10 else None
+    if natural_card is None:
+        return 0.0
+    return composition[natural_card - 2] / sum(composition)
+
+def stand_ev(total, distribution):
+    """Expected net units of standing on `total` against a dealer distribution."""
+    if total > 21:
+        return -1.0
+    ev = distribution[_BUST]
+    for i, p in enumerate(distribution[:_BUST]):
+        dealer_total = 17 + i
+        if total > dealer_total:
+            ev += p
+        elif total < dealer_total:
+            ev -= p
+    return ev
+
+class ExactCalculator:
+    """
+    Computes the exact expected value of a fixed strategy under a set of CasinoRules.
+
+    The dealer's final-total distribution for every upcard and starting
+    composition comes from `dealer_distribution`. The player's hand is played
+    from the compiled strategy table, with every card drawn removed from the
+    shoe, and the rules (doubling, double after split, late surrender, one
+    card to split Aces) and the strategy's fallbacks apply through
+    `src.hand_state.resolve_action`, exactly as in `simulate_hand`.
+
+    Two standard approximations keep the computation to seconds: the dealer
+    draws from the shoe as it was after the initial deal (the player's later
+    cards are not removed from it), and split hands are played as two
+    independent hands without further resplits (`resolve_action` is called
+    with resplits=False).
+    """
+
+    def __init__(self, casino_rules, strategy=basic_strategy):
+        """
+        Parameters:
+        - casino_rules: CasinoRules describing the table.
+        - strategy: Strategy dict in the format of `basic_strategy`.
+        """
+        self.casino_rules = casino_rules
+        self.action_table, self.fallback_table = compile_strategy(strategy)
+        self.composition = full_composition(casino_rules.decks)
+
+    def dealer_distribution(self, composition, upcard):
+        return dealer_distribution(composition, upcard, self.casino_rules.dealer_hits_soft_17)
+
+    def _play_ev(self, state, comp, upcard, distribution, split_hand, memo):
+        """Expected net units of playing a (non-natural) hand from `state` by the strategy table."""
+        if BUSTED[state]:
+            return -1.0
+        key = (state, comp, split_hand)
+        cached = memo.get(key)
+        if cached is not None:
+            return cached
+        rules = self.casino_rules
+        index = state * CARD_SLOTS + upcard
+        # The rules of every engine, with the no-resplit approximation of this calculator
+        action = resolve_action(self.action_table[index], self.fallback_table[index], state, rules,
+                                2 if split_hand else 1, resplits=False)
+
+        remaining = sum(comp)
+        row = state * CARD_SLOTS
+        if action == STAND:
+            ev = stand_ev(TOTAL[state], distribution)
+        elif action == SURRENDER:
+            ev = -0.5
+        elif action == SPLIT:
+            # Two independent hands, each starting from the pair card plus one new card
+            pair_card = PAIR[state]
+            single = NEXT_STATE[pair_card]
+            one_card = pair_card == 11 and not rules.hit_split_aces
+            ev = 0.0
+            for i, count in enumerate(comp):
+                if count:
+                    next_state = NEXT_STATE[single * CARD_SLOTS + i + 2]
+                    if one_card:
+                        hand_ev = stand_ev(TOTAL[next_state], distribution)
+                    else:
+                        next_comp = comp[:i] + (count - 1,) + comp[i + 1:]
+                        hand_ev = self._play_ev(next_state, next_comp, upcard, distribution, True, memo)
+                    ev += count / remaining * hand_ev
+            ev *= 2
+        elif action == DOUBLE:
+            ev = 0.0
+            for i, count in enumerate(comp):
+                if count:
+                    ev += count / remaining * stand_ev(TOTAL[NEXT_STATE[row + i + 2]], distribution)
+            ev *= 2
+        else:
+            ev = 0.0
+            for i, count in enumerate(comp):
+                if count:
+                    next_comp = comp[:i] + (count - 1,) + comp[i + 1:]
+                    ev += count / remaining * self._play_ev(NEXT_STATE[row + i + 2], next_comp,
+                                                            upcard, distribution, split_hand, memo)
+        memo[key] = ev
+        return ev
+
+    def hand_ev(self, first_card, second_card, upcard):
+        """
+        Expected net units of one round given the player's two cards and the dealer's upcard.
+
+        Returns:
+        - The EV including the chance of naturals for either side.
+        """
+        comp = remove_card(remove_card(remove_card(self.composition, first_card), second_card), upcard)
+        p_dealer_natural = dealer_natural_probability(comp, upcard)
+        if first_card + second_card == 21:
+            return (1 - p_dealer_natural) * self.casino_rules.blackjack_payout
+        distribution = self.dealer_distribution(comp, upcard)
+        state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+        play = self._play_ev(state, comp, upcard, distribution, False, {})
+        return -p_dealer_natural + (1 - p_dealer_natural) * play
+
+    def expected_value(self):
+        """
+        Returns the player's exact expected net units per round (the negative of the house edge).
+        """
+        comp = self.composition
+        total = sum(comp)
+        ev = 0.0
+        for i, first_count in enumerate(comp):
+            first_card = i + 2
+            comp1 = remove_card(comp, first_card)
+            for j in range(i, len(comp)):
+                second_card = j + 2
+                # Both orders of two different cards give the same hand
+                p_pair = first_count / total * comp1[j] / (total - 1) * (1 if i == j else 2)
+                if not p_pair:
+                    continue
+                comp2 = remove_card(comp1, second_card)
+                for k, up_count in enumerate(comp2):
+                    if up_count:
+                        ev += p_pair * up_count / (total - 2) * self.hand_ev(first_card, second_card, k + 2)
+        return ev
+
+def house_edge(casino_rules, strategy=basic_strategy):
+    """Returns the exact house edge (as a fraction of the initial bet) of a strategy under the given rules."""
+    return -ExactCalculator(casino_rules, strategy).expected_value()
@@ -0,0 +1,191 @@
+# hand_state.py
+
+from src.basic_strategy import basic_strategy
+
+# A hand is represented by a small integer state instead of its list of cards.
+# Every state records the hand's hard points (Aces counted as 1), whether it
+# holds an Ace, its pair rank (two equal cards only) and its card count
+# (capped at 3), which is all that play, strategy and settlement need.
+# NEXT_STATE[state * 12 + card] gives the state after drawing `card`, so
+# dealing a card to any hand - player or dealer - is a single list index.
+
+CARD_SLOTS = 12  # Row width of the per-state tables, indexed directly by card value (2-11)
+
+# Integer action codes of the compiled strategy tables
+HIT, STAND, DOUBLE, SPLIT, SURRENDER = 0, 1, 2, 3, 4
+ACTION_CODES = {'hit': HIT, 'stand': STAND, 'double': DOUBLE, 'split': SPLIT, 'surrender': SURRENDER}
+ACTION_NAMES = ('hit', 'stand', 'double', 'split', 'surrender')
+
+def _build_states():
+    """Enumerates every reachable hand state and the state x card transition table."""
+    keys = [(0, False, 0, 0, 0)]  # (hard points, has Ace, pair rank, cards, lone card); state 0 is the empty hand
+    index = {keys[0]: 0}
+    transitions = {}
+    pending = [0]
+    bust_key = ('bust',)
+    index[bust_key] = 1
+    keys.append(bust_key)
+    while pending:
+        state = pending.pop()
+        hard, has_ace, _, cards, lone_card = keys[state]
+        for card in range(2, 12):
+            points = hard + (1 if card == 11 else card)
+            ace = has_ace or card == 11
+            if points > 21:
+                transitions[state, card] = 1
+                continue
+            if cards == 0:
+                key = (points, ace, 0, 1, card)  # Keep the first card to detect pairs
+            elif cards == 1:
+                key = (points, ace, card if card == lone_card else 0, 2, 0)
+            else:
+                key = (points, ace, 0, 3, 0)
+            if key not in index:
+                index[key] = len(keys)
+                keys.append(key)
+                pending.append(index[key])
+            transitions[state, card] = index[key]
+
+    n = len(keys)
+    next_state = [1] * (n * CARD_SLOTS)  # Unused card slots and the bust state lead to bust
+    for (state, card), target in transitions.items():
+        next_state[state * CARD_SLOTS + card] = target
+    hard_points = [22 if key == bust_key else key[0] for key in keys]
+    soft = [key != bust_key and key[1] and key[0] <= 11 for key in keys]
+    totals = [points + 10 if is_soft else points for points, is_soft in zip(hard_points, soft)]
+    pairs = [0 if key == bust_key else key[2] for key in keys]
+    card_counts = [3 if key == bust_key else key[3] for key in keys]
+    return next_state, totals, soft, pairs, card_counts, index
+
+NEXT_STATE, TOTAL, SOFT, PAIR, CARDS, _STATE_INDEX = _build_states()
+EMPTY, BUST = 0, 1
+N_STATES = len(TOTAL)
+BUSTED = [total > 21 for total in TOTAL]
+
+def hand_state(cards):
+    """Returns the state of a hand given as a list of card values."""
+    hard = 0
+    for card in cards:
+        hard += 1 if card == 11 else card
+    if hard > 21:
+        return BUST
+    n_cards = len(cards)
+    if n_cards == 0:
+        return EMPTY
+    has_ace = 11 in cards
+    if n_cards == 1:
+        key = (hard, has_ace, 0, 1, cards[0])
+    elif n_cards == 2:
+        key = (hard, has_ace, cards[0] if cards[0] == cards[1] else 0, 2, 0)
+    else:
+        key = (hard, has_ace, 0, 3, 0)
+    return _STATE_INDEX[key]
+
+def dealer_done_table(dealer_hits_soft_17):
+    """Returns, for every state, whether the dealer stops drawing (17 or more, or bust)."""
+    return [total >= 17 and not (dealer_hits_soft_17 and total == 17 and is_soft)
+            for total, is_soft in zip(TOTAL, SOFT)]
+
+DEALER_DONE_S17 = dealer_done_table(False)
+DEALER_DONE_H17 = dealer_done_table(True)
+
+def double_allowed_table(double_on_any_two):
+    """
+    Returns, for every state, whether its first two cards may be doubled.
+
+    With double_on_any_two unset, doubling is restricted to hard 9, 10 and 11.
+    """
+    return [cards == 2 and (double_on_any_two or (not is_soft and 9 <= total <= 11))
+            for cards, total, is_soft in zip(CARDS, TOTAL, SOFT)]
+
+DOUBLE_ANY_TWO = double_allowed_table(True)
+DOUBLE_9_TO_11 = double_allowed_table(False)
+
+def resolve_action(action, fallback, state, rules, n_hands=1, split_aces=False, resplits=True):
+    """
+    Returns the action actually played: the strategy's `action`, or its `fallback` where the rules forbid it.
+
+    Every engine plays its decisions through this function, so they agree
+    on what is allowed:
+    - Split Aces get one card each (unless the rules allow hitting them) and may at most be split again.
+    - A pair may be split while there are fewer than `max_splits` hands, and Aces split again only
+      with `resplit_aces`.
+    - A double needs a two-card hand the rules allow doubling, and `double_after_split` after a split.
+    - Late surrender is only allowed on the first two cards, before any split.
+
+    Parameters:
+    - action, fallback: Entries of the compiled strategy tables for the hand and upcard (see
+      `compile_strategy`).
+    - state: Hand state.
+    - rules: CasinoRules of the table.
+    - n_hands: Number of player hands in the round so far (more than 1 after a split).
+    - split_aces: True once a pair of Aces has been split in the round.
+    - resplits: Set to False for engines that play split hands without splitting them again.
+    """
+    one_card = split_aces and not rules.hit_split_aces
+    if action == SPLIT:
+        if (PAIR[state] and n_hands < rules.max_splits and (resplits or n_hands == 1)
+                and (rules.resplit_aces or not split_aces)):
+            return SPLIT
+        return STAND if one_card else fallback
+    if one_card:
+        return STAND
+    if action == DOUBLE:
+        allowed = DOUBLE_ANY_TWO if rules.double_on_any_two else DOUBLE_9_TO_11
+        if not (allowed[state] and (n_hands == 1 or rules.double_after_split)):
+            return fallback
+    elif action == SURRENDER:
+        if not (rules.late_surrender and n_hands == 1 and CARDS[state] == 2):
+            return fallback
+    return action
+
+def _lookup(strategy, state, upcard, use_pairs=True):
+    """Returns the strategy dict entry for a state, with get_action's fallbacks for missing entries."""
+    total = TOTAL[state]
+    if total >= 21:
+        return 'stand'
+    if use_pairs and PAIR[state]:
+        return strategy['pairs'].get(PAIR[state], {}).get(upcard, 'stand')
+    if SOFT[state]:
+        return strategy['soft_totals'].get(total, {}).get(upcard, 'hit')
+    return strategy['hard_totals'].get(total, {}).get(upcard, 'hit')
+
+def _split_entry(entry, state):
+    """
+    Splits an entry such as 'double/stand' into (action, fallback).
+
+    Without a named fallback a double on soft 18 or more stands (the usual
+    'Ds' entry of strategy charts) and anything else hits.
+    """
+    action, _, fallback = entry.partition('/')
+    if not fallback:
+        fallback = 'stand' if action == 'double' and SOFT[state] and TOTAL[state] >= 18 else 'hit'
+    return action, fallback
+
+def compile_strategy(strategy=basic_strategy):
+    """
+    Compiles a strategy dict into flat (actions, fallbacks) tables indexed by `state * CARD_SLOTS + upcard`.
+
+    Lookups follow `BlackjackSimulation.get_action`: two equal cards use the
+    pairs table (stand if missing), soft hands the soft totals (hit if
+    missing) and everything else the hard totals (hit if missing). A total of
+    21 always stands.
+
+    An entry may name the action to take when its first choice is not
+    allowed, as in 'double/stand' or 'surrender/stand'; otherwise a double on
+    soft 18 or more falls back to a stand, and any other double or surrender
+    to a hit. A pair that cannot be split is played by
+    its hard or soft total. The fallback table only ever holds hit or stand.
+    """
+    actions = [HIT] * (N_STATES * CARD_SLOTS)
+    fallbacks = [HIT] * (N_STATES * CARD_SLOTS)
+    for state in range(N_STATES):
+        for upcard in range(2, 12):
+            action, fallback = _split_entry(_lookup(strategy, state, upcard), state)
+            if action == 'split':
+                total_action, total_fallback = _split_entry(_lookup(strategy, state, upcard, use_pairs=False),
+                                                            state)
+                fallback = total_action if total_action in ('hit', 'stand') else total_fallback
+            actions[state * CARD_SLOTS + upcard] = ACTION_CODES[action]
+            fallbacks[state * CARD_SLOTS + upcard] = ACTION_CODES[fallback]
+    return actions, fallbacks
@@ -0,0 +1,182 @@
+# history.py
+
+import struct
+
+import numpy as np
+
+# Most decisions and player hands kept per round; longer rounds keep their first ones
+MAX_ACTIONS = 8
+MAX_HANDS = 4
+NO_ACTION = -1
+
+# One fixed-width, unpadded record per round. Action codes are those of
+# src.hand_state (-1 pads unused slots), a busted hand keeps its total over
+# 21 and unused hand slots hold 0. `net` is in units of the bet.
+RECORD_DTYPE = np.dtype([
+    ('stream', '<u4'),                    # Shoe stream (parallel block or vectorized lane), see src.rng
+    ('shoe', '<u4'),                      # Number of the shoe within its stream
+    ('true_count', '<f4'),                # Primary true count when the bet was placed
+    ('bet', '<f4'),
+    ('cards', 'i1', (2,)),                # Player's first two cards
+    ('upcard', 'i1'),
+    ('hole_card', 'i1'),
+    ('actions', 'i1', (MAX_ACTIONS,)),    # Decisions in the order they were played
+    ('hands', 'i1'),                      # Number of player hands after splits
+    ('totals', 'i1', (MAX_HANDS,)),       # Final total of each player hand
+    ('dealer_total', 'i1'),
+    ('outcome', 'i1'),                    # Index into src.simulation.OUTCOMES
+    ('net', '<f4'),
+])
+
+# File layout: a 32-byte header (magic, record size, engine, record count, seed) followed by the raw records.
+# The seed and each record's (stream, shoe) rebuild the shoe the round was dealt from with
+# CasinoRules(seed=seed, stream=stream).load_shoe(shoe), whichever engine played it.
+MAGIC = b'BJHIST\x00\x03'
+HEADER = struct.Struct('<8sIB3xQq')
+ENGINES = ('scalar', 'vectorized')
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+class HistoryRecorder:
+    """
+    Streams round records to a compact binary file in large buffered chunks.
+
+    Rounds are added one at a time with `record` (scalar engine) or as a
+    structured array with `write` (vectorized engine). Records are kept in
+    memory until `chunk_size` of them are waiting, then written in one call.
+    The record count in the header is updated by `flush` and `close`, so a
+    file is readable up to its last flush. Use as a context manager to make
+    sure the last chunk is written.
+    """
+
+    def __init__(self, path, seed, engine='scalar', chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Parameters:
+        - path: File to create (overwritten if it exists).
+        - seed: Integer seed of the recorded run's shoes (CasinoRules.seed or VectorizedSimulation.seed).
+        - engine: Engine that plays the rounds, one of ENGINES.
+        - chunk_size: Records buffered before each write.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}' (expected one of {', '.join(ENGINES)})")
+        if not isinstance(seed, int) or not -2 ** 63 <= seed < 2 ** 63:
+            raise ValueError(f"A history needs a 64-bit integer seed to replay its shoes, got {seed!r}")
+        self.path = path
+        self.seed = seed
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.count = 0  # Records written to the file so far
+        self._rows = []  # Records from `record`, as tuples
+        self._file = open(path, 'wb')
+        self._file.write(self._header())
+
+    def _header(self):
+        return HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, ENGINES.index(self.engine), self.count, self.seed)
+
+    def record(self, stream, shoe, true_count, bet, cards, upcard, hole_card, actions, totals, dealer_total, outcome, net):
+        """
+        Adds one round.
+
+        Parameters:
+        - stream, shoe: Stream and number of the shoe the round was dealt from.
+        - true_count, bet: Primary true count when the bet was placed, and the bet.
+        - cards, upcard, hole_card: The player's two cards and the dealer's cards.
+        - actions: Action codes of the decisions, in order.
+        - totals: Final total of every player hand.
+        - dealer_total: The dealer's final total.
+        - outcome: Outcome code of the round (an index into OUTCOMES).
+        - net: Net units won by the player.
+        """
+        actions = (tuple(actions) + (NO_ACTION,) * MAX_ACTIONS)[:MAX_ACTIONS]
+        hand_totals = (tuple(totals) + (0,) * MAX_HANDS)[:MAX_HANDS]
+        self._rows.append((stream, shoe, true_count, bet, cards, upcard, hole_card, actions, len(totals), hand_totals,
+                           dealer_total, outcome, net))
+        if len(self._rows) >= self.chunk_size:
+            self._write_rows()
+
+    def write(self, records):
+        """Adds a structured array of rounds with dtype RECORD_DTYPE."""
+        self._write_rows()
+        self._file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+        self.count += len(records)
+
+    def _write_rows(self):
+        if self._rows:
+            self._file.write(np.array(self._rows, dtype=RECORD_DTYPE).tobytes())
+            self.count += len(self._rows)
+            self._rows = []
+
+    def flush(self):
+        """Writes every buffered record and updates the record count in the header."""
+        self._write_rows()
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(position)
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def history_header(path):
+    """
+    Reads the header of a history file.
+
+    Returns:
+    - A dict with keys 'records', 'engine' and 'seed'.
+    """
+    with open(path, 'rb') as f:
+        magic, record_size, engine, count, seed = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or record_size != RECORD_DTYPE.itemsize or engine >= len(ENGINES):
+        raise ValueError(f"{path} is not a hand history file of this version")
+    return {'records': count, 'engine': ENGINES[engine], 'seed': seed}
+
+def read_history(path):
+    """
+    Memory-maps a history file (see `history_header` for the run's seed and engine).
+
+    Returns:
+    - A read-only structured array (dtype RECORD_DTYPE) backed by the file;
+      columns such as `records['net']` are views, so nothing is copied until
+      the data is used.
+    """
+    count = history_header(path)['records']
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+
+def ev_by_situation(records, chunk_size=1 << 22):
+    """
+    Groups recorded rounds by the player's starting total and the dealer's upcard.
+
+    The records are processed in chunks, so a memory-mapped history of any
+    size is summarised in bounded memory.
+
+    Returns:
+    - {(starting total, soft, upcard): (rounds, mean net units)} for every situation recorded.
+    """
+    slots = 22 * 2 * 12  # Indexed by (total * 2 + soft) * 12 + upcard
+    counts = np.zeros(slots, dtype=np.int64)
+    sums = np.zeros(slots)
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        cards = chunk['cards'].astype(np.int64)
+        total = cards.sum(axis=1)
+        soft = (cards == 11).any(axis=1)
+        total[total == 22] = 12  # A pair of Aces
+        index = (total * 2 + soft) * 12 + chunk['upcard']
+        counts += np.bincount(index, minlength=slots)
+        sums += np.bincount(index, weights=chunk['net'], minlength=slots)
+    table = {}
+    for index in np.nonzero(counts)[0]:
+        total, rest = divmod(int(index), 24)
+        soft, upcard = divmod(rest, 12)
+        table[total, bool(soft), upcard] = (int(counts[index]), float(sums[index] / counts[index]))
+    return table
@@ -0,0 +1,76 @@
+# instrumentation.py
+
+from time import perf_counter
+
+# Phases timed in a round, in the order they happen. 'strategy' and 'split'
+# run inside 'player', and 'reshuffle' inside 'start_round' (or inside a draw
+# when a shoe runs out mid-round).
+PHASES = ('start_round', 'reshuffle', 'initial_deal', 'player', 'strategy', 'split', 'dealer', 'settle')
+
+class Instrumentation:
+    """
+    Per-phase wall time and event counters for BlackjackSimulation and CasinoRules.
+
+    Instrumentation is off unless an instance is passed to the simulation:
+    every hook in the hot loop sits behind an `is not None` check of a
+    local, so a simulation without it pays nothing but that check.
+    """
+
+    def __init__(self):
+        self.times = {}     # Phase -> seconds spent in it
+        self.calls = {}     # Phase -> number of times it ran
+        self.counters = {}  # Event -> count ('rounds', 'player_hands', 'splits', 'doubles', ...)
+
+    def lap(self, phase, start):
+        """Charges the time since `start` to `phase` and returns the current time, to start the next phase."""
+        now = perf_counter()
+        self.times[phase] = self.times.get(phase, 0.0) + now - start
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        return now
+
+    def count(self, event, n=1):
+        self.counters[event] = self.counters.get(event, 0) + n
+
+    def reset(self):
+        self.times.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+    @property
+    def hands_per_round(self):
+        """Player hands played per round, counting every split hand."""
+        rounds = self.counters.get('rounds', 0)
+        return self.counters.get('player_hands', 0) / rounds if rounds else 0.0
+
+    def summary(self):
+        """
+        Returns one row dict per timed phase: 'phase', 'seconds', 'calls',
+        'us_per_call' and 'share' (of the time spent in whole rounds).
+        """
+        total = self.times.get('round', 0.0)
+        rows = []
+        for phase in PHASES + ('round',):
+            calls = self.calls.get(phase, 0)
+            if not calls:
+                continue
+            seconds = self.times[phase]
+            rows.append({
+                'phase': phase,
+                'seconds': seconds,
+                'calls': calls,
+                'us_per_call': seconds / calls * 1e6,
+                'share': seconds / total if total else 0.0,
+            })
+        return rows
+
+    def format_table(self):
+        """Renders the phase timings and the counters as a text table."""
+        lines = [f"{'phase':<14} {'seconds':>9} {'calls':>11} {'us/call':>9} {'share':>7}"]
+        for row in self.summary():
+            lines.append(f"{row['phase']:<14} {row['seconds']:>9.3f} {row['calls']:>11,} "
+                         f"{row['us_per_call']:>9.2f} {row['share']:>7.1%}")
+        lines.append("")
+        for event, count in sorted(self.counters.items()):
+            lines.append(f"{event:<14} {count:>11,}")
+        lines.append(f"{'hands/round':<14} {self.hands_per_round:>11.3f}")
+        return "\n".join(lines)
@@ -1,9 +1,82 @@
 # main.py
 
+import argparse
+import logging
+
+from src.basic_strategy import basic_strategy
 from src.casino_rules import CasinoRules  # Make sure this import statement exists
 from src.simulation import BlackjackSimulation
+from src.parallel import run_parallel
+from src.events import LoggingEventSink
+from src.strategy_generator import generate_strategy
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Blackjack simulator")
+    parser.add_argument('--hands', type=int, default=None,
+                        help="Play this many hands silently and print aggregate results "
+                             "(default: trace a single hand)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for batch runs (default: 0)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for batch runs (default: CPU count)")
+    parser.add_argument('--engine', choices=('scalar', 'vectorized'), default='scalar',
+                        help="Batch engine: scalar hands over a process pool, or NumPy lockstep shoes")
+    parser.add_argument('--strategy', choices=('basic', 'optimal'), default='basic',
+                        help="Play the fixed basic strategy table or one generated for these rules")
+    parser.add_argument('--record', default=None, metavar='PATH',
+                        help="Write a binary history of every batch round to PATH (scalar batches run in-process)")
+    parser.add_argument('--bankroll', type=float, default=None,
+                        help="Play bankroll trajectories from this starting bankroll, betting with calculate_bet")
+    parser.add_argument('--trajectories', type=int, default=4096,
+                        help="Bankroll trajectories played in parallel (default: 4096)")
+    parser.add_argument('--rounds', type=int, default=1000,
+                        help="Rounds per bankroll trajectory (default: 1000)")
+    parser.add_argument('--profile', nargs='?', const='blackjack.prof', default=None, metavar='PATH',
+                        help="Play a scalar batch in-process under cProfile, write the stats to PATH "
+                             "(default: blackjack.prof) and print per-phase timings")
+    parser.add_argument('--target-se', type=float, default=None,
+                        help="Play whole shoes until the EV's standard error reaches this target")
+    parser.add_argument('--control', choices=('none', 'upcard', 'deal', 'full'), default='full',
+                        help="Control variate for --target-se runs (default: full)")
+    parser.add_argument('--deviations', type=int, default=None, metavar='SHOES',
+                        help="Play this many shoes and print the EV by true count, the index plays "
+                             "and the best bet ramp for --spread")
+    parser.add_argument('--spread', type=float, default=12,
+                        help="Bet spread of the ramp found by --deviations (default: 12)")
+    parser.add_argument('--exact', action='store_true',
+                        help="Compute the exact expected value of basic strategy instead of simulating")
+    return parser.parse_args(argv)
+
+def profile(casino_rules, n_hands, path, seed=0, strategy=basic_strategy):
+    """
+    Plays `n_hands` hands in-process with instrumentation on and under cProfile.
+
+    The cProfile stats are written to `path` (for pstats or snakeviz), and the
+    per-phase table and the top functions by cumulative time are printed.
+    """
+    import cProfile
+    import pstats
+    from src.instrumentation import Instrumentation
+
+    instrumentation = Instrumentation()
+    casino_rules.seed = seed
+    casino_rules.load_shoe(0)
+    blackjack_sim = BlackjackSimulation(casino_rules, strategy=strategy, instrumentation=instrumentation)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    result = blackjack_sim.run(n_hands)
+    profiler.disable()
+    profiler.dump_stats(path)
+
+    print(f"Hands played: {result.hands}, profile written to {path}")
+    print()
+    print(instrumentation.format_table())
+    print()
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    return result
+
+def main(argv=None):
+    args = parse_args(argv)
 
-def main():
     # Define specific casino rules (modify as needed for different scenarios)
     casino_rules = CasinoRules(
         decks=8,
@@ -18,11 +91,102 @@ def main():
         penetration=0.75
     )
 
-    # Create a simulation with the specified casino rules
-    blackjack_sim = BlackjackSimulation(casino_rules)
+    if args.strategy == 'optimal':
+        strategy = generate_strategy(casino_rules)
+    else:
+        strategy = basic_strategy
+
+    if args.exact:
+        from src.exact import ExactCalculator
+        ev = ExactCalculator(casino_rules, strategy).expected_value()
+        print(f"Exact player EV: {ev:+.5f} units/hand (house edge {-ev:.3%})")
+        return
+
+    if args.bankroll is not None:
+        from src.bankroll import BankrollSimulation  # Needs NumPy
+        bankroll_sim = BankrollSimulation(casino_rules, args.bankroll, trajectories=args.trajectories,
+                                          seed=args.seed, strategy=strategy)
+        result = bankroll_sim.run(args.rounds)
+        print(f"Trajectories: {result.trajectories} x {result.rounds} rounds, bankroll {result.bankroll:g}")
+        print(f"Risk of ruin: {result.risk_of_ruin:.2%} (std error {result.risk_of_ruin_std_error:.2%})")
+        print(f"Win per round: {result.win.mean:+.4f} (SD {result.win.std:.3f}, average bet {result.bet.mean:.2f})")
+        print(f"Hourly win rate: {result.hourly_win_rate:+.2f} (SD {result.hourly_std:.2f})")
+        print(f"N0: {result.n0:,.0f} rounds, SCORE: {result.score:.2f}")
+        for q, drawdown in result.drawdown_quantiles().items():
+            print(f"Max drawdown, {q:.0%} quantile: {drawdown:.2f}")
+        return
+
+    if args.target_se is not None:
+        from src.precision import run_to_precision
+        control = None if args.control == 'none' else args.control
+        result = run_to_precision(casino_rules, args.target_se, control=control, max_hands=args.hands,
+                                  seed=args.seed, strategy=strategy)
+        print(f"Hands played: {result.hands} in {result.shoes} shoes"
+              f"{'' if result.converged else ' (hand limit reached before the target)'}")
+        print(f"Player EV: {result.mean:+.5f} units/hand (std error {result.std_error:.5f})")
+        print(f"Without the control variate: {result.raw_mean:+.5f} (std error {result.raw_std_error:.5f}), "
+              f"{result.variance_reduction:.1f}x the hands for the same precision")
+        return
+
+    if args.deviations is not None:
+        from src.deviations import collect_count_stats, find_index_plays, optimal_bet_ramp
+        rounds, decisions = collect_count_stats(casino_rules, args.deviations, seed=args.seed, strategy=strategy)
+        print(f"Rounds played: {rounds.rounds} in {args.deviations} shoes")
+        print(f"{'true count':>10} {'rounds':>10} {'EV':>9} {'std error':>9} {'variance':>9}")
+        for row in rounds.rows():
+            print(f"{row['true_count']:>10} {row['rounds']:>10} {row['ev']:>+9.4f} {row['std_error']:>9.4f} "
+                  f"{row['variance']:>9.3f}")
+        print()
+        print(f"{'hand':<10} {'upcard':>6} {'basic':<10} {'deviation':<10} {'when':<12} {'index':>5} {'std error':>9}")
+        for play in find_index_plays(decisions):
+            print(f"{play['hand']:<10} {play['upcard']:>6} {play['basic']:<10} {play['deviation']:<10} "
+                  f"{play['direction']:<12} {play['index']:>+5} {play['std_error']:>9.2f}")
+        print()
+        ramp = optimal_bet_ramp(rounds, args.spread)
+        print(f"Bet ramp for a 1-{args.spread:g} spread: " +
+              ", ".join(f"TC {tc:+d}: {bet:.2f}" for tc, bet in ramp.table().items() if bet > 1))
+        print(f"Win per round: {ramp.win:+.4f} (SD {ramp.std:.3f}, average bet {ramp.average_bet:.2f}), "
+              f"SCORE: {ramp.score:.2f}")
+        return
+
+    if args.profile:
+        profile(casino_rules, args.hands or 100_000, args.profile, seed=args.seed, strategy=strategy)
+        return
+
+    if args.hands is None:
+        # Trace one hand to the console
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        blackjack_sim = BlackjackSimulation(casino_rules, event_sink=LoggingEventSink(), strategy=strategy)
+        blackjack_sim.simulate_hand()
+        return
 
-    # Run automated or targeted tests as needed
-    blackjack_sim.simulate_hand()
+    if args.record:
+        from src.history import HistoryRecorder  # Needs NumPy
+        with HistoryRecorder(args.record, args.seed, engine=args.engine) as recorder:
+            if args.engine == 'vectorized':
+                from src.vectorized import VectorizedSimulation
+                n_shoes = min(args.hands, 16384)
+                result = VectorizedSimulation(casino_rules, n_shoes=n_shoes, seed=args.seed, strategy=strategy,
+                                              recorder=recorder).run(-(-args.hands // n_shoes))
+            else:
+                casino_rules.seed = args.seed
+                casino_rules.load_shoe(0)
+                result = BlackjackSimulation(casino_rules, strategy=strategy, recorder=recorder).run(args.hands)
+    elif args.engine == 'vectorized':
+        from src.vectorized import VectorizedSimulation  # Needs NumPy
+        n_shoes = min(args.hands, 16384)
+        result = VectorizedSimulation(casino_rules, n_shoes=n_shoes, seed=args.seed,
+                                      strategy=strategy).run(-(-args.hands // n_shoes))
+    else:
+        # Play the batch silently, sharded over worker processes
+        result = run_parallel(casino_rules, args.hands, seed=args.seed, workers=args.workers, strategy=strategy)
+    print(f"Hands played: {result.hands}")
+    print(f"Player EV: {result.mean:+.5f} units/hand (std error {result.std_error:.5f})")
+    for outcome, count in sorted(result.outcomes.items(), key=lambda item: -item[1]):
+        print(f"{outcome:<30} {count:>10} ({count / result.hands:.2%})")
+    print(f"{'round type':<14} {'wins':>10} {'losses':>10} {'pushes':>10}")
+    for category, (wins, losses, pushes) in result.category_counts().items():
+        print(f"{category:<14} {wins:>10} {losses:>10} {pushes:>10}")
 
 if __name__ == "__main__":
     main()
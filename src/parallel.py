@@ -0,0 +1,87 @@
+# parallel.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.simulation import BlackjackSimulation, SimulationResult
+
+# Hands per unit of work. Blocks are the unit of seeding, so this must not
+# depend on the number of workers or the same seed would give different results.
+DEFAULT_BLOCK_SIZE = 50_000
+
+
+def split_blocks(n_hands, block_size=DEFAULT_BLOCK_SIZE):
+    """Splits `n_hands` into (block index, hands in block) pairs of at most `block_size` hands."""
+    blocks = []
+    block = 0
+    remaining = n_hands
+    while remaining > 0:
+        size = min(block_size, remaining)
+        blocks.append((block, size))
+        remaining -= size
+        block += 1
+    return blocks
+
+
+def run_block(rule_params, seed, block, n_hands, strategy=basic_strategy):
+    """
+    Plays one block of hands on the shoes of stream `block` of the seed (see src.rng).
+
+    Parameters:
+    - rule_params: Keyword arguments for CasinoRules (see `CasinoRules.as_dict`).
+    - seed: Seed of the whole run.
+    - block: Index of this block within the run.
+    - n_hands: Number of hands to play.
+    - strategy: Strategy dict in the format of `basic_strategy`.
+
+    Returns:
+    - The block's SimulationResult.
+    """
+    casino_rules = CasinoRules(**rule_params, seed=seed, stream=block)
+    return BlackjackSimulation(casino_rules, strategy=strategy).run(n_hands)
+
+
+def _run_block_task(task):
+    return run_block(*task)
+
+
+def run_parallel(casino_rules, n_hands, seed=0, workers=None, block_size=DEFAULT_BLOCK_SIZE,
+                 strategy=basic_strategy):
+    """
+    Plays `n_hands` hands split into seeded blocks over a pool of worker processes.
+
+    Block b plays the shoes of stream b of the seed, which depend on (seed, b)
+    alone, and block results are merged in block order, so the same seed
+    reproduces a bit-identical result for any number of workers. Any shoe of
+    the run can be replayed with `CasinoRules(seed=seed, stream=b).load_shoe(i)`.
+
+    Parameters:
+    - casino_rules: CasinoRules describing the table (its own shoe and seed are not used).
+    - n_hands: Total number of hands to play.
+    - seed: Seed of the run.
+    - workers: Number of worker processes (default is the CPU count; 1 runs in-process).
+    - block_size: Hands per block (default is DEFAULT_BLOCK_SIZE).
+    - strategy: Strategy dict in the format of `basic_strategy`.
+
+    Returns:
+    - A SimulationResult merged over all blocks.
+    """
+    rule_params = casino_rules.as_dict()
+    tasks = [(rule_params, seed, block, size, strategy) for block, size in split_blocks(n_hands, block_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+
+    result = SimulationResult()
+    if workers == 1:
+        for task in tasks:
+            result.merge(_run_block_task(task))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, which keeps the merge deterministic
+        for block_result in executor.map(_run_block_task, tasks):
+            result.merge(block_result)
+    return result
@@ -0,0 +1,149 @@
+# precision.py
+
+from statistics import NormalDist
+
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.control_variates import CardControl
+from src.simulation import BlackjackSimulation
+
+class RatioEstimate:
+    """
+    Running ratio estimate of money per round from independent shoes.
+
+    Rounds of one shoe share its cards, so shoes rather than rounds are the
+    independent samples. The mean is total money over total rounds, and its
+    standard error is that of the linearised ratio (as in src.sweep), kept
+    from five running sums so it can be read after every batch.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.total = 0.0
+        self.rounds = 0
+        self.total_sq = 0.0
+        self.rounds_sq = 0.0
+        self.cross = 0.0
+
+    def add(self, total, rounds):
+        """Adds one shoe: the money it won over its `rounds` rounds."""
+        self.samples += 1
+        self.total += total
+        self.rounds += rounds
+        self.total_sq += total * total
+        self.rounds_sq += rounds * rounds
+        self.cross += total * rounds
+
+    @property
+    def mean(self):
+        return self.total / self.rounds if self.rounds else 0.0
+
+    @property
+    def std_error(self):
+        m = self.samples
+        if m < 2:
+            return float('inf')
+        mean = self.mean
+        mean_rounds = self.rounds / m
+        # Sum of squared deviations (total - mean * rounds), which have zero sum by construction
+        squares = self.total_sq - 2 * mean * self.cross + mean * mean * self.rounds_sq
+        return (max(squares, 0.0) / (m - 1) / m) ** 0.5 / mean_rounds
+
+class PrecisionResult:
+    """Outcome of `run_to_precision`."""
+
+    def __init__(self, estimate, raw, target_std_error, converged):
+        self.shoes = estimate.samples
+        self.hands = estimate.rounds
+        self.mean = estimate.mean               # Net units per round
+        self.std_error = estimate.std_error
+        self.raw_mean = raw.mean                # The same rounds without the control variate
+        self.raw_std_error = raw.std_error
+        self.target_std_error = target_std_error
+        self.converged = converged              # False if the hand limit was reached first
+
+    @property
+    def variance_reduction(self):
+        """Factor by which the control variate cut the variance, so also the number of hands needed."""
+        return (self.raw_std_error / self.std_error) ** 2 if self.std_error else float('inf')
+
+    def __repr__(self):
+        return (f"PrecisionResult(hands={self.hands}, shoes={self.shoes}, mean={self.mean:+.5f}, "
+                f"std_error={self.std_error:.5f}, variance_reduction={self.variance_reduction:.1f}, "
+                f"converged={self.converged})")
+
+def _play_shoe(simulation, control):
+    """
+    Plays the current shoe from its shuffle to the cut card.
+
+    Returns:
+    - (rounds played, net units won, net units minus the control values).
+    """
+    rules = simulation.casino_rules
+    index = rules.shoe_index
+    play_round = simulation.play_round
+    rounds = 0
+    net = adjusted = 0.0
+    while rules.cards_dealt < rules.cut_card:
+        round_net = play_round().net
+        net += round_net
+        adjusted += round_net - control.value if control is not None else round_net
+        rounds += 1
+        if rules.shoe_index != index:
+            break  # The shoe ran out mid-round and the next one was started
+    return rounds, net, adjusted
+
+def run_to_precision(casino_rules, target_std_error, control='full', batch_shoes=100, min_shoes=200,
+                     max_hands=None, confidence=0.95, seed=0, strategy=basic_strategy, progress=None):
+    """
+    Plays whole shoes in batches until the player's EV is known to a target standard error.
+
+    After each batch the run stops once an upper confidence bound on the
+    standard error is within the target. The bound allows for the standard
+    error itself being estimated: se * (1 + z / sqrt(2 (n - 1))) for n shoes,
+    where z is the one-sided normal quantile of `confidence`.
+
+    With a control variate (see src.control_variates.CardControl) every
+    round is scored as its net minus the control's value. That keeps the
+    expectation unchanged and removes most of the round-to-round variance,
+    so far fewer hands reach the target. The result also reports the plain
+    estimate from the same rounds, for comparison.
+
+    Parameters:
+    - casino_rules: CasinoRules describing the table; the run plays a copy in which shoe i of its
+      stream is shoe i of `seed`, so the caller's rules are left unchanged.
+    - target_std_error: Standard error of the EV (net units per round) to reach.
+    - control: CardControl level ('upcard', 'deal' or 'full'), or None to use the plain net.
+    - batch_shoes: Shoes played between stopping checks.
+    - min_shoes: Shoes played before the first stopping check.
+    - max_hands: Optional limit on the rounds played; the run then ends unconverged.
+    - confidence: Confidence of the upper bound on the standard error.
+    - seed: Seed of the shoes.
+    - strategy: Strategy dict in the format of `basic_strategy`.
+    - progress: Optional function called with the PrecisionResult so far after every batch.
+
+    Returns:
+    - A PrecisionResult.
+    """
+    if target_std_error <= 0:
+        raise ValueError("target_std_error must be positive")
+    casino_rules = CasinoRules(**casino_rules.as_dict(), seed=seed, stream=casino_rules.stream)
+    card_control = CardControl(casino_rules, strategy, level=control) if control is not None else None
+    simulation = BlackjackSimulation(casino_rules, strategy=strategy, control=card_control)
+    z = NormalDist().inv_cdf(confidence)
+    estimate = RatioEstimate()
+    raw = RatioEstimate()
+    shoe = 0
+    while True:
+        for _ in range(batch_shoes):
+            casino_rules.load_shoe(shoe)
+            rounds, net, adjusted = _play_shoe(simulation, card_control)
+            estimate.add(adjusted, rounds)
+            raw.add(net, rounds)
+            shoe += 1
+        n = estimate.samples
+        converged = n >= max(min_shoes, 2) and estimate.std_error * (1 + z / (2 * (n - 1)) ** 0.5) <= target_std_error
+        if progress is not None:
+            progress(PrecisionResult(estimate, raw, target_std_error, converged))
+        if converged or (max_hands is not None and estimate.rounds >= max_hands):
+            return PrecisionResult(estimate, raw, target_std_error, converged)
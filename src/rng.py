@@ -0,0 +1,70 @@
+# rng.py
+
+import hashlib
+import random
+import sys
+from array import array
+
+# Every shoe of a run is addressed by (seed, stream, index): the stream is a
+# block of a parallel run (or a lane of the vectorized engine) and the index
+# counts the shuffles within that stream. The shoe's order is a pure function
+# of those three numbers, so any shoe can be rebuilt in O(1) - to replay it,
+# or to hand any block to any worker - without generating the ones before it.
+# Both engines build the order with `keyed_order` (src.vectorized.keyed_orders
+# is its array form), so a shoe is the same whichever engine deals it.
+
+# The sort keys are little-endian 64-bit integers; array('Q') holds them in native order
+_SWAP_KEYS = sys.byteorder == 'big'
+
+def shoe_key(seed, stream, index):
+    """
+    Returns the 64-bit key of one shoe, a BLAKE2b hash of (seed, stream, index).
+
+    Parameters:
+    - seed: Seed of the run (any value with a stable string form).
+    - stream: Independent stream (parallel block or vectorized lane).
+    - index: Shoe number within the stream.
+    """
+    digest = hashlib.blake2b(f"blackjack:{seed}:{stream}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def order_keys(key, size):
+    """Returns `size` pseudo-random 64-bit sort keys drawn from a shoe key with SHAKE-128, as bytes."""
+    return hashlib.shake_128(key.to_bytes(8, 'little')).digest(8 * size)
+
+def order_into(order, sort_keys, key):
+    """
+    Writes the permutation of range(len(order)) determined by a 64-bit key into `order`, in place.
+
+    Each position gets one of the sort keys of `order_keys` and the
+    positions are sorted by them, stably, so the order is exactly that of
+    the array version (src.vectorized.keyed_orders). Both buffers are reused,
+    so a shoe can be rearranged without building a new list.
+
+    Parameters:
+    - order: List of ints, overwritten with the permutation.
+    - sort_keys: array('Q') of the same length, overwritten with the sort keys.
+    - key: 64-bit key of the shoe (see `shoe_key`).
+
+    Returns:
+    - `order`.
+    """
+    size = len(order)
+    memoryview(sort_keys).cast('B')[:] = order_keys(key, size)
+    if _SWAP_KEYS:
+        sort_keys.byteswap()
+    order[:] = range(size)  # Equal keys keep position order, as in a stable sort of range(size)
+    order.sort(key=sort_keys.__getitem__)
+    return order
+
+def keyed_order(key, size):
+    """Returns a random permutation of range(size) determined by a 64-bit key, as a new list (see `order_into`)."""
+    return order_into(list(range(size)), array('Q', bytes(8 * size)), key)
+
+def shoe_order(seed, stream, index, size):
+    """Returns the order of shoe `index` of a stream: a permutation of its `size` cards in deck order."""
+    return keyed_order(shoe_key(seed, stream, index), size)
+
+def random_seed():
+    """Draws a seed for an unseeded run, so that even unseeded runs can be replayed afterwards."""
+    return random.getrandbits(63)
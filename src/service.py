@@ -0,0 +1,438 @@
+# service.py
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.parallel import DEFAULT_BLOCK_SIZE, split_blocks
+from src.simulation import BlackjackSimulation, SimulationResult
+from src.strategy_generator import cache_root, generate_strategy
+from src.sweep import DEFAULT_BET_RAMPS
+
+# Bump whenever the same job would give a different result, to invalidate cached results
+SERVICE_VERSION = 1
+
+STRATEGIES = ('basic', 'optimal')
+JOB_FIELDS = ('rules', 'strategy', 'bet_ramp', 'hands', 'seed', 'block_size')
+
+def default_job_dir():
+    """Directory for job results and checkpoints: `cache_root()` plus 'jobs'."""
+    return os.path.join(cache_root(), 'jobs')
+
+def default_socket_path():
+    """Unix socket the service listens on by default."""
+    return os.path.join(cache_root(), 'service.sock')
+
+def normalize_job(spec):
+    """
+    Validates a job and fills in its defaults, so equal jobs always look the same.
+
+    A job is a dict with:
+    - rules: Keyword arguments for CasinoRules (missing ones take the constructor defaults).
+    - strategy: 'basic' or 'optimal' (generated for the rules, see src.strategy_generator).
+    - bet_ramp: Name of a ramp in src.sweep.DEFAULT_BET_RAMPS, betting on the true count before each round.
+    - hands: Number of rounds to play.
+    - seed: Seed of the run (default 0).
+    - block_size: Rounds per block, the unit of scheduling and checkpointing (default is DEFAULT_BLOCK_SIZE).
+
+    Returns:
+    - The complete job dict. Raises ValueError for unknown or invalid fields.
+    """
+    unknown = set(spec) - set(JOB_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+    try:
+        rules = CasinoRules(**spec.get('rules', {}), seed=0).as_dict()
+    except TypeError as error:
+        raise ValueError(f"Invalid rules: {error}") from None
+    job = {
+        'rules': rules,
+        'strategy': spec.get('strategy', 'basic'),
+        'bet_ramp': spec.get('bet_ramp', 'flat'),
+        'hands': int(spec.get('hands', 0)),
+        'seed': int(spec.get('seed', 0)),
+        'block_size': int(spec.get('block_size', DEFAULT_BLOCK_SIZE)),
+    }
+    if job['strategy'] not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{job['strategy']}' (expected one of {', '.join(STRATEGIES)})")
+    if job['bet_ramp'] not in DEFAULT_BET_RAMPS:
+        raise ValueError(f"Unknown bet ramp '{job['bet_ramp']}' "
+                         f"(expected one of {', '.join(DEFAULT_BET_RAMPS)})")
+    if job['hands'] < 1 or job['block_size'] < 1:
+        raise ValueError("'hands' and 'block_size' must be positive")
+    return job
+
+def job_key(job):
+    """Returns a short hash identifying a normalized job."""
+    params = dict(job, version=SERVICE_VERSION)
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:20]
+
+_strategies = {}  # Optimal strategies already loaded in this worker process, by rules
+
+def _job_strategy(job):
+    if job['strategy'] == 'basic':
+        return basic_strategy
+    key = json.dumps(job['rules'], sort_keys=True)
+    strategy = _strategies.get(key)
+    if strategy is None:
+        strategy = _strategies[key] = generate_strategy(CasinoRules(**job['rules'], seed=0))
+    return strategy
+
+def _warm_up():
+    return os.getpid()
+
+def run_job_block(job, block, n_hands):
+    """
+    Plays one block of a job on the shoes of stream `block` of the job's seed, as `src.parallel.run_block` does.
+
+    Returns:
+    - A JSON-serialisable dict: 'block', 'hands', 'result' (`SimulationResult.as_dict`), and the
+      money 'won', its sum of squares 'won_sq' and the initial bets 'wagered' under the job's bet ramp.
+    """
+    rules = CasinoRules(**job['rules'], seed=job['seed'], stream=block)
+    simulation = BlackjackSimulation(rules, strategy=_job_strategy(job))
+    ramp = DEFAULT_BET_RAMPS[job['bet_ramp']]
+    play_round = simulation.play_round
+    result = SimulationResult()
+    won = won_sq = wagered = 0.0
+    for _ in range(n_hands):
+        rules.start_round()  # Reshuffle first when due, so the bet sees the count of the shoe it is played on
+        bet = ramp(rules.calculate_true_count())
+        round_result = play_round()
+        result.add_round(round_result)
+        amount = bet * round_result.net
+        won += amount
+        won_sq += amount * amount
+        wagered += bet
+    return {'block': block, 'hands': n_hands, 'result': result.as_dict(),
+            'won': won, 'won_sq': won_sq, 'wagered': wagered}
+
+def summarize(outputs):
+    """
+    Merges block outputs, in block order, into a job summary.
+
+    Returns:
+    - A dict with 'hands', 'ev' and 'std_error' (net units per round), 'avg_bet', 'money_ev' and
+      'money_std_error' (money won per round under the bet ramp), 'outcomes' and the merged 'result'.
+    """
+    result = SimulationResult()
+    won = won_sq = wagered = 0.0
+    for output in outputs:
+        result.merge(SimulationResult.from_dict(output['result']))
+        won += output['won']
+        won_sq += output['won_sq']
+        wagered += output['wagered']
+    hands = result.hands
+    money_variance = max(won_sq - won * won / hands, 0.0) / (hands - 1) if hands > 1 else 0.0
+    return {
+        'hands': hands,
+        'ev': result.mean,
+        'std_error': result.std_error,
+        'avg_bet': wagered / hands,
+        'money_ev': won / hands,
+        'money_std_error': (money_variance / hands) ** 0.5,
+        'outcomes': result.outcomes,
+        'result': result.as_dict(),
+    }
+
+class SimulationService:
+    """
+    Runs simulation jobs on a warm process pool, with a result cache and checkpoints on disk.
+
+    A job is split into blocks of `block_size` rounds, block b playing the
+    shoes of stream b of the job's seed, so the result depends on the job
+    alone and matches `run_parallel` with the same seed and block size.
+    Finished results are stored under the job's hash and served from disk
+    when the same job comes again. Every finished block is appended to the
+    job's checkpoint file first, so a job interrupted by a crash or a restart
+    only plays its missing blocks when it is submitted again.
+
+    Identical jobs submitted while one is running share it, and a job keeps
+    running (and checkpointing) if the client that submitted it goes away.
+    """
+
+    def __init__(self, cache_dir=None, workers=None):
+        """
+        Parameters:
+        - cache_dir: Directory of job results and checkpoints (default is `default_job_dir()`).
+        - workers: Worker processes in the pool (default is the CPU count).
+        """
+        self.cache_dir = cache_dir or default_job_dir()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.running = {}    # Job key -> task of the job in progress
+        self.listeners = {}  # Job key -> progress callbacks of the clients waiting for it
+
+    def start(self):
+        """Creates the cache directory and the worker pool, starting every worker right away."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            for _ in range(self.workers):
+                self.executor.submit(_warm_up)
+        return self
+
+    def close(self):
+        """Stops the worker pool, dropping blocks that have not started (checkpoints are kept)."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def _path(self, key, kind):
+        return os.path.join(self.cache_dir, f"{key}.{kind}")
+
+    def load_result(self, key):
+        """Returns the cached summary of a job, or None."""
+        path = self._path(key, 'result.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)['summary']
+
+    def _save_result(self, key, job, summary):
+        path = self._path(key, 'result.json')
+        # Write to a temporary file first so a crash never leaves a partial result
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'job': job, 'summary': summary}, f)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, key):
+        """
+        Returns {block: output} for the blocks of a job already checkpointed.
+
+        A write cut short by an interruption leaves a partial last line. It is
+        truncated away here, before any block is appended, so the next block
+        starts on a line of its own; any other unreadable line is skipped and
+        its block is played again.
+        """
+        path = self._path(key, 'checkpoint.jsonl')
+        outputs = {}
+        if not os.path.exists(path):
+            return outputs
+        with open(path, 'r+b') as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1  # End of the last complete line
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                output = json.loads(line)
+                outputs[output['block']] = output
+            except (ValueError, TypeError, KeyError):
+                continue
+        return outputs
+
+    def save_checkpoint(self, key, output):
+        """Appends one finished block to the job's checkpoint."""
+        with open(self._path(key, 'checkpoint.jsonl'), 'a') as f:
+            f.write(json.dumps(output) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def run_job(self, spec, progress=None):
+        """
+        Runs a job, or returns its cached result.
+
+        Parameters:
+        - spec: Job dict (see `normalize_job`).
+        - progress: Optional function called with a progress dict after every block.
+
+        Returns:
+        - The job summary (see `summarize`) with its 'key' and 'cached', True if it came from disk.
+        """
+        job = normalize_job(spec)
+        key = job_key(job)
+        summary = self.load_result(key)
+        if summary is not None:
+            return dict(summary, key=key, cached=True)
+
+        listeners = self.listeners.setdefault(key, [])
+        if progress is not None:
+            listeners.append(progress)
+        try:
+            task = self.running.get(key)
+            if task is None:
+                self.start()
+                task = self.running[key] = asyncio.ensure_future(self._run(key, job))
+                task.add_done_callback(lambda _: self.running.pop(key, None))
+            # Shielded: a client that disconnects or is cancelled does not stop the job
+            summary = await asyncio.shield(task)
+        finally:
+            if progress is not None:
+                listeners.remove(progress)
+            if not listeners:
+                self.listeners.pop(key, None)
+        return dict(summary, key=key, cached=False)
+
+    def _notify(self, key, **event):
+        event = dict(event, event='progress', key=key)
+        for listener in list(self.listeners.get(key, ())):
+            listener(event)
+
+    async def _run(self, key, job):
+        blocks = split_blocks(job['hands'], job['block_size'])
+        outputs = self.load_checkpoint(key)
+        hands_done = sum(output['hands'] for output in outputs.values())
+        self._notify(key, blocks_done=len(outputs), blocks=len(blocks), hands_done=hands_done,
+                     hands=job['hands'], resumed=len(outputs))
+
+        loop = asyncio.get_running_loop()
+        pending = [loop.run_in_executor(self.executor, run_job_block, job, block, size)
+                   for block, size in blocks if block not in outputs]
+        try:
+            for future in asyncio.as_completed(pending):
+                output = await future
+                self.save_checkpoint(key, output)
+                outputs[output['block']] = output
+                hands_done += output['hands']
+                self._notify(key, blocks_done=len(outputs), blocks=len(blocks), hands_done=hands_done,
+                             hands=job['hands'])
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+        summary = summarize(outputs[block] for block, _ in blocks)
+        self._save_result(key, job, summary)
+        os.remove(self._path(key, 'checkpoint.jsonl'))
+        return summary
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves one connection: JSON requests, one per line, each answered by JSON lines.
+
+        Requests are {"op": "ping"} and {"op": "run", "job": {...}}. A run is
+        answered by "progress" events and then one "result" (or "error") event.
+        """
+        def send(message):
+            if writer.is_closing():
+                return  # The client went away; the job carries on
+            writer.write(json.dumps(message).encode() + b"\n")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get('op')
+                except (ValueError, AttributeError):
+                    send({'event': 'error', 'message': "Requests must be JSON objects"})
+                    continue
+                if op == 'ping':
+                    send({'event': 'pong', 'running': sorted(self.running)})
+                elif op == 'run':
+                    try:
+                        summary = await self.run_job(request.get('job') or {}, progress=send)
+                    except Exception as error:
+                        send({'event': 'error', 'message': str(error)})
+                    else:
+                        send(dict(summary, event='result'))
+                else:
+                    send({'event': 'error', 'message': f"Unknown op {op!r}"})
+                await writer.drain()
+        except ConnectionError:
+            pass  # The client went away; its jobs carry on
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host='127.0.0.1', port=None):
+        """
+        Listens on a Unix socket (`path`, the default being `default_socket_path()`) or,
+        if `port` is given, on a TCP port of `host`, until cancelled.
+        """
+        self.start()
+        if port is not None:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        else:
+            path = path or default_socket_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            server = await asyncio.start_unix_server(self.handle_client, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+async def submit(job, path=None, host='127.0.0.1', port=None, progress=None):
+    """
+    Sends a job to a running service and waits for its result.
+
+    Parameters:
+    - job: Job dict (see `normalize_job`).
+    - path, host, port: Where the service listens (as in `SimulationService.serve`).
+    - progress: Optional function called with every progress event.
+
+    Returns:
+    - The job summary, as returned by `SimulationService.run_job`. Raises RuntimeError if the job failed.
+    """
+    if port is not None:
+        reader, writer = await asyncio.open_connection(host, port)
+    else:
+        reader, writer = await asyncio.open_unix_connection(path or default_socket_path())
+    try:
+        writer.write(json.dumps({'op': 'run', 'job': job}).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise RuntimeError("The service closed the connection before the job finished")
+            message = json.loads(line)
+            event = message.pop('event')
+            if event == 'progress':
+                if progress is not None:
+                    progress(message)
+            elif event == 'result':
+                return message
+            else:
+                raise RuntimeError(f"Job failed: {message.get('message')}")
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local blackjack simulation service")
+    parser.add_argument('command', choices=('serve', 'submit'))
+    parser.add_argument('--socket', default=None, help="Unix socket path (default: in the cache directory)")
+    parser.add_argument('--port', type=int, default=None, help="Use TCP on localhost instead of a Unix socket")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (serve; default: CPU count)")
+    parser.add_argument('--cache-dir', default=None, help="Job results and checkpoints (serve)")
+    parser.add_argument('--rules', default='{}', help="CasinoRules parameters as JSON (submit)")
+    parser.add_argument('--strategy', choices=STRATEGIES, default='basic')
+    parser.add_argument('--bet-ramp', choices=tuple(DEFAULT_BET_RAMPS), default='flat')
+    parser.add_argument('--hands', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'serve':
+        service = SimulationService(cache_dir=args.cache_dir, workers=args.workers)
+        try:
+            asyncio.run(service.serve(path=args.socket, port=args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    def show(event):
+        print(f"\r{event['hands_done']:,}/{event['hands']:,} hands", end='', file=sys.stderr, flush=True)
+
+    job = {'rules': json.loads(args.rules), 'strategy': args.strategy, 'bet_ramp': args.bet_ramp,
+           'hands': args.hands, 'seed': args.seed}
+    summary = asyncio.run(submit(job, path=args.socket, port=args.port, progress=show))
+    print(file=sys.stderr)
+    print(f"Hands played: {summary['hands']}{' (cached)' if summary['cached'] else ''}")
+    print(f"Player EV: {summary['ev']:+.5f} units/hand (std error {summary['std_error']:.5f})")
+    print(f"Bet ramp '{args.bet_ramp}': average bet {summary['avg_bet']:.2f}, "
+          f"win {summary['money_ev']:+.4f}/round (std error {summary['money_std_error']:.4f})")
+
+if __name__ == "__main__":
+    main()
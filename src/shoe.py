@@ -0,0 +1,104 @@
+# shoe.py
+
+from array import array
+
+from src.rng import order_into
+
+# Card values as dealt by the simulator: 2-9, 10 for every ten-value card and 11 for an Ace
+RANKS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+SINGLE_DECK = bytes([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4)
+CARDS_PER_DECK = len(SINGLE_DECK)
+
+class Shoe:
+    """
+    A multi-deck shoe stored in one preallocated bytearray with a read cursor.
+
+    Dealing advances the cursor instead of removing cards, and reshuffling
+    shuffles or rearranges the same buffer in place (a keyed shoe through
+    preallocated index and sort-key buffers), so the shoe never reallocates. A live
+    remaining-card count per rank (index `card - 2`) makes decks remaining,
+    penetration and composition available in O(1).
+    """
+
+    def __init__(self, decks, rng=None):
+        """
+        Parameters:
+        - decks: Number of decks in the shoe.
+        - rng: random.Random-like generator used by `shuffle` (not needed when shoes are
+          arranged from their keyed order, see `arrange`).
+        """
+        self.decks = decks
+        self.rng = rng
+        self.deck = SINGLE_DECK * decks  # The cards in deck order
+        self.cards = bytearray(self.deck)
+        self.size = len(self.cards)
+        self.order = list(range(self.size))  # Index buffer of `arrange_key`
+        self.sort_keys = array('Q', bytes(8 * self.size))  # Sort-key buffer of `arrange_key`
+        self.cursor = 0  # Index of the next card to deal
+        self.full_counts = tuple(SINGLE_DECK.count(rank) * decks for rank in RANKS)
+        self.rank_counts = list(self.full_counts)  # Cards of each rank still in the shoe
+
+    def shuffle(self):
+        """Shuffles every card back into the shoe, in place."""
+        self.rng.shuffle(self.cards)
+        self.cursor = 0
+        self.rank_counts[:] = self.full_counts
+
+    def arrange(self, order):
+        """
+        Lays the cards out as a permutation of deck order, in place, and rewinds the shoe.
+
+        Parameters:
+        - order: Position in deck order of each card to deal, such as src.rng.keyed_order.
+        """
+        cards = self.cards
+        deck = self.deck
+        for position, deck_position in enumerate(order):
+            cards[position] = deck[deck_position]
+        self.cursor = 0
+        self.rank_counts[:] = self.full_counts
+
+    def arrange_key(self, key):
+        """Lays the cards out in the order of a 64-bit shoe key (see src.rng.shoe_key), reusing the shoe's buffers."""
+        self.arrange(order_into(self.order, self.sort_keys, key))
+
+    def reset(self):
+        """Puts every card back in deck order, so the next shuffle depends only on the RNG state."""
+        self.cards[:] = self.deck
+        self.cursor = 0
+        self.rank_counts[:] = self.full_counts
+
+    def deal(self):
+        """Deals the next card. The caller is responsible for reshuffling an exhausted shoe."""
+        card = self.cards[self.cursor]
+        self.cursor += 1
+        self.rank_counts[card - 2] -= 1
+        return card
+
+    @property
+    def cards_remaining(self):
+        return self.size - self.cursor
+
+    @property
+    def decks_remaining(self):
+        """Exact number of decks left to deal."""
+        return (self.size - self.cursor) / CARDS_PER_DECK
+
+    @property
+    def penetration(self):
+        """Fraction of the shoe dealt since the last shuffle."""
+        return self.cursor / self.size
+
+    def composition(self):
+        """Returns the number of remaining cards of each rank, ordered like RANKS."""
+        return tuple(self.rank_counts)
+
+    def remaining_cards(self):
+        """Returns the undealt cards in dealing order (a copy, for inspection and replay)."""
+        return bytes(self.cards[self.cursor:])
+
+    def __len__(self):
+        return self.size - self.cursor
+
+    def __repr__(self):
+        return f"Shoe(decks={self.decks}, dealt={self.cursor}/{self.size})"
@@ -1,22 +1,248 @@
 # simulation.py
 
 import random
+from time import perf_counter
 from src.betting_strategy import calculate_bet
 from src.basic_strategy import basic_strategy
 from src.casino_rules import CasinoRules #imports the rules for a casino
+from src.events import NullEventSink
+from src.hand_state import (ACTION_NAMES, BUSTED, CARD_SLOTS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, NEXT_STATE,
+                            PAIR, SOFT, SPLIT, STAND, SURRENDER, TOTAL, compile_strategy, hand_state, resolve_action)
+
+# Outcome codes of a round, mapped to the messages `simulate_hand` returns
+COMPLETED, PLAYER_WINS, DEALER_WINS, PLAYER_BLACKJACK, DEALER_BLACKJACK, PUSH_NATURALS, SURRENDERED = range(7)
+OUTCOMES = (
+    "Completed",
+    "Player wins!",
+    "Dealer wins!",
+    "Player wins with blackjack!",
+    "Dealer wins with blackjack!",
+    "Push - Tie game.",
+    "Player surrenders.",
+)
+_OUTCOME_CODES = {message: code for code, message in enumerate(OUTCOMES)}
+
+# Round categories for the win/loss/push counters, by what happened to the player's stake
+CATEGORY_NATURAL, CATEGORY_PLAIN, CATEGORY_DOUBLED, CATEGORY_SPLIT, CATEGORY_SURRENDERED = range(5)
+CATEGORIES = ('natural', 'plain', 'doubled', 'split', 'surrendered')
+
+class RoundResult:
+    """
+    Numeric result of one round, as returned by `BlackjackSimulation.play_round`.
+
+    The simulation fills the same instance every round instead of allocating a
+    new one, so it is only valid until the next round; use `copy` to keep it.
+    """
+
+    __slots__ = ('outcome', 'net', 'stake', 'hands', 'category', 'doubled', 'split', 'natural',
+                 'player_busted', 'dealer_busted', 'upcard')
+
+    def __init__(self):
+        self.set(COMPLETED, 0.0, 0.0, 0, CATEGORY_PLAIN, False, False, False, False, False)
+        self.upcard = 0
+
+    def set(self, outcome, net, stake, hands, category, doubled, split, natural, player_busted, dealer_busted):
+        """
+        Parameters:
+        - outcome: Outcome code (an index into OUTCOMES).
+        - net: Net units won by the player over all hands of the round.
+        - stake: Units wagered, counting doubles and split hands.
+        - hands: Number of player hands (more than one after a split).
+        - category: Round category (an index into CATEGORIES).
+        - doubled, split, natural: True if a hand was doubled, a pair split, or either side had a natural.
+        - player_busted, dealer_busted: True if a player hand or the dealer busted.
+        """
+        self.outcome = outcome
+        self.net = net
+        self.stake = stake
+        self.hands = hands
+        self.category = category
+        self.doubled = doubled
+        self.split = split
+        self.natural = natural
+        self.player_busted = player_busted
+        self.dealer_busted = dealer_busted
+
+    @property
+    def message(self):
+        """The outcome message `simulate_hand` returns for this round."""
+        return OUTCOMES[self.outcome]
+
+    def copy(self):
+        other = RoundResult()
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def __repr__(self):
+        return (f"RoundResult(outcome={self.message!r}, net={self.net:+g}, stake={self.stake:g}, "
+                f"hands={self.hands}, category={CATEGORIES[self.category]!r}, upcard={self.upcard})")
+
+class SimulationResult:
+    """
+    Aggregate outcome of a batch of simulated hands.
+
+    Only counts and sums are kept, in lists allocated up front, so adding a
+    round allocates nothing and results from independent batches can be
+    merged exactly with `merge` (for example across worker processes).
+
+    Rounds are counted as wins, losses or pushes by the sign of their net,
+    under their category (see CATEGORIES), so a split round that wins one
+    hand and loses the other is a push.
+    """
+
+    def __init__(self):
+        self.hands = 0
+        self.total = 0.0     # Sum of net units won by the player
+        self.total_sq = 0.0  # Sum of squared net units, for the variance
+        self.staked = 0.0    # Sum of units wagered, counting doubles and split hands
+        self.outcome_counts = [0] * len(OUTCOMES)  # Rounds per outcome code
+        self.wins = [0] * len(CATEGORIES)          # Rounds won, lost and pushed per category
+        self.losses = [0] * len(CATEGORIES)
+        self.pushes = [0] * len(CATEGORIES)
+        self.net_by_upcard = [0.0] * CARD_SLOTS    # Net units and rounds per dealer upcard (2-11)
+        self.rounds_by_upcard = [0] * CARD_SLOTS
+
+    def add(self, outcome, net=0.0):
+        """Records the outcome message and net units of one round, for results built by hand."""
+        self.hands += 1
+        self.total += net
+        self.total_sq += net * net
+        self.outcome_counts[_OUTCOME_CODES[outcome]] += 1
+
+    def add_round(self, round_result):
+        """Records a RoundResult from `BlackjackSimulation.play_round`."""
+        net = round_result.net
+        self.hands += 1
+        self.total += net
+        self.total_sq += net * net
+        self.staked += round_result.stake
+        self.outcome_counts[round_result.outcome] += 1
+        if net > 0:
+            self.wins[round_result.category] += 1
+        elif net < 0:
+            self.losses[round_result.category] += 1
+        else:
+            self.pushes[round_result.category] += 1
+        upcard = round_result.upcard
+        self.net_by_upcard[upcard] += net
+        self.rounds_by_upcard[upcard] += 1
+
+    def merge(self, other):
+        """Adds the counts and sums of another result to this one and returns self."""
+        self.hands += other.hands
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.staked += other.staked
+        for counts, other_counts in ((self.outcome_counts, other.outcome_counts), (self.wins, other.wins),
+                                     (self.losses, other.losses), (self.pushes, other.pushes),
+                                     (self.net_by_upcard, other.net_by_upcard),
+                                     (self.rounds_by_upcard, other.rounds_by_upcard)):
+            for i, value in enumerate(other_counts):
+                counts[i] += value
+        return self
+
+    @property
+    def outcomes(self):
+        """Outcome message -> number of rounds that ended that way (outcomes that never occurred are left out)."""
+        return {OUTCOMES[code]: count for code, count in enumerate(self.outcome_counts) if count}
+
+    def category_counts(self):
+        """Returns {category: (wins, losses, pushes)}."""
+        return {name: (self.wins[i], self.losses[i], self.pushes[i]) for i, name in enumerate(CATEGORIES)}
+
+    def ev_by_upcard(self):
+        """Returns {upcard: mean net units per round} for every upcard dealt."""
+        return {upcard: self.net_by_upcard[upcard] / rounds
+                for upcard, rounds in enumerate(self.rounds_by_upcard) if rounds}
+
+    @property
+    def mean(self):
+        """Expected net units per hand (the player's edge)."""
+        return self.total / self.hands if self.hands else 0.0
+
+    @property
+    def variance(self):
+        """Sample variance of the net units per hand."""
+        if self.hands < 2:
+            return 0.0
+        return max(self.total_sq - self.total * self.total / self.hands, 0.0) / (self.hands - 1)
+
+    @property
+    def std_error(self):
+        """Standard error of `mean`."""
+        return (self.variance / self.hands) ** 0.5 if self.hands else 0.0
+
+    # Attributes saved by `as_dict`; together they are the whole state of a result
+    FIELDS = ('hands', 'total', 'total_sq', 'staked', 'outcome_counts', 'wins', 'losses', 'pushes',
+              'net_by_upcard', 'rounds_by_upcard')
+
+    def as_dict(self):
+        """Returns the counts and sums as a JSON-serialisable dict (see `from_dict`)."""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a result saved with `as_dict`."""
+        result = cls()
+        for name in cls.FIELDS:
+            value = data[name]
+            setattr(result, name, list(value) if isinstance(value, list) else value)
+        return result
+
+    def __eq__(self, other):
+        return (isinstance(other, SimulationResult) and self.hands == other.hands and self.total == other.total
+                and self.total_sq == other.total_sq and self.staked == other.staked
+                and self.outcome_counts == other.outcome_counts and self.wins == other.wins
+                and self.losses == other.losses and self.pushes == other.pushes
+                and self.net_by_upcard == other.net_by_upcard and self.rounds_by_upcard == other.rounds_by_upcard)
+
+    def __repr__(self):
+        return (f"SimulationResult(hands={self.hands}, mean={self.mean:+.5f}, "
+                f"std_error={self.std_error:.5f}, outcomes={self.outcomes})")
 
 class BlackjackSimulation:
-    def __init__(self, casino_rules):
+    def __init__(self, casino_rules, event_sink=None, strategy=basic_strategy, recorder=None, bet_function=None,
+                 instrumentation=None, control=None):
+        """
+        Parameters:
+        - casino_rules: CasinoRules instance describing the table and owning the shoe.
+        - event_sink: Optional sink receiving trace events (see src.events).
+          Defaults to a no-op sink, so simulated hands produce no output.
+        - strategy: Strategy dict in the format of `basic_strategy` (or from src.strategy_generator),
+          compiled once into action tables.
+        - recorder: Optional HistoryRecorder (see src.history) receiving a record of every round.
+        - bet_function: Optional function of the true count giving the bet recorded with each round
+          (default is a bet of 1; net units are always per unit bet).
+        - instrumentation: Optional Instrumentation (see src.instrumentation) collecting per-phase
+          timings and counters, shared with the casino rules. Off (and free) by default.
+        - control: Optional CardControl (see src.control_variates) shown every card dealt, whose
+          `value` after a round is a zero-mean control variate for its net units.
+        """
         # Store the casino rules object to access the rules as needed
         self.casino_rules = casino_rules
-        self.shoe = self.casino_rules.initialize_shoe()
-        self.running_count = 0
-        self.true_count = 0
+        self.events = event_sink or NullEventSink()
+        self.casino_rules.event_sink = self.events
+        self.instrumentation = instrumentation
+        self.casino_rules.instrumentation = instrumentation
+        self.control = control
+        self.strategy = strategy
+        self.action_table, self.fallback_table = compile_strategy(strategy)
+        if casino_rules.cards_dealt:
+            casino_rules.initialize_shoe()  # Start on a fresh shoe
+        self.shoe = casino_rules.shoe
+        self.last_net = 0.0  # Net units won by the player in the most recent hand
+        self.round = RoundResult()  # Result of the most recent round, filled in place
+        self._states = []  # Hand states and stakes of the current round, reused from round to round
+        self._stakes = []
+        self.recorder = recorder
+        self.bet_function = bet_function
 
     def deal_card(self):
         # Use the CasinoRules class's deal_card method to manage reshuffle and count
         card = self.casino_rules.deal_card()
-        print(f"Dealt card: {card}, Updated Running Count: {self.casino_rules.running_count}")
+        if self.events.enabled:
+            self.events.emit('deal', card=card, running_count=self.casino_rules.running_count)
         return card
 
     def calculate_hand_value(self, hand):
@@ -35,142 +261,357 @@ class BlackjackSimulation:
         return total
 
     def get_action(self, player_hand, dealer_card):
-        """Determines the player's optimal action based on basic strategy."""
-        player_value = self.calculate_hand_value(player_hand)
-        is_soft = 11 in player_hand and player_value <= 21  # Aces counted as 11 are treated as soft totals
-
-        # Check if hand is a pair (both cards are the same)
-        if len(player_hand) == 2 and player_hand[0] == player_hand[1]:
-            action = basic_strategy['pairs'].get(player_hand[0], {}).get(dealer_card, 'stand')
-        # Check if hand is a soft total (contains an Ace counted as 11)
-        elif is_soft:
-            action = basic_strategy['soft_totals'].get(player_value, {}).get(dealer_card, 'hit')
-        # For hard totals, reference the strategy matrix directly
-        else:
-            action = basic_strategy['hard_totals'].get(player_value, {}).get(dealer_card, 'hit')
+        """
+        Determines the player's action on an unsplit hand based on the strategy.
 
-        print(f"Player hand: {player_hand} (Value: {player_value}, {'Soft' if is_soft else 'Hard'}), Dealer card: {dealer_card}, Action: {action}")
+        A double or surrender the hand no longer allows (after a hit, say) is
+        replaced by the strategy's fallback, so a soft 18 that may not double
+        stands rather than hitting.
+        """
+        state = hand_state(player_hand)
+        index = state * CARD_SLOTS + dealer_card
+        action = ACTION_NAMES[resolve_action(self.action_table[index], self.fallback_table[index], state,
+                                             self.casino_rules)]
+
+        if self.events.enabled:
+            self.events.emit('decision', hand=list(player_hand), value=self.calculate_hand_value(player_hand),
+                             softness='Soft' if SOFT[state] else 'Hard', dealer_card=dealer_card, action=action)
 
         return action
 
+    def run(self, n_hands):
+        """
+        Plays `n_hands` hands back-to-back and returns their aggregate outcome.
+
+        Parameters:
+        - n_hands: Number of hands to simulate.
+
+        Returns:
+        - A SimulationResult with the number of hands played, net-unit sums and a count per outcome.
+        """
+        result = SimulationResult()
+        play_round = self.play_round
+        add_round = result.add_round
+        for _ in range(n_hands):
+            add_round(play_round())
+        return result
+
+    def play_shoe(self, index=None):
+        """
+        Plays one whole shoe, from its shuffle to the cut card.
+
+        Parameters:
+        - index: Number of the shoe within the table's stream (default is the current shoe if
+          nothing was dealt from it yet, else the next one). Any shoe can be replayed this way,
+          for example with a logging event sink.
+
+        Returns:
+        - A SimulationResult for the rounds dealt from that shoe.
+        """
+        rules = self.casino_rules
+        if index is not None:
+            rules.load_shoe(index)
+        elif rules.cards_dealt:
+            rules.initialize_shoe()
+        index = rules.shoe_index
+        result = SimulationResult()
+        while rules.cards_dealt < rules.cut_card:
+            result.add_round(self.play_round())
+            if rules.shoe_index != index:
+                break  # The shoe ran out mid-round and the next one was started
+        return result
+
     def simulate_hand(self, target_total=None):
-        print(f"--- Simulating Hand ---")
-        print(f"Starting running count for this hand: {self.running_count}")
+        """Plays one round and returns its outcome message (see OUTCOMES); `last_net` holds its net units."""
+        return OUTCOMES[self.play_round().outcome]
+
+    def play_round(self):
+        """
+        Plays one round.
+
+        Returns:
+        - The simulation's RoundResult, filled in place for this round.
+        """
+        instr = self.instrumentation
+        if instr is not None:
+            start = perf_counter()
+        outcome = self._play_hand()
+        if self.recorder is not None:
+            self._record(outcome)
+        if instr is not None:
+            instr.lap('round', start)
+            instr.count('rounds')
+        return self.round
+
+    def _record(self, outcome):
+        """Sends the round just played to the recorder."""
+        first_card, second_card, upcard, hole_card = self.round_cards
+        rules = self.casino_rules
+        self.recorder.record(
+            stream=rules.stream, shoe=rules.shoe_index, true_count=self.round_true_count, bet=self.round_bet,
+            cards=(first_card, second_card), upcard=upcard, hole_card=hole_card, actions=self.round_actions,
+            totals=[TOTAL[state] for state in self.round_states], dealer_total=TOTAL[self.round_dealer_state],
+            outcome=outcome, net=self.last_net)
+
+    def _play_hand(self):
+        # Hands are tracked as integer states (see src.hand_state): every draw is
+        # one NEXT_STATE index and every decision one action_table index. Card
+        # lists are only kept when tracing, for the events.
+        trace = self.events.enabled
+        rules = self.casino_rules
+        instr = self.instrumentation
+        if instr is not None:
+            lap = perf_counter()
+        rules.start_round()
+        if instr is not None:
+            lap = instr.lap('start_round', lap)
+        control = self.control
+        if control is not None:
+            control.start_round()
+        recording = self.recorder is not None
+        if recording:
+            self.round_true_count = rules.calculate_true_count()
+            self.round_bet = self.bet_function(self.round_true_count) if self.bet_function else 1.0
+        if trace:
+            self.events.emit('hand_start', running_count=rules.running_count)
+        deal_card = self.deal_card
+        next_state = NEXT_STATE
+        action_table = self.action_table
 
         # Initial Dealing Sequence (Player -> Dealer -> Player -> Dealer)
-        player_hand = [self.deal_card()]
-        dealer_hand = [self.deal_card()]  # Dealer's first card (face-up)
+        first_card = deal_card()
+        if control is not None:
+            control.first(first_card)
+        upcard = deal_card()  # Dealer's first card (face-up)
+        if control is not None:
+            control.upcard(first_card, upcard)
+        second_card = deal_card()
+        if control is not None:
+            control.second(first_card, upcard, second_card)
+        hole_card = deal_card()  # Dealer's second card (face-down)
+        if control is not None:
+            control.hole(first_card, second_card, upcard, hole_card)
 
-        player_hand.append(self.deal_card())
-        dealer_hand.append(self.deal_card())  # Dealer's second card (face-down)
+        player_state = next_state[next_state[first_card] * CARD_SLOTS + second_card]
+        dealer_state = next_state[next_state[upcard] * CARD_SLOTS + hole_card]
+        player_total = TOTAL[player_state]
+        dealer_total = TOTAL[dealer_state]
+        if recording:
+            self.round_cards = (first_card, second_card, upcard, hole_card)
+            self.round_states = [player_state]
+            self.round_dealer_state = dealer_state
+            self.round_actions = []
+        if instr is not None:
+            lap = instr.lap('initial_deal', lap)
 
-        # Calculate initial totals
-        player_total = self.calculate_hand_value(player_hand)
-        dealer_total = self.calculate_hand_value(dealer_hand)
+        if trace:
+            # Only show the dealer's face-up card
+            self.events.emit('initial', player_hand=[first_card, second_card], player_total=player_total, upcard=upcard)
 
-        # Output adjustments
-        print(f"Player starting hand: {player_hand} (Total: {player_total})")
-        print(f"Dealer showing: {dealer_hand[0]}")  # Only show the dealer's face-up card
+        result = self.round
+        result.upcard = upcard
 
         # Check for natural blackjack (Player and Dealer)
         if player_total == 21 or dealer_total == 21:
+            if instr is not None:
+                instr.count('naturals')
+                instr.count('player_hands')
             if player_total == 21 and dealer_total == 21:
-                print("Both player and dealer have blackjack. Push - Tie game.")
-                return "Push - Tie game."
+                if trace:
+                    self.events.emit('natural', message="Both player and dealer have blackjack. Push - Tie game.")
+                outcome = PUSH_NATURALS
+                net = 0.0
             elif player_total == 21:
-                print("Player has a natural blackjack! Player wins with a 3:2 payout.")
-                return "Player wins with blackjack!"
-            elif dealer_total == 21:
-                print("Dealer has a natural blackjack! Dealer wins.")
-                return "Dealer wins with blackjack!"
-
-        # Peek if dealer's face-up card is an Ace or a ten-value card (typically only if Ace)
-        if dealer_hand[0] == 11:
-            print("Dealer peeks for blackjack...")
-            if dealer_total == 21:
-                print("Dealer has a blackjack!")
-                if player_total == 21:
-                    print("Player also has blackjack. Push - Tie game.")
-                    return "Push - Tie game."
-                else:
-                    print("Player does not have blackjack. Dealer wins.")
-                    return "Dealer wins with blackjack!"
+                if trace:
+                    self.events.emit('natural', message="Player has a natural blackjack! Player wins with a 3:2 payout.")
+                outcome = PLAYER_BLACKJACK
+                net = rules.blackjack_payout
             else:
-                print("Dealer does not have a blackjack. Continuing with player turn.")
-                
-        # Initialize list to manage split hands
-        player_hands = [player_hand]
+                if trace:
+                    self.events.emit('natural', message="Dealer has a natural blackjack! Dealer wins.")
+                outcome = DEALER_BLACKJACK
+                net = -1.0
+            result.set(outcome, net, 1.0, 1, CATEGORY_NATURAL, False, False, True, False, False)
+            self.last_net = net
+            return outcome
+
+        # Initialize lists to manage split hands (reused from round to round)
+        states = self._states
+        states.clear()
+        states.append(player_state)
+        stakes = self._stakes  # Units wagered on each player hand
+        stakes.clear()
+        stakes.append(1)
+        hands = [[first_card, second_card]] if trace else None
+        fallback_table = self.fallback_table
+        split_aces = False  # Set once a pair of Aces has been split
+        doubled = False
+        player_busted = False
         hand_index = 0  # Keep track of which hand is being played
+        if recording:
+            self.round_states = states  # Updated in place as the hands are played
 
         # Play each player hand (including split hands)
-        while hand_index < len(player_hands):
-            hand = player_hands[hand_index]
-            first_action = True
+        while hand_index < len(states):
+            state = states[hand_index]
 
             while True:
-                action = self.get_action(hand, dealer_hand[0])
-                print(f"Player chooses to {action} with hand {hand} (total: {self.calculate_hand_value(hand)}) against dealer's {dealer_hand[0]}")
+                if instr is not None:
+                    decision_start = perf_counter()
+                index = state * CARD_SLOTS + upcard
+                action = action_table[index]
+                if action > STAND or split_aces:
+                    # Hit and stand are always allowed, except on split Aces
+                    requested = action
+                    action = resolve_action(action, fallback_table[index], state, rules, len(states), split_aces)
+                    if trace and requested == SPLIT and action != SPLIT:
+                        self.events.emit('split_limit')
+
+                if instr is not None:
+                    instr.lap('strategy', decision_start)
+                if recording:
+                    self.round_actions.append(action)
+                if trace:
+                    self.events.emit('decision', hand=list(hands[hand_index]), value=TOTAL[state],
+                                     softness='Soft' if SOFT[state] else 'Hard', dealer_card=upcard,
+                                     action=ACTION_NAMES[action])
 
                 # Handle splits
-                if action == 'split' and len(hand) == 2 and hand[0] == hand[1]:
-                    if len(player_hands) < self.casino_rules.max_splits:
-                        player_hands.append([hand[0], self.deal_card()])
-                        hand[1] = self.deal_card()  # Replace the second card of current hand
-                        print(f"Player splits: New hands: {player_hands}")
-                        first_action = True  # Reset first action for the new split hand
-                    else:
-                        print("Maximum splits reached.")
-                        action = 'hit'  # If unable to split, proceed to hit
-                
-                elif action == 'hit':
-                    hand.append(self.deal_card())
-                    if self.calculate_hand_value(hand) > 21:
-                        print("Player busts!")
-                        break
-
-                elif action == 'stand':
-                    print("Player stands.")
-                    break
+                if action == SPLIT:
+                    if instr is not None:
+                        split_start = perf_counter()
+                        instr.count('splits')
+                    pair_card = PAIR[state]
+                    split_aces = pair_card == 11
+                    new_card = deal_card()
+                    if control is not None:
+                        control.split_card(upcard, hole_card, pair_card, new_card)
+                    states.append(next_state[next_state[pair_card] * CARD_SLOTS + new_card])
+                    stakes.append(1)
+                    card = deal_card()  # Replace the second card of current hand
+                    if control is not None:
+                        control.split_card(upcard, hole_card, pair_card, card)
+                    state = next_state[next_state[pair_card] * CARD_SLOTS + card]
+                    if trace:
+                        hands.append([pair_card, new_card])
+                        hands[hand_index][1] = card
+                        self.events.emit('split', hands=[list(h) for h in hands])
+                    if instr is not None:
+                        instr.lap('split', split_start)
+                    continue
 
-                elif action == 'double' and first_action and self.casino_rules.double_on_any_two:
-                    print("Player doubles down.")
-                    hand.append(self.deal_card())
+                if action == STAND:
+                    if trace:
+                        self.events.emit('stand')
                     break
 
-                # Mark that the first action has been taken
-                first_action = False
+                if action == SURRENDER:
+                    if trace:
+                        self.events.emit('surrender')
+                    result.set(SURRENDERED, -0.5, 1.0, 1, CATEGORY_SURRENDERED, False, False, False, False, False)
+                    self.last_net = -0.5
+                    if instr is not None:
+                        instr.count('surrenders')
+                        instr.count('player_hands')
+                        instr.lap('player', lap)
+                    return SURRENDERED
 
+                if action == DOUBLE:
+                    if instr is not None:
+                        instr.count('doubles')
+                    if trace:
+                        self.events.emit('double')
+                    stakes[hand_index] = 2
+                    doubled = True
+
+                card = deal_card()
+                if control is not None:
+                    if action == DOUBLE:
+                        control.double(upcard, hole_card, state, card)
+                    else:
+                        control.hit(upcard, hole_card, state, len(states) > 1, card)
+                state = next_state[state * CARD_SLOTS + card]
+                if trace:
+                    hands[hand_index].append(card)
+                if action == DOUBLE:
+                    break
+                if BUSTED[state]:
+                    if trace:
+                        self.events.emit('bust')
+                    break
+
+            states[hand_index] = state
+            if BUSTED[state]:
+                player_busted = True
             hand_index += 1  # Move to the next hand
+        n_hands = len(states)
+        split = n_hands > 1
+        stake = float(sum(stakes))
+        category = CATEGORY_SPLIT if split else CATEGORY_DOUBLED if doubled else CATEGORY_PLAIN
+        if instr is not None:
+            instr.count('player_hands', n_hands)
+            lap = instr.lap('player', lap)
 
         # Dealer's turn - only if the player did not bust on all hands
-        for hand in player_hands:
-            if self.calculate_hand_value(hand) <= 21:
+        for state in states:
+            if not BUSTED[state]:
                 break
         else:
-            print("All player hands have busted. Dealer wins.")
-            return "Dealer wins!"
+            if trace:
+                self.events.emit('all_busted')
+            result.set(DEALER_WINS, -stake, stake, n_hands, category, doubled, split, False, True, False)
+            self.last_net = -stake
+            return DEALER_WINS
+
+        if trace:
+            dealer_hand = [upcard, hole_card]
+            self.events.emit('dealer_reveal', dealer_hand=list(dealer_hand))
 
-        print(f"Dealer's full hand: {dealer_hand}")
+        # Dealer hits until 17 or higher (or soft 17, if the rules say so)
+        dealer_done = DEALER_DONE_H17 if rules.dealer_hits_soft_17 else DEALER_DONE_S17
+        while not dealer_done[dealer_state]:
+            card = deal_card()
+            if control is not None:
+                control.dealer_draw(dealer_state, states, stakes, card)
+            dealer_state = next_state[dealer_state * CARD_SLOTS + card]
+            if trace:
+                dealer_hand.append(card)
+                self.events.emit('dealer_hit', dealer_hand=list(dealer_hand))
+        if instr is not None:
+            lap = instr.lap('dealer', lap)
+        if recording:
+            self.round_dealer_state = dealer_state
 
-        # Dealer hits until 17 or higher
-        while self.calculate_hand_value(dealer_hand) < 17 or (
-            self.casino_rules.dealer_hits_soft_17 and self.calculate_hand_value(dealer_hand) == 17 and 11 in dealer_hand):
-            dealer_hand.append(self.deal_card())
-            print(f"Dealer hits: {dealer_hand}")
-            if self.calculate_hand_value(dealer_hand) > 21:
-                print("Dealer busts! Player wins!")
-                return "Player wins!"
+        if BUSTED[dealer_state]:
+            if trace:
+                self.events.emit('dealer_bust')
+            # Hands that busted earlier still lose their stake
+            net = float(sum(-units if BUSTED[state] else units for state, units in zip(states, stakes)))
+            result.set(PLAYER_WINS, net, stake, n_hands, category, doubled, split, False, player_busted, True)
+            self.last_net = net
+            if instr is not None:
+                instr.lap('settle', lap)
+            return PLAYER_WINS
 
         # Determine the outcome if neither busts
-        dealer_value = self.calculate_hand_value(dealer_hand)
-        for hand in player_hands:
-            player_value = self.calculate_hand_value(hand)
-            print(f"Final Player hand: {hand} (Value: {player_value})")
-            if player_value > dealer_value:
-                print("Player wins!")
-            elif player_value < dealer_value:
-                print("Dealer wins!")
+        dealer_value = TOTAL[dealer_state]
+        net = 0.0
+        for index, state in enumerate(states):
+            player_value = TOTAL[state]
+            units = stakes[index]
+            if player_value > 21 or player_value < dealer_value:
+                net -= units
+                message = "Dealer wins!"
+            elif player_value > dealer_value:
+                net += units
+                message = "Player wins!"
             else:
-                print("Push - Tie game.")
+                message = "Push - Tie game."
+            if trace:
+                self.events.emit('hand_result', hand=list(hands[index]), value=player_value, message=message)
+        result.set(COMPLETED, net, stake, n_hands, category, doubled, split, False, player_busted, False)
+        self.last_net = net
+        if instr is not None:
+            instr.lap('settle', lap)
 
-        return "Completed"
+        return COMPLETED
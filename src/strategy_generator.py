@@ -0,0 +1,221 @@
+# strategy_generator.py
+
+import hashlib
+import json
+import os
+
+from src.exact import dealer_distribution, full_composition, remove_card, stand_ev
+from src.hand_state import BUSTED, CARD_SLOTS, CARDS, NEXT_STATE, PAIR, SOFT, TOTAL, double_allowed_table
+
+# Bump whenever the generated tables would change for the same rules, to invalidate cached files
+GENERATOR_VERSION = 2
+
+# CasinoRules parameters that can change a strategy decision (payout and penetration cannot)
+STRATEGY_RULES = ('decks', 'dealer_hits_soft_17', 'double_after_split', 'double_on_any_two', 'hit_split_aces')
+
+def strategy_rules(casino_rules):
+    """
+    Returns the rule parameters that generation actually models, normalized so equal strategies share them.
+
+    Resplits are not modelled: `max_splits` only matters as whether splitting is allowed at all, and
+    `resplit_aces` not at all, so rules differing only there share one generated strategy. Surrender is
+    reduced to `late_surrender`, so 'None' and None are the same rule.
+    """
+    params = {name: getattr(casino_rules, name) for name in STRATEGY_RULES}
+    params['split'] = casino_rules.max_splits > 1
+    params['late_surrender'] = casino_rules.late_surrender
+    return params
+
+def rules_key(casino_rules):
+    """Returns a short hash identifying the rule parameters that matter to strategy generation."""
+    params = strategy_rules(casino_rules)
+    params['version'] = GENERATOR_VERSION
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:20]
+
+def cache_root():
+    """Root of the on-disk caches: $BLACKJACK_CACHE_DIR or ~/.cache/blackjack_simulator."""
+    return os.environ.get('BLACKJACK_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache',
+                                                                 'blackjack_simulator')
+
+def default_cache_dir():
+    """Directory for generated strategies: `cache_root()` plus 'strategies'."""
+    return os.path.join(cache_root(), 'strategies')
+
+class StrategyGenerator:
+    """
+    Computes the EV-maximising basic strategy for a set of CasinoRules.
+
+    For every upcard and every starting two-card hand, the expected value of
+    each allowed action (stand, hit, double, split, late surrender) is
+    computed with optimal play afterwards, against the exact dealer
+    distribution for the shoe left after the deal (see src.exact). The EVs of
+    all hands sharing a hard total, soft total or pair are weighted by how
+    often each hand is dealt, and the best action becomes that table entry.
+
+    Doubles and surrenders that turn out best also record the better of hit
+    and stand as their fallback ('double/stand'), which is what the
+    simulator plays when the first choice is not allowed, such as after a
+    hit. As in src.exact, split hands are evaluated without resplits, so
+    `max_splits` beyond 2 and `resplit_aces` do not change the tables (see
+    `strategy_rules`).
+    """
+
+    def __init__(self, casino_rules):
+        """
+        Parameters:
+        - casino_rules: CasinoRules to generate the strategy for.
+        """
+        self.casino_rules = casino_rules
+        self.composition = full_composition(casino_rules.decks)
+        self.double_allowed = double_allowed_table(casino_rules.double_on_any_two)
+
+    def _best_ev(self, state, comp, upcard, distribution, split_hand, memo):
+        """Expected net units of the best play from `state` (hit, stand, or a double on a two-card hand)."""
+        if BUSTED[state]:
+            return -1.0
+        key = (state, comp, split_hand)
+        cached = memo.get(key)
+        if cached is None:
+            cached = max(self._action_evs(state, comp, upcard, distribution, split_hand, memo,
+                                          allow_split=False, allow_surrender=False).values())
+            memo[key] = cached
+        return cached
+
+    def _action_evs(self, state, comp, upcard, distribution, split_hand, memo, allow_split, allow_surrender):
+        """Returns {action: EV} for every action the rules allow from `state`."""
+        rules = self.casino_rules
+        remaining = sum(comp)
+        row = state * CARD_SLOTS
+        evs = {'stand': stand_ev(TOTAL[state], distribution)}
+
+        hit = 0.0
+        double = 0.0
+        for i, count in enumerate(comp):
+            if count:
+                p = count / remaining
+                next_state = NEXT_STATE[row + i + 2]
+                hit += p * self._best_ev(next_state, comp[:i] + (count - 1,) + comp[i + 1:],
+                                         upcard, distribution, split_hand, memo)
+                double += p * stand_ev(TOTAL[next_state], distribution)
+        evs['hit'] = hit
+        if self.double_allowed[state] and (not split_hand or rules.double_after_split):
+            evs['double'] = 2 * double
+
+        if allow_surrender and rules.late_surrender and CARDS[state] == 2:
+            evs['surrender'] = -0.5
+
+        if allow_split and PAIR[state] and rules.max_splits > 1:
+            pair_card = PAIR[state]
+            single = NEXT_STATE[pair_card]
+            one_card = pair_card == 11 and not rules.hit_split_aces
+            split = 0.0
+            for i, count in enumerate(comp):
+                if count:
+                    next_state = NEXT_STATE[single * CARD_SLOTS + i + 2]
+                    if one_card:
+                        hand_ev = stand_ev(TOTAL[next_state], distribution)
+                    else:
+                        hand_ev = self._best_ev(next_state, comp[:i] + (count - 1,) + comp[i + 1:],
+                                                upcard, distribution, True, memo)
+                    split += count / remaining * hand_ev
+            evs['split'] = 2 * split
+        return evs
+
+    def action_evs(self, first_card, second_card, upcard):
+        """
+        Returns {action: EV} for a starting hand against an upcard, given no dealer natural.
+
+        Parameters:
+        - first_card, second_card: The player's first two cards (2-11).
+        - upcard: The dealer's face-up card (2-11).
+        """
+        comp = remove_card(remove_card(remove_card(self.composition, first_card), second_card), upcard)
+        distribution = dealer_distribution(comp, upcard, self.casino_rules.dealer_hits_soft_17)
+        state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+        return self._action_evs(state, comp, upcard, distribution, False, {},
+                                allow_split=True, allow_surrender=True)
+
+    def generate(self):
+        """
+        Computes the strategy.
+
+        Returns:
+        - A strategy dict in the format of `basic_strategy`, covering hard totals
+          4-20, soft totals 12-20 and every pair against every upcard.
+        """
+        comp = self.composition
+        totals = {'hard_totals': {}, 'soft_totals': {}}
+        pairs = {}
+        for upcard in range(2, 12):
+            weighted = {'hard_totals': {}, 'soft_totals': {}}
+            comp_up = remove_card(comp, upcard)
+            for first_card in range(2, 12):
+                for second_card in range(first_card, 12):
+                    if first_card + second_card == 21:
+                        continue  # Naturals are settled before any decision
+                    comp_first = remove_card(comp_up, first_card)
+                    weight = comp_up[first_card - 2] * comp_first[second_card - 2]
+                    if not weight:
+                        continue
+                    if first_card != second_card:
+                        weight *= 2  # Either card may come first
+                    evs = self.action_evs(first_card, second_card, upcard)
+                    if first_card == second_card:
+                        pairs.setdefault(first_card, {})[upcard] = _entry(evs)
+                        evs.pop('split', None)
+                    state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+                    section = 'soft_totals' if SOFT[state] else 'hard_totals'
+                    sums = weighted[section].setdefault(TOTAL[state], {})
+                    for action, ev in evs.items():
+                        sums[action] = sums.get(action, 0.0) + weight * ev
+            for section, rows in weighted.items():
+                for total, sums in rows.items():
+                    totals[section].setdefault(total, {})[upcard] = _entry(sums)
+        strategy = {section: dict(sorted(rows.items())) for section, rows in totals.items()}
+        strategy['pairs'] = dict(sorted(pairs.items()))
+        return strategy
+
+def _entry(evs):
+    """Turns {action: EV} into a strategy entry, adding the best of hit and stand as a fallback."""
+    action = max(evs, key=evs.get)
+    if action in ('double', 'surrender') and evs['stand'] > evs['hit']:
+        return f"{action}/stand"
+    return action
+
+def _load(path):
+    with open(path) as f:
+        stored = json.load(f)
+    return {section: {int(total): {int(upcard): action for upcard, action in row.items()}
+                      for total, row in rows.items()}
+            for section, rows in stored['strategy'].items()}
+
+def generate_strategy(casino_rules, cache_dir=None, use_cache=True):
+    """
+    Returns the optimal strategy for the given rules, generating it only if it is not cached on disk.
+
+    Parameters:
+    - casino_rules: CasinoRules to generate the strategy for.
+    - cache_dir: Directory of cached strategies (default is `default_cache_dir()`).
+    - use_cache: Set to False to always regenerate (the result is still written to the cache).
+
+    Returns:
+    - A strategy dict usable anywhere `basic_strategy` is.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f"{rules_key(casino_rules)}.json")
+    if use_cache and os.path.exists(path):
+        return _load(path)
+
+    strategy = StrategyGenerator(casino_rules).generate()
+    os.makedirs(cache_dir, exist_ok=True)
+    stored = {
+        'rules': strategy_rules(casino_rules),
+        'version': GENERATOR_VERSION,
+        'strategy': strategy,
+    }
+    # Write to a temporary file first so concurrent sweeps never read a partial table
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(stored, f, indent=1)
+    os.replace(tmp_path, path)
+    return strategy
@@ -0,0 +1,139 @@
+# streaming.py
+
+import math
+
+import numpy as np
+
+class RunningStats:
+    """
+    Count, mean and variance of a stream of values in constant memory.
+
+    Values are folded in a batch at a time with Welford's update (in the
+    pairwise form of Chan et al.), which stays accurate however many values
+    are added, and two accumulators can be merged exactly.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+
+    def add(self, values):
+        """Adds an array (or any sequence) of values."""
+        values = np.asarray(values, dtype=np.float64)
+        n = values.size
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        self._combine(n, mean, m2)
+
+    def merge(self, other):
+        """Adds every value seen by another RunningStats and returns self."""
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+        return self
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """Sample variance of the values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def std_error(self):
+        """Standard error of `mean`."""
+        return math.sqrt(self.variance / self.count) if self.count else 0.0
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, mean={self.mean:.6g}, std={self.std:.6g})"
+
+class QuantileSketch:
+    """
+    Fixed-size quantile sketch with a bounded relative error.
+
+    Values are counted in logarithmically spaced buckets (as in DDSketch):
+    a value v lands in bucket ceil(log(v) / log(gamma)) with
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy), so any
+    quantile is returned within `relative_accuracy` of a value of the
+    stream. Negative values use a mirrored set of buckets and magnitudes
+    below `min_value` count as zero. The bucket arrays are allocated once
+    from [min_value, max_value] (larger magnitudes share the top bucket),
+    so memory does not grow with the number of values added.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3, max_value=1e12):
+        """
+        Parameters:
+        - relative_accuracy: Relative error bound of every quantile (default is 1%).
+        - min_value: Smallest magnitude told apart from zero.
+        - max_value: Largest magnitude with its own bucket.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = math.ceil(math.log(min_value) / self.log_gamma)
+        n_buckets = math.ceil(math.log(max_value) / self.log_gamma) - self.offset + 1
+        self.min_value = min_value
+        self.positive = np.zeros(n_buckets, dtype=np.int64)
+        self.negative = np.zeros(n_buckets, dtype=np.int64)
+        self.zero = 0
+        self.count = 0
+
+    def _buckets(self, magnitudes):
+        index = np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64) - self.offset
+        return np.clip(index, 0, self.positive.size - 1)
+
+    def add(self, values):
+        """Adds an array (or any sequence) of values."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.count += values.size
+        positive = values[values >= self.min_value]
+        negative = -values[values <= -self.min_value]
+        self.zero += values.size - positive.size - negative.size
+        self.positive += np.bincount(self._buckets(positive), minlength=self.positive.size)
+        self.negative += np.bincount(self._buckets(negative), minlength=self.negative.size)
+
+    def merge(self, other):
+        """Adds the counts of a sketch built with the same parameters and returns self."""
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def _value(self, bucket):
+        """Representative value of a bucket: the centre of its interval in relative terms."""
+        return 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Returns the value at quantile `q` (0-1) of every value added, or None if the sketch is empty.
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        # Walk the buckets in increasing value order: negatives from the largest magnitude down, zero, positives
+        cumulative = np.cumsum(self.negative[::-1])
+        if cumulative[-1] > rank:
+            bucket = int(np.searchsorted(cumulative, rank, side='right'))
+            return -self._value(self.negative.size - 1 - bucket)
+        seen = int(cumulative[-1]) + self.zero
+        if seen > rank:
+            return 0.0
+        cumulative = seen + np.cumsum(self.positive)
+        bucket = int(np.searchsorted(cumulative, rank, side='right'))
+        return self._value(min(bucket, self.positive.size - 1))
+
+    def __repr__(self):
+        return f"QuantileSketch(count={self.count}, relative_accuracy={self.relative_accuracy})"
@@ -0,0 +1,129 @@
+# sweep.py
+
+from itertools import product
+
+from src.basic_strategy import basic_strategy
+from src.betting_strategy import calculate_bet, flat_bet
+from src.casino_rules import CasinoRules
+from src.simulation import BlackjackSimulation
+
+DEFAULT_BET_RAMPS = {'flat': flat_bet, 'hi_lo_ramp': calculate_bet}
+
+def expand_grid(**options):
+    """
+    Expands lists of CasinoRules parameter values into every combination.
+
+    Example: expand_grid(decks=[6, 8], blackjack_payout=[1.5, 1.2]) gives four
+    parameter dicts, varying the last parameter fastest.
+
+    Returns:
+    - A list of keyword-argument dicts for CasinoRules.
+    """
+    names = list(options)
+    return [dict(zip(names, values)) for values in product(*(options[name] for name in names))]
+
+def _play_shoe(simulation, ramps):
+    """
+    Plays one shoe from the shuffle to the cut card.
+
+    Returns:
+    - (rounds played, [money won by the player under each ramp], [initial bets placed under each ramp]).
+    """
+    rules = simulation.casino_rules
+    shoe = rules.shoe
+    rounds = 0
+    won = [0.0] * len(ramps)
+    wagered = [0.0] * len(ramps)
+    while shoe.cursor < rules.cut_card:
+        cursor = shoe.cursor
+        true_count = rules.calculate_true_count()
+        bets = [ramp(true_count) for ramp in ramps]  # Bets are placed before the round
+        simulation.simulate_hand()
+        net = simulation.last_net
+        for i, bet in enumerate(bets):
+            won[i] += bet * net
+            wagered[i] += bet
+        rounds += 1
+        if shoe.cursor < cursor:
+            break  # The shoe ran out mid-round and was reshuffled
+    return rounds, won, wagered
+
+def _ratio_terms(won, rounds):
+    """
+    Returns the per-round mean of `won` over all shoes and each shoe's linearised
+    deviation from it, whose spread gives the standard error of the mean.
+    """
+    mean = sum(won) / sum(rounds)
+    mean_rounds = sum(rounds) / len(rounds)
+    return mean, [(w - mean * n) / mean_rounds for w, n in zip(won, rounds)]
+
+def _std_error(terms):
+    n = len(terms)
+    if n < 2:
+        return 0.0
+    centre = sum(terms) / n
+    return (sum((t - centre) ** 2 for t in terms) / (n - 1) / n) ** 0.5
+
+def run_sweep(rule_grid, bet_ramps=None, n_shoes=1000, seed=0, strategy=basic_strategy):
+    """
+    Plays every combination of rules and bet ramp on the same sequence of shoes.
+
+    Shoe i of every configuration is shoe i of the seed (see src.rng), so
+    configurations face common random numbers: with the same number of decks
+    they get the very same cards until their play differs, and all bet ramps
+    of one rule set are applied to the very same rounds. Differences between
+    cells are therefore estimated from paired per-shoe results, whose error
+    is far smaller than that of independent runs.
+
+    Parameters:
+    - rule_grid: List of keyword-argument dicts for CasinoRules (see `expand_grid`).
+    - bet_ramps: Dict of name -> function(true_count) returning the bet
+      (default is DEFAULT_BET_RAMPS).
+    - n_shoes: Number of shoes played by each rule set, each dealt to its cut card.
+    - seed: Seed of the shoe sequence.
+    - strategy: Strategy dict in the format of `basic_strategy`.
+
+    Returns:
+    - A list with one row dict per (rules, ramp) cell, in grid order: the rule
+      parameters, 'bet_ramp', 'shoes', 'rounds', 'avg_bet', 'ev' (money won per
+      round), 'std_error', and 'diff' / 'diff_std_error', the paired difference
+      in EV from the first cell and its standard error.
+    """
+    bet_ramps = bet_ramps or DEFAULT_BET_RAMPS
+    ramps = list(bet_ramps.values())
+    cells = []
+    for params in rule_grid:
+        rules = CasinoRules(**params, seed=seed)
+        simulation = BlackjackSimulation(rules, strategy=strategy)
+        rounds = []
+        won = [[] for _ in ramps]
+        wagered = [0.0] * len(ramps)
+        for shoe in range(n_shoes):
+            rules.load_shoe(shoe)
+            shoe_rounds, shoe_won, shoe_wagered = _play_shoe(simulation, ramps)
+            rounds.append(shoe_rounds)
+            for i, amount in enumerate(shoe_won):
+                won[i].append(amount)
+                wagered[i] += shoe_wagered[i]
+        for i, name in enumerate(bet_ramps):
+            cells.append((params, name, rounds, won[i], wagered[i]))
+
+    rows = []
+    base_mean = base_terms = None
+    for params, name, rounds, won, wagered in cells:
+        mean, terms = _ratio_terms(won, rounds)
+        if base_terms is None:
+            base_mean, base_terms = mean, terms
+        row = dict(params)
+        row.update({
+            'bet_ramp': name,
+            'shoes': n_shoes,
+            'rounds': sum(rounds),
+            'avg_bet': wagered / sum(rounds),
+            'ev': mean,
+            'std_error': _std_error(terms),
+            'diff': mean - base_mean,
+            'diff_std_error': _std_error([t - b for t, b in zip(terms, base_terms)]),
+        })
+        rows.append(row)
+    return rows
@@ -0,0 +1,337 @@
+# vectorized.py
+
+import numpy as np
+
+from src.basic_strategy import basic_strategy
+from src.rng import order_keys, shoe_key
+from src.history import MAX_ACTIONS, MAX_HANDS, NO_ACTION, RECORD_DTYPE
+from src.hand_state import (BUSTED, CARD_SLOTS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, HIT, NEXT_STATE, PAIR,
+                            SPLIT, STAND, SURRENDER, TOTAL, compile_strategy, resolve_action)
+from src.shoe import CARDS_PER_DECK, SINGLE_DECK
+from src.simulation import (CATEGORIES, CATEGORY_DOUBLED, CATEGORY_NATURAL, CATEGORY_PLAIN, CATEGORY_SPLIT,
+                            CATEGORY_SURRENDERED, COMPLETED, DEALER_BLACKJACK, DEALER_WINS, OUTCOMES, PLAYER_BLACKJACK,
+                            PLAYER_WINS, PUSH_NATURALS, SURRENDERED, SimulationResult)
+
+# The hand-state machine of src.hand_state as arrays, so that every draw and
+# every decision for all lanes is one fancy index
+NEXT = np.asarray(NEXT_STATE, dtype=np.int64)
+TOTALS = np.asarray(TOTAL, dtype=np.int64)
+PAIRS = np.asarray(PAIR, dtype=np.int64)
+IS_BUSTED = np.asarray(BUSTED)
+
+def keyed_orders(keys, size):
+    """
+    Returns one random permutation of range(size) per key, as a (len(keys), size) array.
+
+    This is src.rng.keyed_order for a batch of keys: the same sort keys and
+    the same stable sort, so a lane deals exactly the shoe CasinoRules.load_shoe
+    builds for its (seed, stream, index), and all lanes are sorted in one call.
+    """
+    sort_keys = np.frombuffer(b"".join(order_keys(key, size) for key in keys), dtype='<u8')
+    return np.argsort(sort_keys.reshape(len(keys), size), axis=1, kind='stable')
+
+class VectorizedSimulation:
+    """
+    Plays one hand on each of many independent shoes at once with NumPy array operations.
+
+    Every shoe ("lane") follows the same rules and decisions as
+    `BlackjackSimulation.simulate_hand`: naturals are settled first, player
+    hands (including split hands, up to `max_splits`) are played in order from
+    the compiled strategy table, then the dealer draws to 17 (hitting soft 17
+    if the rules say so). Hands are hand-state integers (see src.hand_state),
+    so each decision or draw is a fancy index over all lanes still in that
+    phase and throughput is bound by NumPy rather than the interpreter.
+    """
+
+    def __init__(self, casino_rules, n_shoes=4096, seed=0, strategy=basic_strategy, recorder=None,
+                 first_stream=0):
+        """
+        Parameters:
+        - casino_rules: CasinoRules describing the table (its own shoe is not used).
+        - n_shoes: Number of independent shoes played in lockstep.
+        - seed: Seed of the shoes. Lane i deals the shoes of stream `first_stream + i`,
+          each a pure function of (seed, stream, shoe number) (see src.rng).
+        - strategy: Strategy dict in the format of `basic_strategy`.
+        - recorder: Optional HistoryRecorder (see src.history) receiving a record of every round.
+        - first_stream: Stream of the first lane, so that several engines can split one run between them.
+        """
+        self.casino_rules = casino_rules
+        self.n_shoes = n_shoes
+        self.recorder = recorder
+        self.records = np.zeros(n_shoes, dtype=RECORD_DTYPE) if recorder is not None else None
+        self.seed = seed
+        self.deck = np.frombuffer(SINGLE_DECK * casino_rules.decks, dtype=np.int8)
+        self.size = self.deck.size
+        self.streams = np.arange(first_stream, first_stream + n_shoes)
+        self.shoe_index = np.zeros(n_shoes, dtype=np.int64)  # Number of the shoe in play in each lane
+        self.shoes = np.empty((n_shoes, self.size), dtype=np.int8)
+        self.flat_shoes = self.shoes.reshape(-1)  # View used for single-index dealing
+        self.cursor = np.zeros(n_shoes, dtype=np.intp)
+        # Running count of the table's primary counting system after the first i cards of each shoe,
+        # so the count at any cursor is one index (fractional tags such as Wong Halves use floats)
+        system = casino_rules.counter.primary
+        integral = all(float(tag).is_integer() for tag in system.tags)
+        self.count_tags = np.asarray(system.tags, dtype=np.int16 if integral else np.float64)
+        self.initial_count = system.initial_count(casino_rules.decks)
+        self.count_prefix = np.full((n_shoes, self.size + 1), self.initial_count, dtype=self.count_tags.dtype)
+        self.cut_card = int(self.size * casino_rules.penetration)
+        self.max_hands = max(1, casino_rules.max_splits)
+        actions, fallbacks = compile_strategy(strategy)
+        # The action played for each (hands so far - 1, Aces split, state * CARD_SLOTS + upcard), from
+        # src.hand_state.resolve_action so that the rules are those of the scalar engine
+        self.played_table = np.asarray(
+            [[[resolve_action(action, fallback, index // CARD_SLOTS, casino_rules, n_hands, split_aces)
+               for index, (action, fallback) in enumerate(zip(actions, fallbacks))]
+              for split_aces in (False, True)]
+             for n_hands in range(1, self.max_hands + 1)], dtype=np.int8)
+        self.dealer_done = np.asarray(DEALER_DONE_H17 if casino_rules.dealer_hits_soft_17 else DEALER_DONE_S17)
+        self.lanes = np.arange(n_shoes)
+        # Upcard, round category (see CATEGORIES) and units wagered of every lane in the last round
+        self.round_upcard = np.zeros(n_shoes, dtype=np.int64)
+        self.round_category = np.zeros(n_shoes, dtype=np.int64)
+        self.round_stake = np.ones(n_shoes)
+        self._arrange(self.lanes)
+
+    def _arrange(self, lanes):
+        """Deals the shoe numbered `shoe_index` of each lane in `lanes` (an index array) into its lane."""
+        keys = [shoe_key(self.seed, stream, index)
+                for stream, index in zip(self.streams[lanes].tolist(), self.shoe_index[lanes].tolist())]
+        self.shoes[lanes] = self.deck[keyed_orders(keys, self.size)]
+        self.count_prefix[lanes, 1:] = self.initial_count + np.cumsum(self.count_tags[self.shoes[lanes]], axis=1)
+        self.cursor[lanes] = 0
+
+    def reshuffle(self, lanes):
+        """Moves the given lanes on to the next shoe of their stream."""
+        self.shoe_index[lanes] += 1
+        self._arrange(lanes)
+
+    def load_shoe(self, lane, index):
+        """Deals shoe number `index` of the lane's stream into the lane, in the same time for any index."""
+        self.shoe_index[lane] = index
+        self._arrange(np.array([lane]))
+
+    def set_shoe(self, lane, cards):
+        """Replaces the shoe of one lane by the given cards in dealing order (e.g. `Shoe.cards`) and rewinds it."""
+        self.shoes[lane] = np.frombuffer(bytes(cards), dtype=np.int8)
+        self.count_prefix[lane, 1:] = self.initial_count + np.cumsum(self.count_tags[self.shoes[lane]])
+        self.cursor[lane] = 0
+
+    def start_round(self):
+        """Reshuffles every shoe that has reached the cut card (penetration level)."""
+        past_cut = np.nonzero(self.cursor >= self.cut_card)[0]
+        if past_cut.size:
+            self.reshuffle(past_cut)
+
+    def running_counts(self):
+        """Running count of the primary counting system of every shoe at its cursor."""
+        return self.count_prefix[self.lanes, self.cursor]
+
+    def true_counts(self):
+        """True count of every shoe, as `CasinoRules.calculate_true_count` computes it."""
+        decks_remaining = (self.size - self.cursor) / CARDS_PER_DECK
+        return self.running_counts() / decks_remaining
+
+    def _draw(self, lanes):
+        """Deals the next card from the shoe of each lane in `lanes` (an index array)."""
+        cursor = self.cursor[lanes]
+        empty = cursor >= self.size
+        if empty.any():
+            # A shoe ran out mid-round: reshuffle it, as CasinoRules.deal_card does
+            self.reshuffle(lanes[empty])
+            cursor = self.cursor[lanes]
+        self.cursor[lanes] = cursor + 1
+        return self.flat_shoes[lanes * self.size + cursor].astype(np.int64)
+
+    @staticmethod
+    def _deal_two(first, second):
+        """State of two-card hands given their cards."""
+        return NEXT[NEXT[first] * CARD_SLOTS + second]
+
+    def play_round(self, bets=None):
+        """
+        Plays one round on every shoe.
+
+        Parameters:
+        - bets: Optional bet of every shoe, only used for the recorded history (net units are per unit bet).
+
+        Returns:
+        - (net, outcome) arrays: net units won by the player on each shoe and an
+          outcome code per shoe (see OUTCOMES).
+        """
+        rules = self.casino_rules
+        lanes = self.lanes
+        self.start_round()
+        records = self.records
+        if records is not None:
+            records['stream'] = self.streams
+            records['shoe'] = self.shoe_index
+            records['true_count'] = self.true_counts()
+            records['bet'] = 1.0 if bets is None else bets
+
+        # Initial Dealing Sequence (Player -> Dealer -> Player -> Dealer)
+        p1 = self._draw(lanes)
+        upcard = self._draw(lanes)
+        p2 = self._draw(lanes)
+        hole = self._draw(lanes)
+        if records is not None:
+            records['cards'] = np.stack((p1, p2), axis=1)
+            records['upcard'] = upcard
+            records['hole_card'] = hole
+            records['actions'] = NO_ACTION
+            records['hands'] = 1
+            records['totals'] = 0
+            records['totals'][:, 0] = TOTALS[self._deal_two(p1, p2)]
+            records['dealer_total'] = TOTALS[self._deal_two(upcard, hole)]
+
+        net = np.zeros(self.n_shoes)
+        outcome = np.full(self.n_shoes, COMPLETED, dtype=np.int8)
+        player_natural = (p1 + p2) == 21
+        dealer_natural = (upcard + hole) == 21
+        net[player_natural & ~dealer_natural] = rules.blackjack_payout
+        net[dealer_natural & ~player_natural] = -1.0
+        outcome[player_natural & dealer_natural] = PUSH_NATURALS
+        outcome[player_natural & ~dealer_natural] = PLAYER_BLACKJACK
+        outcome[dealer_natural & ~player_natural] = DEALER_BLACKJACK
+        self.round_upcard[:] = upcard
+        self.round_category[:] = CATEGORY_NATURAL
+        self.round_stake[:] = 1.0
+
+        live = np.nonzero(~(player_natural | dealer_natural))[0]
+        m = live.size
+        if m == 0:
+            self._write_records(net, outcome)
+            return net, outcome
+        H = self.max_hands
+        up = upcard[live]
+        played_table = self.played_table
+
+        # Hand state of every live lane, one row per hand slot: slot 0 is the
+        # original hand and every split appends a slot
+        state = np.zeros((H, m), dtype=np.int64)
+        stake = np.ones((H, m))
+        n_hands = np.ones(m, dtype=np.int64)
+        state[0] = self._deal_two(p1[live], p2[live])
+
+        aces_split = np.zeros(m, dtype=bool)  # Lanes that split a pair of Aces this round
+        surrendered = np.zeros(m, dtype=bool)
+        if records is not None:
+            action_log = np.full((m, MAX_ACTIONS), NO_ACTION, dtype=np.int8)
+            n_logged = np.zeros(m, dtype=np.int64)
+
+        for h in range(H):
+            playing = n_hands > h
+            slot = state[h]
+            while True:
+                rows = np.nonzero(playing)[0]
+                if rows.size == 0:
+                    break
+                current = slot[rows]
+                index = current * CARD_SLOTS + up[rows]
+                action = played_table[n_hands[rows] - 1, aces_split[rows].astype(np.int64), index]
+                if records is not None:
+                    kept = n_logged[rows] < MAX_ACTIONS
+                    action_log[rows[kept], n_logged[rows[kept]]] = action[kept]
+                    n_logged[rows] += 1
+
+                splits = rows[action == SPLIT]
+                if splits.size:
+                    pair_card = PAIRS[slot[splits]]
+                    aces_split[splits] = pair_card == 11
+                    new_card = self._draw(live[splits])
+                    state[n_hands[splits], splits] = self._deal_two(pair_card, new_card)
+                    replacement = self._draw(live[splits])
+                    slot[splits] = self._deal_two(pair_card, replacement)
+                    n_hands[splits] += 1
+
+                surrenders = rows[action == SURRENDER]
+                surrendered[surrenders] = True
+                playing[surrenders] = False
+
+                drawing = rows[(action == HIT) | (action == DOUBLE)]
+                if drawing.size:
+                    cards = self._draw(live[drawing])
+                    slot[drawing] = NEXT[slot[drawing] * CARD_SLOTS + cards]
+                    playing[drawing[IS_BUSTED[slot[drawing]]]] = False
+
+                doubles = rows[action == DOUBLE]
+                stake[h, doubles] = 2.0
+                playing[doubles] = False
+                playing[rows[action == STAND]] = False
+
+        # Dealer's turn - only on lanes where the player did not bust on all hands
+        in_play = np.arange(H)[:, None] < n_hands
+        busted = IS_BUSTED[state]
+        dealer_plays = (in_play & ~busted).any(axis=0) & ~surrendered
+        dealer_state = self._deal_two(up, hole[live])
+        while True:
+            rows = np.nonzero(dealer_plays & ~self.dealer_done[dealer_state])[0]
+            if rows.size == 0:
+                break
+            cards = self._draw(live[rows])
+            dealer_state[rows] = NEXT[dealer_state[rows] * CARD_SLOTS + cards]
+        dealer_value = TOTALS[dealer_state]
+        dealer_bust = dealer_value > 21
+
+        # Settle every hand of every live lane
+        player_value = TOTALS[state]
+        wins = ~busted & (dealer_bust | (player_value > dealer_value))
+        losses = busted | (~dealer_bust & (player_value < dealer_value))
+        hand_net = np.where(wins, stake, np.where(losses, -stake, 0.0))
+        net[live] = np.where(surrendered, -0.5, np.where(in_play, hand_net, 0.0).sum(axis=0))
+
+        lane_outcome = np.where(surrendered, SURRENDERED,
+                                np.where(~dealer_plays, DEALER_WINS, np.where(dealer_bust, PLAYER_WINS, COMPLETED)))
+        outcome[live] = lane_outcome
+        self.round_category[live] = np.where(
+            surrendered, CATEGORY_SURRENDERED,
+            np.where(n_hands > 1, CATEGORY_SPLIT, np.where(stake[0] > 1, CATEGORY_DOUBLED, CATEGORY_PLAIN)))
+        self.round_stake[live] = np.where(surrendered, 1.0, np.where(in_play, stake, 0.0).sum(axis=0))
+        if records is not None:
+            kept = min(H, MAX_HANDS)
+            records['actions'][live] = action_log
+            records['hands'][live] = n_hands
+            records['totals'][live, :kept] = np.where(in_play, player_value, 0)[:kept].T
+            records['dealer_total'][live] = dealer_value
+            self._write_records(net, outcome)
+        return net, outcome
+
+    def _write_records(self, net, outcome):
+        """Completes this round's records with the results and sends them to the recorder."""
+        records = self.records
+        if records is not None:
+            records['net'] = net
+            records['outcome'] = outcome
+            self.recorder.write(records)
+
+    def run(self, n_rounds):
+        """
+        Plays `n_rounds` rounds on every shoe.
+
+        Parameters:
+        - n_rounds: Number of rounds; `n_rounds * n_shoes` hands are played in total.
+
+        Returns:
+        - A SimulationResult comparable to `BlackjackSimulation.run`.
+        """
+        result = SimulationResult()
+        outcome_counts = np.zeros(len(OUTCOMES), dtype=np.int64)
+        results = np.zeros((3, len(CATEGORIES)), dtype=np.int64)  # Wins, losses and pushes per category
+        net_by_upcard = np.zeros(CARD_SLOTS)
+        rounds_by_upcard = np.zeros(CARD_SLOTS, dtype=np.int64)
+        for _ in range(n_rounds):
+            net, outcome = self.play_round()
+            result.hands += net.size
+            result.total += float(net.sum())
+            result.total_sq += float(np.dot(net, net))
+            result.staked += float(self.round_stake.sum())
+            outcome_counts += np.bincount(outcome, minlength=len(OUTCOMES))
+            sign = np.where(net > 0, 0, np.where(net < 0, 1, 2))
+            results += np.bincount(sign * len(CATEGORIES) + self.round_category,
+                                   minlength=results.size).reshape(results.shape)
+            net_by_upcard += np.bincount(self.round_upcard, weights=net, minlength=CARD_SLOTS)
+            rounds_by_upcard += np.bincount(self.round_upcard, minlength=CARD_SLOTS)
+        result.outcome_counts = outcome_counts.tolist()
+        result.wins, result.losses, result.pushes = results.tolist()
+        result.net_by_upcard = net_by_upcard.tolist()
+        result.rounds_by_upcard = rounds_by_upcard.tolist()
+        return result
@@ -0,0 +1,62 @@
+# tests/test_bankroll.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.betting_strategy import calculate_bet, flat_bet
+from src.casino_rules import CasinoRules
+
+try:
+    import numpy as np
+    from src.bankroll import BankrollSimulation, bet_table
+    from src.vectorized import VectorizedSimulation
+except ImportError:  # NumPy is optional; only the array-based modules need it
+    np = None
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBankrollSimulation(unittest.TestCase):
+
+    def test_bet_table_matches_bet_function(self):
+        """The table holds the bet of the true count at every (running count, cursor)."""
+        table, offset = bet_table(calculate_bet, decks=2, cut_card=78)
+        for running_count, cursor in ((0, 0), (3, 52), (-5, 20), (9, 77)):
+            true_count = running_count / ((104 - cursor) / 52)
+            self.assertEqual(table[running_count + offset, cursor], calculate_bet(true_count))
+
+    def test_bet_table_follows_the_counting_system(self):
+        """An unbalanced system is tabulated from its initial count; fractional tags are refused."""
+        ko = CasinoRules(decks=2, counting_systems=('ko',)).counter.primary
+        table, offset = bet_table(calculate_bet, decks=2, cut_card=78, system=ko)
+        self.assertEqual(offset, 2 * 24 + 4)
+        self.assertEqual(table[-4 + offset, 0], calculate_bet(-2.0))
+        halves = CasinoRules(decks=2, counting_systems=('wong_halves',)).counter.primary
+        with self.assertRaises(ValueError):
+            bet_table(calculate_bet, decks=2, cut_card=78, system=halves)
+
+    def test_flat_bets_scale_the_engine_results(self):
+        """With flat bets and no ruin, the money won is the engine's net units times the bet."""
+        rules = CasinoRules(decks=6)
+        bankroll = BankrollSimulation(rules, bankroll=1e9, bet_function=flat_bet, trajectories=256, seed=4)
+        result = bankroll.run(50)
+        engine = VectorizedSimulation(rules, n_shoes=256, seed=4).run(50)
+        self.assertEqual(result.win.count, engine.hands)
+        self.assertAlmostEqual(result.win.mean, 10 * engine.mean, places=9)
+        self.assertEqual(result.bet.mean, 10)
+        self.assertEqual(result.risk_of_ruin, 0.0)
+
+    def test_ruined_trajectories_stop_betting(self):
+        """A bankroll of one bet is ruined by its first loss and then never changes."""
+        simulation = BankrollSimulation(CasinoRules(decks=6), bankroll=10, bet_function=flat_bet,
+                                        trajectories=512, seed=1)
+        result = simulation.run(20)
+        ruined = ~simulation.alive
+        self.assertGreater(result.risk_of_ruin, 0.5)
+        self.assertEqual(result.ruined, int(ruined.sum()))
+        balance = simulation.balance.copy()
+        simulation.run(5)
+        np.testing.assert_array_equal(simulation.balance[ruined], balance[ruined])
+        self.assertGreaterEqual(result.drawdown_quantiles((0.5,))[0.5], 9.9)
+
+if __name__ == "__main__":
+    unittest.main()
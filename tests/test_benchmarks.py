@@ -0,0 +1,49 @@
+# tests/test_benchmarks.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import unittest
+from benchmarks.suite import BASELINE_PATH, DEFAULT_THRESHOLD, benchmarks, combine_runs, compare, run_suite
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_baseline_covers_the_suite(self):
+        """The stored baseline has an entry for every benchmark."""
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        self.assertEqual(set(baseline['results']), {name for name, _, _ in benchmarks()})
+
+    def test_run_produces_machine_readable_results(self):
+        results = run_suite('calculate_hand_value', min_time=0.001, repeats=1)
+        json.dumps(results)
+        self.assertGreater(results['results']['calculate_hand_value']['ops_per_sec'], 0)
+
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = {'results': {'a': {'ops_per_sec': 100.0}, 'b': {'ops_per_sec': 100.0, 'threshold': 0.5},
+                                'c': {'ops_per_sec': 100.0}}}
+        current = {'results': {'a': {'ops_per_sec': 70.0}, 'b': {'ops_per_sec': 70.0}, 'c': {'ops_per_sec': 95.0},
+                               'new': {'ops_per_sec': 1.0}}}
+        rows, regressions = compare(current, baseline, threshold=0.2)
+        self.assertEqual(regressions, ['a'])
+        self.assertEqual([row[0] for row in rows], ['a', 'b', 'c'])
+
+    def test_combined_runs_keep_the_median_rate(self):
+        runs = [{'meta': {}, 'results': {'steady': {'ops_per_sec': rate, 'unit': 'calls/s'},
+                                         'noisy': {'ops_per_sec': noisy, 'unit': 'calls/s'}}}
+                for rate, noisy in ((100.0, 100.0), (98.0, 90.0), (101.0, 40.0))]
+        combined = combine_runs(runs)
+        self.assertEqual(combined['results']['steady'], {'ops_per_sec': 100.0, 'unit': 'calls/s'})
+        self.assertEqual(combined['results']['noisy'], {'ops_per_sec': 90.0, 'unit': 'calls/s'})
+        self.assertEqual(combined['meta']['runs'], 3)
+
+    def test_baseline_keeps_the_default_threshold(self):
+        """Noise is dealt with by the measurement, not by loosening the thresholds of the stored baseline."""
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        for entry in baseline['results'].values():
+            self.assertLessEqual(entry.get('threshold', DEFAULT_THRESHOLD), DEFAULT_THRESHOLD)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# tests/test_counting.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import unittest
+from src.casino_rules import CasinoRules
+from src.counting import (COUNTING_SYSTEMS, CountingSystem, CountTracker, compare_counting_systems,
+                          get_counting_system, register_counting_system)
+
+class TestCountingSystems(unittest.TestCase):
+
+    def test_registry_holds_the_standard_systems(self):
+        """Every standard system is registered; only KO is unbalanced."""
+        for name in ('hi_lo', 'ko', 'hi_opt_ii', 'omega_ii', 'zen', 'wong_halves'):
+            self.assertEqual(COUNTING_SYSTEMS[name].balanced, name != 'ko')
+        self.assertEqual(get_counting_system('zen').tags[4], 2)
+        with self.assertRaises(ValueError):
+            get_counting_system('no_such_count')
+
+    def test_tracker_counts_every_system_over_a_whole_shoe(self):
+        """Balanced counts end a shoe at zero and KO at +4, from its initial count of 4 - 4 * decks."""
+        rules = CasinoRules(decks=6, seed=3, counting_systems=list(COUNTING_SYSTEMS))
+        self.assertEqual(rules.running_counts()['ko'], 4 - 4 * 6)
+        while rules.shoe.cards_remaining:
+            rules.deal_card()
+        counts = rules.running_counts()
+        self.assertEqual(counts.pop('ko'), 4)
+        self.assertEqual(set(counts.values()), {0})
+
+    def test_tracker_matches_tag_sums(self):
+        """Each running count is the sum of its system's tags over the cards dealt."""
+        register_counting_system('aces_only', {2: 0, 3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0, 9: 0, 10: 0, 11: -1})
+        rules = CasinoRules(decks=2, seed=5, counting_systems=('hi_lo', 'wong_halves', 'aces_only'))
+        dealt = [rules.deal_card() for _ in range(40)]
+        halves = get_counting_system('wong_halves')
+        self.assertEqual(rules.running_count, sum(1 if card <= 6 else -1 if card >= 10 else 0 for card in dealt))
+        self.assertEqual(rules.running_counts()['wong_halves'], sum(halves.tags[card] for card in dealt))
+        self.assertEqual(rules.running_counts()['aces_only'], 4 - dealt.count(11))  # Unbalanced: starts at 4
+        self.assertEqual(rules.true_counts()['hi_lo'], rules.calculate_true_count())
+
+    def test_tracker_needs_distinct_systems(self):
+        with self.assertRaises(ValueError):
+            CountTracker((), decks=6)
+        with self.assertRaises(ValueError):
+            CountTracker(('hi_lo', 'hi_lo'), decks=6)
+
+    def test_single_system_fast_path_matches_the_full_update(self):
+        single = CountTracker(('ko',), decks=2)
+        several = CountTracker(('ko', 'zen'), decks=2)
+        for card in [2, 11, 10, 5, 7, 6, 10, 3] * 5:
+            single.update(card)
+            several.update(card)
+        self.assertEqual(single.running_count, several.running_count)
+        self.assertEqual(single.counts, several.counts[:1])
+        single.reset()
+        self.assertEqual(single.counts, [4 - 4 * 2])
+
+    def test_rules_round_trip_their_counting_systems(self):
+        """as_dict keeps the counting systems, registered or not, through JSON."""
+        custom = CountingSystem('sevens', (0, 0, 0, 0, 0, 1, 0, 0, 0, 0))
+        rules = CasinoRules(decks=2, seed=1, counting_systems=('zen', custom))
+        params = json.loads(json.dumps(rules.as_dict()))
+        self.assertEqual(params['counting_systems'], ['zen', {'name': 'sevens', 'tags': [0, 0, 0, 0, 0, 1, 0, 0, 0, 0]}])
+        rebuilt = CasinoRules(**params, seed=1)
+        self.assertEqual(rebuilt.counter.names, ('zen', 'sevens'))
+        self.assertEqual([system.tags for system in rebuilt.counter.systems], [system.tags for system in rules.counter.systems])
+        for _ in range(30):
+            rules.deal_card()
+            rebuilt.deal_card()
+        self.assertEqual(rebuilt.running_counts(), rules.running_counts())
+        self.assertEqual(rebuilt.as_dict(), rules.as_dict())
+
+    def test_compare_plays_one_pass_for_all_systems(self):
+        """Two copies of the same system see the same rounds and get the same figures."""
+        register_counting_system('hi_lo_copy', COUNTING_SYSTEMS['hi_lo'].tags[2:])
+        rules = CasinoRules(decks=2, seed=1, counting_systems=('hi_lo', 'hi_lo_copy', 'zen'))
+        rows = compare_counting_systems(rules, 2000)
+        self.assertEqual([row['system'] for row in rows], ['hi_lo', 'hi_lo_copy', 'zen'])
+        self.assertEqual(rows[0]['correlation'], rows[1]['correlation'])
+        self.assertGreater(rows[2]['true_count_std'], 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# tests/test_deviations.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.deviations import (BetRamp, DecisionBins, DecisionRollout, TrueCountBins, collect_count_stats,
+                            find_index_plays, optimal_bet_ramp, true_count_bin)
+from src.hand_state import CARD_SLOTS, HIT, NEXT_STATE, STAND, TOTAL, hand_state
+from src.simulation import BlackjackSimulation
+
+class TestTrueCountBins(unittest.TestCase):
+
+    def test_bins_floor_and_clip(self):
+        self.assertEqual(true_count_bin(0.5, -10, 10), 10)
+        self.assertEqual(true_count_bin(-0.5, -10, 10), 9)
+        self.assertEqual(true_count_bin(-25, -10, 10), 0)
+        self.assertEqual(true_count_bin(14.2, -10, 10), 20)
+
+    def test_rows_and_merge(self):
+        a = TrueCountBins(-2, 2)
+        b = TrueCountBins(-2, 2)
+        for net in (1.0, -1.0, 1.0):
+            a.add(1.3, net)
+        b.add(1.9, 1.0)
+        b.add(-7, -1.0)
+        rows = {row['true_count']: row for row in a.merge(b).rows()}
+        self.assertEqual(sorted(rows), [-2, 1])
+        self.assertEqual(rows[1]['rounds'], 4)
+        self.assertAlmostEqual(rows[1]['ev'], 0.5)
+        self.assertAlmostEqual(rows[1]['variance'], 1.0)
+        self.assertAlmostEqual(rows[1]['frequency'], 0.8)
+
+class TestDecisionRollout(unittest.TestCase):
+
+    def test_strategy_action_replays_the_round(self):
+        rules = CasinoRules(decks=2, seed=6, surrender_option='late', dealer_hits_soft_17=True)
+        simulation = BlackjackSimulation(rules)
+        rollout = DecisionRollout(rules)
+        compared = 0
+        for _ in range(5000):
+            rules.start_round()
+            shoe = rules.shoe
+            start = shoe.cursor
+            index = rules.shoe_index
+            net = None
+            if start + 4 <= shoe.size:
+                first_card, upcard, second_card, hole_card = shoe.cards[start:start + 4]
+                state = NEXT_STATE[NEXT_STATE[first_card] * CARD_SLOTS + second_card]
+                dealer_state = NEXT_STATE[NEXT_STATE[upcard] * CARD_SLOTS + hole_card]
+                if TOTAL[state] != 21 and TOTAL[dealer_state] != 21:
+                    net = rollout.play(shoe.cards, start + 4, shoe.size, state, upcard, dealer_state,
+                                       rollout.first_action(state, upcard))
+            self.assertEqual(shoe.cursor, start)  # The rollout leaves the shoe alone
+            result = simulation.play_round()
+            if net is not None and rules.shoe_index == index and result.hands <= 2:  # No resplits
+                self.assertEqual(net, result.net)
+                compared += 1
+        self.assertGreater(compared, 3000)
+
+class TestCollection(unittest.TestCase):
+
+    def test_rollouts_do_not_change_play_and_memory_is_fixed(self):
+        plain, _ = collect_count_stats(CasinoRules(decks=2), 30, seed=4, decisions=False)
+        rounds, decisions = collect_count_stats(CasinoRules(decks=2), 30, seed=4)
+        self.assertEqual((plain.counts, plain.sums), (rounds.counts, rounds.sums))
+        sizes = [len(decisions.counts), len(decisions.decisions)]
+        more_rounds, more_decisions = collect_count_stats(CasinoRules(decks=2), 60, seed=4)
+        self.assertEqual(sizes, [len(more_decisions.counts), len(more_decisions.decisions)])
+        self.assertGreater(sum(more_decisions.decisions), sum(decisions.decisions))
+        self.assertLess(sum(decisions.decisions), rounds.rounds)  # Naturals have no decision
+
+    def test_leaves_the_callers_rules_alone(self):
+        rules = CasinoRules(decks=2, seed=9)
+        cards = bytes(rules.shoe.cards)
+        first, _ = collect_count_stats(rules, 5, seed=4, decisions=False)
+        self.assertEqual((rules.seed, rules.shoe_index, rules.cards_dealt, bytes(rules.shoe.cards)), (9, 0, 0, cards))
+        again, _ = collect_count_stats(CasinoRules(decks=2), 5, seed=4, decisions=False)
+        self.assertEqual((first.counts, first.sums), (again.counts, again.sums))
+
+class TestIndexPlays(unittest.TestCase):
+
+    def test_finds_crossing_of_the_gain(self):
+        bins = DecisionBins(-5, 5)
+        state = hand_state([10, 5])
+        for tc in range(-5, 6):
+            for i in range(400):
+                gain = 0.1 * (tc + 0.5 - 2) + (0.5 if i % 2 else -0.5)
+                bins.add(state, 10, tc + 0.5, HIT, [(HIT, -0.5), (STAND, -0.5 + gain)])
+        plays = find_index_plays(bins, min_samples=100)
+        self.assertEqual(len(plays), 1)
+        play = plays[0]
+        self.assertEqual((play['hand'], play['upcard'], play['basic'], play['deviation']),
+                         ('hard 15', 10, 'hit', 'stand'))
+        self.assertEqual(play['direction'], 'at or above')
+        self.assertAlmostEqual(play['crossing'], 2.0)
+        self.assertEqual(play['index'], 2)
+
+    def test_flat_gain_is_not_an_index(self):
+        bins = DecisionBins(-5, 5)
+        state = hand_state([10, 6])
+        for tc in range(-5, 6):
+            for i in range(400):
+                bins.add(state, 10, tc + 0.5, HIT, [(HIT, -0.5), (STAND, -0.5 + (1.0 if i % 2 else -1.0))])
+        self.assertEqual(find_index_plays(bins, min_samples=100), [])
+
+class TestBetRamp(unittest.TestCase):
+
+    def _bins(self):
+        bins = TrueCountBins(-4, 6)
+        for tc in range(-4, 7):
+            ev = 0.005 * (tc - 1)
+            for _ in range(1000 if tc < 3 else 300):
+                bins.add(tc + 0.5, ev + 1.0)
+                bins.add(tc + 0.5, ev - 1.0)
+        return bins
+
+    def test_ramp_is_monotone_within_the_spread(self):
+        ramp = optimal_bet_ramp(self._bins(), spread=8, min_bet=2)
+        bets = ramp.bets
+        self.assertEqual(bets, sorted(bets))
+        self.assertEqual(bets[0], 2)
+        self.assertEqual(ramp(1.7), 2)  # No edge at TC 1
+        self.assertEqual(ramp(40), 16)
+        self.assertGreater(ramp.win, 0)
+
+    def test_ramp_beats_other_ramps_with_the_same_spread(self):
+        bins = self._bins()
+        rows = bins.rows()
+        best = optimal_bet_ramp(bins, spread=8)
+        for bets in ([1] * 11, [1] * 6 + [8] * 5, [1] * 5 + [2, 4, 6, 8, 8, 8]):
+            self.assertGreaterEqual(best.score, BetRamp(-4, bets, rows).score)
+
+    def test_spread_below_one(self):
+        with self.assertRaises(ValueError):
+            optimal_bet_ramp(self._bins(), spread=0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# tests/test_exact.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.exact import DEALER_CACHE_SIZE, ExactCalculator, dealer_distribution, full_composition, remove_card
+
+try:
+    from src.vectorized import VectorizedSimulation
+except ImportError:  # NumPy is optional; only the vectorized engine needs it
+    VectorizedSimulation = None
+
+class TestExactCalculator(unittest.TestCase):
+
+    def test_dealer_distribution_sums_to_one(self):
+        """Every dealer distribution should be a probability distribution."""
+        comp = full_composition(2)
+        for upcard in range(2, 12):
+            distribution = dealer_distribution(remove_card(comp, upcard), upcard, False)
+            self.assertAlmostEqual(sum(distribution), 1.0)
+
+    def test_soft_17_rule_moves_dealer_off_17(self):
+        """Hitting soft 17 should lower the dealer's chance of finishing on 17 with an Ace up."""
+        comp = remove_card(full_composition(6), 11)
+        stands = dealer_distribution(comp, 11, False)
+        hits = dealer_distribution(comp, 11, True)
+        self.assertLess(hits[0], stands[0])
+        self.assertGreater(hits[5], stands[5])
+
+    def test_house_edge_is_plausible_and_rule_sensitive(self):
+        """Basic strategy should be close to even, and worse under H17 and 6:5 payouts."""
+        base = ExactCalculator(CasinoRules(decks=1, max_splits=2)).expected_value()
+        h17 = ExactCalculator(CasinoRules(decks=1, max_splits=2, dealer_hits_soft_17=True)).expected_value()
+        six_to_five = ExactCalculator(CasinoRules(decks=1, max_splits=2, blackjack_payout=1.2)).expected_value()
+        self.assertLess(abs(base), 0.01)
+        self.assertLess(h17, base)
+        self.assertLess(six_to_five, base - 0.01)
+
+    def test_dealer_cache_is_bounded(self):
+        self.assertEqual(dealer_distribution.cache_info().maxsize, DEALER_CACHE_SIZE)
+
+    @unittest.skipIf(VectorizedSimulation is None, "NumPy is not installed")
+    def test_agrees_with_a_seeded_simulation(self):
+        """A seeded single-deck run should land within 3 standard errors of the exact EV."""
+        exact = ExactCalculator(CasinoRules(decks=1, max_splits=2)).expected_value()
+        simulation = VectorizedSimulation(CasinoRules(decks=1, max_splits=2), n_shoes=4096, seed=1)
+        total = squares = hands = 0
+        for _ in range(300):
+            net, _ = simulation.play_round()
+            total += net.sum()
+            squares += (net * net).sum()
+            hands += net.size
+        mean = total / hands
+        standard_error = ((squares / hands - mean * mean) / hands) ** 0.5
+        self.assertLess(abs(mean - exact), 3 * standard_error)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# tests/test_hand_state.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.hand_state import (ACTION_NAMES, BUSTED, CARD_SLOTS, DEALER_DONE_H17, DEALER_DONE_S17, DOUBLE, HIT,
+                            NEXT_STATE, PAIR, SOFT, SPLIT, STAND, SURRENDER, TOTAL, compile_strategy, hand_state,
+                            resolve_action)
+
+class TestHandState(unittest.TestCase):
+
+    def test_transitions_match_hand_state(self):
+        """Drawing cards one at a time through NEXT_STATE should reach the same state as hand_state."""
+        for cards in ([11, 6], [11, 6, 10], [8, 8], [8, 8, 2], [10, 6, 10], [2, 3, 4, 5], [11, 11, 11]):
+            state = 0
+            for card in cards:
+                state = NEXT_STATE[state * CARD_SLOTS + card]
+            self.assertEqual(state, hand_state(cards), f"Failed for {cards}")
+
+    def test_state_properties(self):
+        """Totals, softness, pairs and busts should follow the usual hand arithmetic."""
+        self.assertEqual((TOTAL[hand_state([11, 6])], SOFT[hand_state([11, 6])]), (17, True))
+        self.assertEqual((TOTAL[hand_state([11, 6, 10])], SOFT[hand_state([11, 6, 10])]), (17, False))
+        self.assertEqual(PAIR[hand_state([8, 8])], 8)
+        self.assertEqual(PAIR[hand_state([8, 8, 2])], 0)
+        self.assertTrue(BUSTED[hand_state([10, 6, 10])])
+
+    def test_dealer_soft_17(self):
+        """Only a dealer hitting soft 17 keeps drawing on A-6."""
+        soft_17 = hand_state([11, 6])
+        hard_17 = hand_state([11, 6, 10])
+        self.assertTrue(DEALER_DONE_S17[soft_17])
+        self.assertFalse(DEALER_DONE_H17[soft_17])
+        self.assertTrue(DEALER_DONE_H17[hard_17])
+
+    def test_compiled_table_matches_strategy_dict(self):
+        """Every entry of the pairs table should be reproduced by the compiled table."""
+        table, _ = compile_strategy(basic_strategy)
+        for pair_card, row in basic_strategy['pairs'].items():
+            for upcard, action in row.items():
+                state = hand_state([pair_card, pair_card])
+                self.assertEqual(ACTION_NAMES[table[state * CARD_SLOTS + upcard]], action)
+
+    def test_twenty_one_stands(self):
+        """A total of 21 stands even though the strategy dict has no row for it."""
+        table, _ = compile_strategy(basic_strategy)
+        for cards in ([11, 5, 5], [10, 5, 6]):
+            self.assertEqual(ACTION_NAMES[table[hand_state(cards) * CARD_SLOTS + 10]], 'stand')
+
+    def test_soft_double_falls_back_to_stand(self):
+        """A soft 18 or 19 that may no longer double stands; lower soft doubles hit."""
+        table, fallbacks = compile_strategy(basic_strategy)
+        for cards, upcard, fallback in (([11, 2, 6], 6, STAND), ([11, 3, 4], 3, STAND), ([11, 2, 4], 5, HIT)):
+            index = hand_state(cards) * CARD_SLOTS + upcard
+            self.assertEqual((table[index], fallbacks[index]), (DOUBLE, fallback), f"Failed for {cards}")
+
+    def test_resolve_action_applies_the_rules(self):
+        rules = CasinoRules(decks=1, max_splits=3, double_after_split=False, surrender_option='late')
+        aces, eights, hard_11, hard_16 = (hand_state(cards) for cards in ([11, 11], [8, 8], [6, 5], [10, 6]))
+        self.assertEqual(resolve_action(SPLIT, HIT, eights, rules, 2), SPLIT)
+        self.assertEqual(resolve_action(SPLIT, HIT, eights, rules, 3), HIT)  # max_splits reached
+        self.assertEqual(resolve_action(SPLIT, HIT, eights, rules, 2, resplits=False), HIT)
+        self.assertEqual(resolve_action(SPLIT, HIT, aces, rules, 2, split_aces=True), STAND)  # No resplit aces
+        self.assertEqual(resolve_action(HIT, HIT, hand_state([11, 5]), rules, 2, split_aces=True), STAND)
+        self.assertEqual(resolve_action(DOUBLE, HIT, hard_11, rules), DOUBLE)
+        self.assertEqual(resolve_action(DOUBLE, HIT, hard_11, rules, 2), HIT)  # No double after split
+        self.assertEqual(resolve_action(SURRENDER, HIT, hard_16, rules), SURRENDER)
+        self.assertEqual(resolve_action(SURRENDER, HIT, hard_16, rules, 2), HIT)
+        self.assertEqual(resolve_action(SURRENDER, STAND, hard_16, CasinoRules(decks=1)), STAND)
+
+if __name__ == "__main__":
+    unittest.main()
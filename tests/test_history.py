@@ -0,0 +1,106 @@
+# tests/test_history.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import unittest
+from src.betting_strategy import calculate_bet
+from src.casino_rules import CasinoRules
+from src.simulation import OUTCOMES, BlackjackSimulation
+
+try:
+    import numpy as np
+    from src.history import HistoryRecorder, ev_by_situation, history_header, read_history
+    from src.vectorized import VectorizedSimulation
+except ImportError:  # NumPy is optional; only the array-based modules need it
+    np = None
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestHandHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_scalar_rounds_round_trip(self):
+        """Every round is recorded, across chunk boundaries, with the outcome and net of the run."""
+        simulation = BlackjackSimulation(CasinoRules(decks=6, seed=2))
+        with HistoryRecorder(self.path('scalar.bjh'), 2, chunk_size=64) as recorder:
+            simulation.recorder = recorder
+            outcomes = []
+            nets = []
+            for _ in range(500):
+                outcomes.append(simulation.simulate_hand())
+                nets.append(simulation.last_net)
+        records = read_history(self.path('scalar.bjh'))
+        self.assertIsInstance(records, np.memmap)
+        self.assertEqual(len(records), 500)
+        self.assertEqual([OUTCOMES[code] for code in records['outcome']], outcomes)
+        np.testing.assert_array_equal(records['net'], nets)
+        self.assertTrue(np.shares_memory(records['net'], records))  # Columns are views of the mapping
+        self.assertTrue(((records['hands'] >= 1) & (records['upcard'] >= 2)).all())
+
+    def test_vectorized_records_match_scalar_records(self):
+        """Both engines record the same round identically when dealt the same shoe."""
+        for seed in range(3):
+            rules = CasinoRules(decks=2, seed=seed, surrender_option='late')
+            with HistoryRecorder(self.path('s.bjh'), seed) as scalar_recorder, \
+                    HistoryRecorder(self.path('v.bjh'), 0, engine='vectorized') as vectorized_recorder:
+                scalar = BlackjackSimulation(rules, recorder=scalar_recorder, bet_function=calculate_bet)
+                vectorized = VectorizedSimulation(rules, n_shoes=1, recorder=vectorized_recorder)
+                vectorized.set_shoe(0, rules.shoe.cards)
+                while rules.cards_dealt < rules.cut_card:
+                    bets = np.array([calculate_bet(vectorized.true_counts()[0])])
+                    scalar.simulate_hand()
+                    vectorized.play_round(bets=bets)
+            scalar_records = read_history(self.path('s.bjh'))
+            vectorized_records = read_history(self.path('v.bjh'))
+            for column in scalar_records.dtype.names:
+                np.testing.assert_array_equal(scalar_records[column], vectorized_records[column], column)
+
+    def test_ev_by_situation_covers_every_round(self):
+        with HistoryRecorder(self.path('vectorized.bjh'), 0, engine='vectorized') as recorder:
+            VectorizedSimulation(CasinoRules(decks=6), n_shoes=256, recorder=recorder).run(20)
+        records = read_history(self.path('vectorized.bjh'))
+        table = ev_by_situation(records, chunk_size=1000)
+        self.assertEqual(sum(rounds for rounds, _ in table.values()), 256 * 20)
+        self.assertEqual(table[21, True, 5][1], 1.5)  # A natural against a 5 always pays 3:2
+
+    def test_vectorized_rounds_replay_on_the_scalar_engine(self):
+        """The header's seed and each record's (stream, shoe) rebuild the rounds a vectorized run played."""
+        rules = CasinoRules(decks=1, penetration=0.7)
+        lanes = 4
+        with HistoryRecorder(self.path('run.bjh'), 21, engine='vectorized') as recorder:
+            VectorizedSimulation(rules, n_shoes=lanes, seed=21, recorder=recorder, first_stream=3).run(40)
+        header = history_header(self.path('run.bjh'))
+        self.assertEqual((header['seed'], header['engine'], header['records']), (21, 'vectorized', lanes * 40))
+        records = read_history(self.path('run.bjh')).reshape(40, lanes)
+        for lane in range(lanes):
+            lane_records = records[:, lane]
+            replay_rules = CasinoRules(decks=1, penetration=0.7, seed=header['seed'],
+                                       stream=int(lane_records['stream'][0]))
+            replay = BlackjackSimulation(replay_rules)
+            for record in lane_records:
+                replay.play_round()
+                self.assertEqual(replay_rules.shoe_index, record['shoe'])
+                self.assertEqual(replay.round.net, record['net'])
+            self.assertGreater(replay_rules.shoe_index, 2)  # The lane went through several shoes
+
+    def test_needs_a_replayable_seed(self):
+        with self.assertRaises(ValueError):
+            HistoryRecorder(self.path('bad.bjh'), 'seed')
+        with self.assertRaises(ValueError):
+            HistoryRecorder(self.path('bad.bjh'), 1, engine='gpu')
+
+    def test_rejects_other_files(self):
+        with open(self.path('other.bin'), 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            read_history(self.path('other.bin'))
+
+if __name__ == "__main__":
+    unittest.main()
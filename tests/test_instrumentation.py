@@ -0,0 +1,52 @@
+# tests/test_instrumentation.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.instrumentation import Instrumentation
+from src.simulation import BlackjackSimulation
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        casino_rules = CasinoRules(decks=2, seed=1)
+        blackjack_sim = BlackjackSimulation(casino_rules)
+        self.assertIsNone(blackjack_sim.instrumentation)
+        self.assertIsNone(casino_rules.instrumentation)
+
+    def test_counters_match_the_results(self):
+        instrumentation = Instrumentation()
+        casino_rules = CasinoRules(decks=2, seed=1, penetration=0.5)
+        result = BlackjackSimulation(casino_rules, instrumentation=instrumentation).run(3000)
+        counters = instrumentation.counters
+        self.assertEqual(counters['rounds'], 3000)
+        naturals = sum(result.outcomes.get(outcome, 0) for outcome in
+                       ("Player wins with blackjack!", "Dealer wins with blackjack!", "Push - Tie game."))
+        self.assertGreaterEqual(naturals, counters['naturals'])  # Pushes also include tied hands
+        self.assertEqual(counters['player_hands'], 3000 + counters.get('splits', 0))
+        self.assertEqual(counters['reshuffle_cut'], casino_rules.shoe_index)
+        self.assertEqual(instrumentation.calls['round'], 3000)
+        self.assertEqual(instrumentation.calls['start_round'], 3000)
+        self.assertEqual(instrumentation.calls['initial_deal'], 3000)
+        self.assertEqual(instrumentation.calls['player'], 3000 - counters['naturals'])
+
+    def test_instrumentation_does_not_change_play(self):
+        plain = BlackjackSimulation(CasinoRules(decks=2, seed=4)).run(2000)
+        timed = BlackjackSimulation(CasinoRules(decks=2, seed=4), instrumentation=Instrumentation()).run(2000)
+        self.assertEqual(plain.outcomes, timed.outcomes)
+        self.assertEqual(plain.total, timed.total)
+
+    def test_summary_shares(self):
+        instrumentation = Instrumentation()
+        BlackjackSimulation(CasinoRules(decks=6, seed=2), instrumentation=instrumentation).run(500)
+        rows = {row['phase']: row for row in instrumentation.summary()}
+        self.assertAlmostEqual(rows['round']['share'], 1.0)
+        top_level = sum(rows[phase]['seconds'] for phase in ('start_round', 'initial_deal', 'player', 'dealer', 'settle')
+                        if phase in rows)
+        self.assertLessEqual(top_level, rows['round']['seconds'])
+        self.assertIn('hands/round', instrumentation.format_table())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+# tests/test_parallel.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.parallel import run_parallel, split_blocks
+from src.simulation import SimulationResult
+
+class TestParallelSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.casino_rules = CasinoRules(decks=6, penetration=0.75)
+
+    def test_split_blocks_covers_all_hands(self):
+        """Blocks should cover every hand exactly once."""
+        blocks = split_blocks(25, block_size=10)
+        self.assertEqual(blocks, [(0, 10), (1, 10), (2, 5)])
+
+    def test_same_seed_same_result_for_any_worker_count(self):
+        """The worker count must not change the merged result."""
+        serial = run_parallel(self.casino_rules, 3000, seed=7, workers=1, block_size=1000)
+        pooled = run_parallel(self.casino_rules, 3000, seed=7, workers=2, block_size=1000)
+        self.assertEqual(serial, pooled)
+        self.assertEqual(serial.hands, 3000)
+
+    def test_different_seeds_differ(self):
+        """Different seeds should drive different shoes."""
+        first = run_parallel(self.casino_rules, 2000, seed=1, workers=1)
+        second = run_parallel(self.casino_rules, 2000, seed=2, workers=1)
+        self.assertNotEqual(first, second)
+
+    def test_merge_adds_counts_and_sums(self):
+        """Merging two results should add their counts and sums."""
+        first = SimulationResult()
+        first.add("Player wins!", 1.0)
+        second = SimulationResult()
+        second.add("Dealer wins!", -2.0)
+        first.merge(second)
+        self.assertEqual(first.hands, 2)
+        self.assertEqual(first.total, -1.0)
+        self.assertEqual(first.total_sq, 5.0)
+        self.assertEqual(first.outcomes, {"Player wins!": 1, "Dealer wins!": 1})
+
+if __name__ == "__main__":
+    unittest.main()
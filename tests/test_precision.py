@@ -0,0 +1,82 @@
+# tests/test_precision.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.control_variates import CardControl
+from src.precision import RatioEstimate, run_to_precision
+from src.simulation import BlackjackSimulation
+from src.sweep import _ratio_terms, _std_error
+
+class TestCardControl(unittest.TestCase):
+
+    def test_control_does_not_change_play(self):
+        plain = BlackjackSimulation(CasinoRules(decks=2, seed=3)).run(3000)
+        rules = CasinoRules(decks=2, seed=3)
+        controlled = BlackjackSimulation(rules, control=CardControl(rules)).run(3000)
+        self.assertEqual(plain, controlled)
+
+    def test_control_has_zero_mean_and_tracks_the_net(self):
+        rules = CasinoRules(decks=6, seed=8, surrender_option='late', dealer_hits_soft_17=True)
+        control = CardControl(rules)
+        simulation = BlackjackSimulation(rules, control=control)
+        n = 20000
+        values = []
+        residuals = []
+        for _ in range(n):
+            net = simulation.play_round().net
+            values.append(control.value)
+            residuals.append(net - control.value)
+        mean = sum(values) / n
+        sd = (sum((v - mean) ** 2 for v in values) / (n - 1)) ** 0.5
+        self.assertLess(abs(mean), 4 * sd / n ** 0.5)
+        residual_mean = sum(residuals) / n
+        residual_variance = sum((r - residual_mean) ** 2 for r in residuals) / (n - 1)
+        self.assertLess(residual_variance, 0.05 * sd * sd)  # The control explains most of each round
+
+    def test_unknown_level(self):
+        with self.assertRaises(ValueError):
+            CardControl(CasinoRules(decks=1, seed=0), level='perfect')
+
+class TestRunToPrecision(unittest.TestCase):
+
+    def test_ratio_estimate_matches_sweep_formula(self):
+        totals = [3.0, -5.5, 1.0, 0.0, 7.5, -2.0]
+        rounds = [40, 38, 41, 39, 42, 37]
+        estimate = RatioEstimate()
+        for total, n in zip(totals, rounds):
+            estimate.add(total, n)
+        mean, terms = _ratio_terms(totals, rounds)
+        self.assertAlmostEqual(estimate.mean, mean)
+        self.assertAlmostEqual(estimate.std_error, _std_error(terms))
+
+    def test_stops_at_the_target(self):
+        batches = []
+        result = run_to_precision(CasinoRules(decks=6), 0.002, batch_shoes=50, min_shoes=50, seed=1,
+                                  progress=batches.append)
+        self.assertTrue(result.converged)
+        self.assertLessEqual(result.std_error, 0.002)
+        self.assertFalse(any(batch.converged for batch in batches[:-1]))
+        self.assertGreater(result.variance_reduction, 20)
+        self.assertLess(abs(result.mean - result.raw_mean), 4 * result.raw_std_error)
+
+    def test_hand_limit(self):
+        result = run_to_precision(CasinoRules(decks=6), 1e-6, control=None, batch_shoes=5, min_shoes=5,
+                                  max_hands=500, seed=1)
+        self.assertFalse(result.converged)
+        self.assertGreaterEqual(result.hands, 500)
+        self.assertAlmostEqual(result.mean, result.raw_mean)
+
+    def test_leaves_the_callers_rules_alone(self):
+        rules = CasinoRules(decks=6, seed=9, stream=2)
+        cards = bytes(rules.shoe.cards)
+        first = run_to_precision(rules, 1e-6, control=None, batch_shoes=5, min_shoes=5, max_hands=200, seed=1)
+        self.assertEqual((rules.seed, rules.stream, rules.shoe_index, bytes(rules.shoe.cards)), (9, 2, 0, cards))
+        again = run_to_precision(CasinoRules(decks=6, stream=2), 1e-6, control=None, batch_shoes=5, min_shoes=5,
+                                 max_hands=200, seed=1)
+        self.assertEqual((first.hands, first.mean), (again.hands, again.mean))
+
+if __name__ == "__main__":
+    unittest.main()
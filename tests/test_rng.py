@@ -0,0 +1,73 @@
+# tests/test_rng.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.casino_rules import CasinoRules
+from src.rng import shoe_key
+from src.simulation import BlackjackSimulation
+
+try:
+    import numpy as np
+    from src.vectorized import VectorizedSimulation
+except ImportError:  # NumPy is optional; only the vectorized engine needs it
+    np = None
+
+class TestKeyedShoes(unittest.TestCase):
+
+    def test_keys_depend_on_seed_stream_and_index(self):
+        keys = {shoe_key(seed, stream, index) for seed in (0, 1) for stream in (0, 1) for index in (0, 1)}
+        self.assertEqual(len(keys), 8)
+        self.assertEqual(shoe_key(7, 3, 5), shoe_key(7, 3, 5))
+
+    def test_any_shoe_is_loaded_directly(self):
+        """Loading shoe k gives the same cards as shuffling k times."""
+        sequential = CasinoRules(decks=2, seed=11, stream=4)
+        for _ in range(5):
+            sequential.initialize_shoe()
+        direct = CasinoRules(decks=2, seed=11, stream=4)
+        direct.load_shoe(5)
+        self.assertEqual(direct.shoe.cards, sequential.shoe.cards)
+        self.assertNotEqual(CasinoRules(decks=2, seed=11, stream=5).shoe.cards,
+                            CasinoRules(decks=2, seed=11, stream=4).shoe.cards)
+
+    def test_replayed_shoe_matches_the_run(self):
+        """A shoe replayed on its own plays exactly as it did within the run."""
+        simulation = BlackjackSimulation(CasinoRules(decks=6, seed=3))
+        played = [simulation.play_shoe() for _ in range(4)]
+        replay = BlackjackSimulation(CasinoRules(decks=6, seed=3)).play_shoe(2)
+        self.assertEqual(replay, played[2])
+        self.assertGreater(replay.hands, 0)
+
+    def test_unseeded_tables_keep_their_seed(self):
+        rules = CasinoRules(decks=2)
+        self.assertEqual(CasinoRules(decks=2, seed=rules.seed).shoe.cards, rules.shoe.cards)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_vectorized_lanes_are_keyed_streams(self):
+        """A lane's shoes depend only on its stream and shoe number."""
+        rules = CasinoRules(decks=2)
+        whole = VectorizedSimulation(rules, n_shoes=4, seed=9)
+        part = VectorizedSimulation(rules, n_shoes=2, seed=9, first_stream=2)
+        np.testing.assert_array_equal(part.shoes, whole.shoes[2:])
+        for _ in range(3):
+            whole.reshuffle(np.array([1]))
+        part.load_shoe(0, 3)
+        other = VectorizedSimulation(rules, n_shoes=2, seed=9)
+        other.load_shoe(1, 3)
+        np.testing.assert_array_equal(other.shoes[1], whole.shoes[1])
+        self.assertEqual(sorted(other.shoes[1].tolist()), sorted(rules.shoe.cards))
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_both_engines_deal_the_same_shoes(self):
+        """(seed, stream, index) gives the same cards on the vectorized and the scalar engine."""
+        vectorized = VectorizedSimulation(CasinoRules(decks=8), n_shoes=3, seed=9)
+        vectorized.load_shoe(2, 5)
+        for lane, index in ((0, 0), (1, 0), (2, 5)):
+            rules = CasinoRules(decks=8, seed=9, stream=lane)
+            rules.load_shoe(index)
+            self.assertEqual(bytes(vectorized.shoes[lane].astype(np.uint8)), bytes(rules.shoe.cards))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# tests/test_service.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import tempfile
+import unittest
+from src.casino_rules import CasinoRules
+from src.parallel import run_parallel
+from src.service import SimulationService, job_key, normalize_job, run_job_block, submit
+from src.simulation import SimulationResult
+
+JOB = {'rules': {'decks': 2, 'penetration': 0.6}, 'hands': 1200, 'seed': 5, 'block_size': 300}
+
+class TestSimulationService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = SimulationService(cache_dir=self.tmp.name, workers=1)
+
+    def tearDown(self):
+        self.service.close()
+        self.tmp.cleanup()
+
+    def test_normalize_job_fills_defaults_and_rejects_unknown_fields(self):
+        job = normalize_job(JOB)
+        self.assertEqual(job['rules'], CasinoRules(decks=2, penetration=0.6).as_dict())
+        self.assertEqual((job['strategy'], job['bet_ramp']), ('basic', 'flat'))
+        self.assertEqual(job_key(job), job_key(normalize_job(dict(JOB, strategy='basic'))))
+        with self.assertRaises(ValueError):
+            normalize_job(dict(JOB, hand=10))
+        with self.assertRaises(ValueError):
+            normalize_job(dict(JOB, rules={'deck': 2}))
+
+    def test_matches_run_parallel_and_serves_repeats_from_cache(self):
+        events = []
+        summary = asyncio.run(self.service.run_job(JOB, progress=events.append))
+        expected = run_parallel(CasinoRules(decks=2, penetration=0.6), 1200, seed=5, workers=1, block_size=300)
+        self.assertFalse(summary['cached'])
+        self.assertEqual(SimulationResult.from_dict(summary['result']), expected)
+        self.assertAlmostEqual(summary['money_ev'], 10 * summary['ev'])  # Flat bets of 10
+        self.assertEqual([event['blocks_done'] for event in events], [0, 1, 2, 3, 4])
+
+        again = asyncio.run(self.service.run_job(JOB))
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['result'], summary['result'])
+
+    def test_resumes_from_checkpoint(self):
+        job = normalize_job(JOB)
+        key = job_key(job)
+        for block in (0, 2):
+            self.service.save_checkpoint(key, run_job_block(job, block, 300))
+        events = []
+        summary = asyncio.run(self.service.run_job(JOB, progress=events.append))
+        self.assertEqual(events[0]['resumed'], 2)
+        self.assertEqual(len(events), 3)  # The resumed state, then the two missing blocks
+        expected = run_parallel(CasinoRules(decks=2, penetration=0.6), 1200, seed=5, workers=1, block_size=300)
+        self.assertEqual(SimulationResult.from_dict(summary['result']), expected)
+        self.assertEqual(self.service.load_checkpoint(key), {})
+
+    def test_resumes_after_a_partial_line(self):
+        job = normalize_job(JOB)
+        key = job_key(job)
+        path = os.path.join(self.tmp.name, f"{key}.checkpoint.jsonl")
+        self.service.save_checkpoint(key, run_job_block(job, 0, 300))
+        with open(path, 'a') as f:
+            f.write("not json\n")
+        self.service.save_checkpoint(key, run_job_block(job, 1, 300))
+        with open(path, 'a') as f:
+            f.write('{"block": 2, "hands"')  # Interrupted mid-write
+        self.assertEqual(sorted(self.service.load_checkpoint(key)), [0, 1])
+        self.service.save_checkpoint(key, run_job_block(job, 3, 300))
+        self.assertEqual(sorted(self.service.load_checkpoint(key)), [0, 1, 3])
+
+        events = []
+        summary = asyncio.run(self.service.run_job(JOB, progress=events.append))
+        self.assertEqual(events[0]['resumed'], 3)
+        expected = run_parallel(CasinoRules(decks=2, penetration=0.6), 1200, seed=5, workers=1, block_size=300)
+        self.assertEqual(SimulationResult.from_dict(summary['result']), expected)
+
+    def test_unix_socket_round_trip(self):
+        path = os.path.join(self.tmp.name, 'service.sock')
+
+        async def scenario():
+            server = asyncio.ensure_future(self.service.serve(path=path))
+            while not os.path.exists(path):
+                await asyncio.sleep(0.01)
+            events = []
+            try:
+                summary = await submit(dict(JOB, bet_ramp='hi_lo_ramp'), path=path, progress=events.append)
+                with self.assertRaises(RuntimeError):
+                    await submit(dict(JOB, strategy='perfect'), path=path)
+            finally:
+                server.cancel()
+            return summary, events
+
+        summary, events = asyncio.run(scenario())
+        self.assertEqual(summary['hands'], 1200)
+        self.assertGreater(summary['avg_bet'], 10)
+        self.assertEqual(events[-1]['hands_done'], 1200)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# tests/test_shoe.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import unittest
+from src.rng import keyed_order, shoe_key
+from src.shoe import Shoe, RANKS
+from src.casino_rules import CasinoRules
+
+class TestShoe(unittest.TestCase):
+
+    def setUp(self):
+        self.shoe = Shoe(6, random.Random(3))
+        self.shoe.shuffle()
+
+    def test_full_composition(self):
+        """A fresh shoe holds 24 of each rank and 96 ten-value cards for six decks."""
+        self.assertEqual(self.shoe.composition(), (24,) * 8 + (96, 24))
+        self.assertEqual(self.shoe.decks_remaining, 6)
+
+    def test_deal_updates_counts_in_place(self):
+        """Dealing advances the cursor and decrements the dealt rank."""
+        buffer = self.shoe.cards
+        dealt = [self.shoe.deal() for _ in range(52)]
+        self.assertEqual(self.shoe.decks_remaining, 5)
+        self.assertAlmostEqual(self.shoe.penetration, 1 / 6)
+        for rank, remaining, full in zip(RANKS, self.shoe.composition(), self.shoe.full_counts):
+            self.assertEqual(full - remaining, dealt.count(rank))
+        self.shoe.shuffle()
+        self.assertIs(self.shoe.cards, buffer)
+        self.assertEqual(self.shoe.cursor, 0)
+
+    def test_keyed_arrangement_reuses_the_buffers(self):
+        """A keyed shoe is laid out in its keyed order without replacing the card, index or key buffers."""
+        buffers = (self.shoe.cards, self.shoe.order, self.shoe.sort_keys)
+        for index in range(3):
+            key = shoe_key(7, 0, index)
+            self.shoe.arrange_key(key)
+            self.assertEqual(bytes(self.shoe.cards), bytes(self.shoe.deck[i] for i in keyed_order(key, self.shoe.size)))
+            for buffer, kept in zip((self.shoe.cards, self.shoe.order, self.shoe.sort_keys), buffers):
+                self.assertIs(buffer, kept)
+
+    def test_rules_reshuffle_at_configured_penetration(self):
+        """The shoe should be dealt to the configured penetration before a new round reshuffles it."""
+        rules = CasinoRules(decks=6, penetration=0.75, seed=1)
+        while rules.cards_dealt < rules.cut_card:
+            rules.deal_card()
+        self.assertEqual(rules.cards_dealt, int(6 * 52 * 0.75))
+        rules.start_round()
+        self.assertEqual(rules.cards_dealt, 0)
+        self.assertEqual(rules.running_count, 0)
+
+if __name__ == "__main__":
+    unittest.main()
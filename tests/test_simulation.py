@@ -5,9 +5,10 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import unittest
 from unittest.mock import patch
-from src.simulation import BlackjackSimulation
+from src.simulation import CATEGORIES, OUTCOMES, BlackjackSimulation
 from src.casino_rules import CasinoRules
 from src.basic_strategy import basic_strategy
+from src.events import CollectingEventSink
 
 class TestBlackjackSimulation(unittest.TestCase):
 
@@ -89,5 +90,56 @@ class TestBlackjackSimulation(unittest.TestCase):
 
         self.assertEqual(action_1, expected_action_1, f"Expected action after split should be '{expected_action_1}', got '{action_1}'.")
 
+    def test_double_falls_back_after_a_hit(self):
+        """A soft 18 reached by hitting may not double and stands, as the 'double, else stand' entry says."""
+        self.assertEqual(self.blackjack_sim.get_action([2, 3, 11, 2], 3), 'stand')
+        self.assertEqual(self.blackjack_sim.get_action([2, 11, 6], 6), 'stand')
+        self.assertEqual(self.blackjack_sim.get_action([2, 11, 3], 5), 'hit')
+        self.assertEqual(self.blackjack_sim.get_action([11, 7], 3), 'double')
+
+        # Player 2, 3 against a 3 (hole card 10) hits to 2, 3, A, 2 and stands; the dealer then busts
+        self.casino_rules.shoe.cards[:8] = bytes([2, 3, 3, 10, 11, 2, 10, 10])
+        result = self.blackjack_sim.play_round()
+        self.assertEqual(self.casino_rules.cards_dealt, 7)
+        self.assertEqual((result.net, result.doubled), (1.0, False))
+
+    def test_run_returns_aggregate_results(self):
+        """A silent batch run should return one outcome per hand played."""
+        result = self.blackjack_sim.run(2000)
+        self.assertEqual(result.hands, 2000)
+        self.assertEqual(sum(result.outcomes.values()), 2000)
+
+    def test_play_round_reuses_one_numeric_result(self):
+        """play_round fills the same RoundResult every round, consistent with simulate_hand."""
+        first = self.blackjack_sim.play_round()
+        kept = first.copy()
+        second = self.blackjack_sim.play_round()
+        self.assertIs(first, second)
+        self.assertIsNot(kept, first)
+        self.assertEqual(second.net, self.blackjack_sim.last_net)
+        self.assertIn(self.blackjack_sim.simulate_hand(), OUTCOMES)
+        self.assertEqual(self.blackjack_sim.round.message, OUTCOMES[self.blackjack_sim.round.outcome])
+
+    def test_run_counters_are_consistent(self):
+        """Category and upcard counters should add up to the rounds and net units played."""
+        result = self.blackjack_sim.run(5000)
+        counts = result.category_counts()
+        self.assertEqual(set(counts), set(CATEGORIES))
+        self.assertEqual(sum(sum(row) for row in counts.values()), 5000)
+        self.assertEqual(sum(result.rounds_by_upcard), 5000)
+        self.assertAlmostEqual(sum(result.net_by_upcard), result.total)
+        self.assertGreaterEqual(result.staked, 5000)
+        naturals = ("Player wins with blackjack!", "Dealer wins with blackjack!", "Push - Tie game.")
+        self.assertEqual(sum(counts['natural']), sum(result.outcomes.get(outcome, 0) for outcome in naturals))
+        self.assertEqual(counts['surrendered'], (0, 0, 0))  # These rules have no surrender
+
+    def test_event_sink_receives_trace(self):
+        """A collecting sink should see every card dealt during a traced hand."""
+        sink = CollectingEventSink()
+        sim = BlackjackSimulation(self.casino_rules, event_sink=sink)
+        sim.simulate_hand()
+        self.assertEqual(len(sink.of_type('hand_start')), 1)
+        self.assertGreaterEqual(len(sink.of_type('deal')), 4)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_strategy_generator.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import unittest
+from src.casino_rules import CasinoRules
+from src.strategy_generator import generate_strategy, rules_key
+
+class TestStrategyGenerator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.rules = CasinoRules(decks=2, dealer_hits_soft_17=True, surrender_option='late')
+        cls.strategy = generate_strategy(cls.rules, cache_dir=cls.cache_dir)
+
+    def test_covers_every_state_and_upcard(self):
+        """Hard 4-20, soft 12-20 and every pair should have an entry for every upcard."""
+        self.assertEqual(sorted(self.strategy['hard_totals']), list(range(4, 21)))
+        self.assertEqual(sorted(self.strategy['soft_totals']), list(range(12, 21)))
+        self.assertEqual(sorted(self.strategy['pairs']), list(range(2, 12)))
+        for rows in self.strategy.values():
+            for row in rows.values():
+                self.assertEqual(sorted(row), list(range(2, 12)))
+
+    def test_well_known_decisions(self):
+        """A few textbook plays should come out of the EV computation."""
+        self.assertEqual(self.strategy['hard_totals'][16][10], 'surrender')
+        self.assertEqual(self.strategy['hard_totals'][11][6], 'double')
+        self.assertEqual(self.strategy['hard_totals'][17][10], 'stand')
+        self.assertEqual(self.strategy['pairs'][8][6], 'split')
+        self.assertEqual(self.strategy['pairs'][10][6], 'stand')
+
+    def test_strategy_is_cached_by_rules(self):
+        """A second request for the same rules should load the cached file."""
+        path = os.path.join(self.cache_dir, f"{rules_key(self.rules)}.json")
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(generate_strategy(self.rules, cache_dir=self.cache_dir), self.strategy)
+        payout_only = CasinoRules(decks=2, dealer_hits_soft_17=True, surrender_option='late', blackjack_payout=1.2)
+        self.assertEqual(rules_key(payout_only), rules_key(self.rules))
+        self.assertNotEqual(rules_key(CasinoRules(decks=2, surrender_option='late')), rules_key(self.rules))
+
+    def test_key_covers_only_modelled_rules(self):
+        """Rules that generate the same tables should share a key."""
+        self.assertEqual(rules_key(CasinoRules(surrender_option='None')), rules_key(CasinoRules(surrender_option=None)))
+        self.assertEqual(rules_key(CasinoRules(surrender_option='late')), rules_key(CasinoRules(surrender_option='LATE')))
+        self.assertEqual(rules_key(CasinoRules(max_splits=4, resplit_aces=True)),
+                         rules_key(CasinoRules(max_splits=2, resplit_aces=False)))
+        self.assertNotEqual(rules_key(CasinoRules(max_splits=1)), rules_key(CasinoRules(max_splits=2)))
+
+if __name__ == "__main__":
+    unittest.main()
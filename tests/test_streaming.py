@@ -0,0 +1,45 @@
+# tests/test_streaming.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+
+try:
+    import numpy as np
+    from src.streaming import QuantileSketch, RunningStats
+except ImportError:  # NumPy is optional; only the array-based modules need it
+    np = None
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestStreamingStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.default_rng(0).normal(2.0, 5.0, 20000)
+
+    def test_running_stats_match_batch_statistics(self):
+        """Batches folded in one at a time, or merged, give the batch mean and variance."""
+        stats = RunningStats()
+        for chunk in np.array_split(self.values[:10000], 37):
+            stats.add(chunk)
+        other = RunningStats()
+        other.add(self.values[10000:])
+        stats.merge(other)
+        self.assertEqual(stats.count, self.values.size)
+        self.assertAlmostEqual(stats.mean, self.values.mean(), places=10)
+        self.assertAlmostEqual(stats.variance, self.values.var(ddof=1), places=8)
+
+    def test_sketch_quantiles_within_relative_accuracy(self):
+        """Quantiles of values of either sign stay within the relative accuracy, and the sketch never grows."""
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        buckets = sketch.positive.size
+        for chunk in np.array_split(self.values, 10):
+            sketch.add(chunk)
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            exact = np.quantile(self.values, q)
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.02 * abs(exact) + 0.01)
+        self.assertEqual(sketch.positive.size, buckets)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# tests/test_sweep.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import unittest
+from src.betting_strategy import flat_bet
+from src.sweep import expand_grid, run_sweep
+
+class TestSweep(unittest.TestCase):
+
+    def test_expand_grid_varies_last_parameter_fastest(self):
+        """The grid should hold every combination, in order."""
+        grid = expand_grid(decks=[6, 8], blackjack_payout=[1.5, 1.2])
+        self.assertEqual(grid, [
+            {'decks': 6, 'blackjack_payout': 1.5}, {'decks': 6, 'blackjack_payout': 1.2},
+            {'decks': 8, 'blackjack_payout': 1.5}, {'decks': 8, 'blackjack_payout': 1.2},
+        ])
+
+    def test_one_row_per_cell(self):
+        """Every rules x ramp cell gets a row carrying its parameters."""
+        rows = run_sweep(expand_grid(decks=[2], dealer_hits_soft_17=[False, True]), n_shoes=20)
+        self.assertEqual([(row['dealer_hits_soft_17'], row['bet_ramp']) for row in rows],
+                         [(False, 'flat'), (False, 'hi_lo_ramp'), (True, 'flat'), (True, 'hi_lo_ramp')])
+        self.assertEqual(rows[0]['avg_bet'], 10)
+        self.assertEqual(rows[0]['diff'], 0.0)
+        self.assertEqual(rows[0]['rounds'], rows[1]['rounds'])  # Ramps share the same rounds
+
+    def test_same_rules_are_perfectly_paired(self):
+        """Identical cells play identical shoes, so their difference has no error at all."""
+        rows = run_sweep([{'decks': 2}, {'decks': 2}], bet_ramps={'flat': flat_bet}, n_shoes=30)
+        self.assertEqual(rows[0]['ev'], rows[1]['ev'])
+        self.assertEqual(rows[1]['diff_std_error'], 0.0)
+        self.assertGreater(rows[1]['std_error'], 0.0)
+
+    def test_paired_difference_is_far_more_precise(self):
+        """A payout change only touches naturals, so its paired error is a fraction of each cell's error."""
+        rows = run_sweep(expand_grid(decks=[2], blackjack_payout=[1.5, 1.2]), bet_ramps={'flat': flat_bet},
+                         n_shoes=100)
+        self.assertLess(rows[1]['diff'], 0.0)
+        self.assertLess(rows[1]['diff_std_error'] * 5, rows[1]['std_error'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# tests/test_vectorized.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy
+import unittest
+from src.basic_strategy import basic_strategy
+from src.casino_rules import CasinoRules
+from src.simulation import BlackjackSimulation
+
+try:
+    import numpy as np
+    from src.vectorized import VectorizedSimulation
+except ImportError:  # NumPy is optional; only the vectorized engine needs it
+    np = None
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestVectorizedSimulation(unittest.TestCase):
+
+    def assert_matches_scalar(self, strategy=basic_strategy, **rule_params):
+        """Plays one shoe through both engines and checks every hand settles identically."""
+        for seed in range(5):
+            casino_rules = CasinoRules(decks=2, seed=seed, **rule_params)
+            scalar = BlackjackSimulation(casino_rules, strategy=strategy)
+            vectorized = VectorizedSimulation(casino_rules, n_shoes=1, seed=seed, strategy=strategy)
+            vectorized.set_shoe(0, casino_rules.shoe.cards)
+            while casino_rules.cards_dealt < casino_rules.cut_card:
+                self.assertEqual(vectorized.true_counts()[0], casino_rules.calculate_true_count())
+                round_result = scalar.play_round()
+                net, _ = vectorized.play_round()
+                self.assertEqual(net[0], scalar.last_net)
+                self.assertEqual(vectorized.round_category[0], round_result.category)
+                self.assertEqual(vectorized.round_stake[0], round_result.stake)
+                self.assertEqual(vectorized.round_upcard[0], round_result.upcard)
+                self.assertEqual(vectorized.cursor[0], casino_rules.cards_dealt)
+
+    def test_matches_scalar_engine_s17(self):
+        self.assert_matches_scalar(dealer_hits_soft_17=False)
+
+    def test_matches_scalar_engine_h17_6_to_5(self):
+        self.assert_matches_scalar(dealer_hits_soft_17=True, blackjack_payout=1.2, max_splits=2)
+
+    def test_matches_scalar_engine_without_doubling(self):
+        self.assert_matches_scalar(double_on_any_two=False)
+
+    def test_matches_scalar_engine_split_and_surrender_rules(self):
+        strategy = copy.deepcopy(basic_strategy)
+        strategy['hard_totals'][16][10] = 'surrender'
+        strategy['hard_totals'][15][10] = 'surrender/stand'
+        strategy['soft_totals'][18][3] = 'double/stand'
+        self.assert_matches_scalar(strategy=strategy, surrender_option='late', double_after_split=False,
+                                   resplit_aces=True, hit_split_aces=False)
+        self.assert_matches_scalar(strategy=strategy, surrender_option='None', resplit_aces=False,
+                                   hit_split_aces=True)
+
+    def test_run_counts_every_hand(self):
+        result = VectorizedSimulation(CasinoRules(decks=6), n_shoes=64, seed=3).run(10)
+        self.assertEqual(result.hands, 640)
+        self.assertEqual(sum(result.outcomes.values()), 640)
+        self.assertEqual(sum(result.rounds_by_upcard), 640)
+        self.assertEqual(sum(map(sum, (result.wins, result.losses, result.pushes))), 640)
+
+    def test_counts_follow_the_primary_counting_system(self):
+        """Running counts are those CasinoRules keeps for its first system, unbalanced or fractional."""
+        for system in ('ko', 'wong_halves'):
+            rules = CasinoRules(decks=2, seed=7, counting_systems=(system, 'hi_lo'))
+            engine = VectorizedSimulation(rules, n_shoes=1, seed=7)
+            engine.set_shoe(0, rules.shoe.cards)
+            for _ in range(20):
+                self.assertEqual(engine.running_counts()[0], rules.running_count)
+                self.assertAlmostEqual(engine.true_counts()[0], rules.calculate_true_count())
+                for _ in range(3):
+                    rules.deal_card()
+                engine.cursor[0] += 3
+
+if __name__ == "__main__":
+    unittest.main()